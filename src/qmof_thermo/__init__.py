@@ -1,20 +1,99 @@
 from __future__ import annotations
 
+import importlib
 import logging
+from typing import TYPE_CHECKING
 
-from qmof_thermo.hull import get_energy_above_hull
-from qmof_thermo.phase_diagram import setup_phase_diagrams
-from qmof_thermo.relax import relax_mof
+if TYPE_CHECKING:
+    from qmof_thermo.client import HullClient
+    from qmof_thermo.compact import convert_phase_diagram
+    from qmof_thermo.correction import EnergyCorrection
+    from qmof_thermo.formation import get_formation_energies
+    from qmof_thermo.free_energy import get_free_energy_above_hull
+    from qmof_thermo.hull import (
+        HullResult,
+        HullResults,
+        clear_cache,
+        compare_energies_above_hull,
+        get_energies_above_hull,
+        get_energy_above_hull,
+        get_hull_result,
+        get_hull_results,
+        load_hull_cache,
+        preload,
+        save_hull_cache,
+    )
+    from qmof_thermo.phase_diagram import setup_phase_diagrams, update_phase_diagram
+    from qmof_thermo.relax import relax_mof
+    from qmof_thermo.service import HullServer
+    from qmof_thermo.uncertainty import HullUncertainty, get_hull_uncertainty
+
+# Submodules are imported on first access, so that light entry points such as
+# the hull client do not pay for importing pymatgen or the MLIP stack.
+_EXPORTS = {
+    "EnergyCorrection": "qmof_thermo.correction",
+    "HullClient": "qmof_thermo.client",
+    "HullResult": "qmof_thermo.hull",
+    "HullResults": "qmof_thermo.hull",
+    "HullServer": "qmof_thermo.service",
+    "HullUncertainty": "qmof_thermo.uncertainty",
+    "clear_cache": "qmof_thermo.hull",
+    "compare_energies_above_hull": "qmof_thermo.hull",
+    "convert_phase_diagram": "qmof_thermo.compact",
+    "get_energies_above_hull": "qmof_thermo.hull",
+    "get_energy_above_hull": "qmof_thermo.hull",
+    "get_formation_energies": "qmof_thermo.formation",
+    "get_free_energy_above_hull": "qmof_thermo.free_energy",
+    "get_hull_result": "qmof_thermo.hull",
+    "get_hull_results": "qmof_thermo.hull",
+    "get_hull_uncertainty": "qmof_thermo.uncertainty",
+    "load_hull_cache": "qmof_thermo.hull",
+    "preload": "qmof_thermo.hull",
+    "relax_mof": "qmof_thermo.relax",
+    "save_hull_cache": "qmof_thermo.hull",
+    "setup_phase_diagrams": "qmof_thermo.phase_diagram",
+    "update_phase_diagram": "qmof_thermo.phase_diagram",
+}
 
 __all__ = [
+    "EnergyCorrection",
+    "HullClient",
+    "HullResult",
+    "HullResults",
+    "HullServer",
+    "HullUncertainty",
+    "clear_cache",
+    "compare_energies_above_hull",
+    "convert_phase_diagram",
+    "get_energies_above_hull",
     "get_energy_above_hull",
+    "get_formation_energies",
+    "get_free_energy_above_hull",
+    "get_hull_result",
+    "get_hull_results",
+    "get_hull_uncertainty",
+    "load_hull_cache",
+    "preload",
     "relax_mof",
+    "save_hull_cache",
     "set_log_level",
     "setup_phase_diagrams",
+    "update_phase_diagram",
 ]
 
 logger = logging.getLogger(__name__)
 
 
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_EXPORTS})
+
+
 def set_log_level(level=logging.INFO):
     logger.setLevel(level)
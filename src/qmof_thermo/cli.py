@@ -0,0 +1,410 @@
+"""
+Command-line interface.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import sys
+from contextlib import ExitStack
+from itertools import islice
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from qmof_thermo.correction import EnergyCorrection
+from qmof_thermo.hull import (
+    _DEFAULT_PD_JSON,
+    _diagram_process_pool,
+    _parse_composition,
+    get_hull_results,
+    preload,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+    from concurrent.futures import ProcessPoolExecutor
+    from typing import IO
+
+LOGGER = getLogger(__name__)
+
+_OUTPUT_FIELDS = (
+    "id",
+    "formula",
+    "e_above_hull",
+    "hull_energy",
+    "chemical_space",
+    "decomposition",
+    "error",
+)
+
+
+def _infer_format(path: str, fmt: str | None) -> str:
+    """
+    Get the record format of a file from its suffix, unless given explicitly.
+
+    Parameters
+    ----------
+    path
+        Path to the file, or ``"-"`` for stdin/stdout.
+    fmt
+        Explicit format, ``"csv"`` or ``"jsonl"``.
+
+    Returns
+    -------
+    str
+        ``"csv"`` or ``"jsonl"``. Standard streams default to ``"jsonl"``.
+    """
+    if fmt is not None:
+        return fmt
+    return "csv" if Path(path).suffix.lower() == ".csv" else "jsonl"
+
+
+def _read_records(stream: IO[str], fmt: str) -> Iterator[dict | Exception]:
+    """
+    Lazily read records from a CSV or JSONL stream.
+
+    Parameters
+    ----------
+    stream
+        Text stream to read.
+    fmt
+        ``"csv"`` or ``"jsonl"``.
+
+    Yields
+    ------
+    dict | Exception
+        One record per CSV row or non-empty JSONL line. A JSONL line that is
+        not a JSON object yields the error instead, so that it can be
+        reported without stopping the stream.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as err:
+            yield err
+            continue
+        if not isinstance(record, dict):
+            yield TypeError(f"Expected a JSON object, got {type(record).__name__}")
+            continue
+        yield record
+
+
+def _score_chunk(
+    records: list[dict | Exception],
+    args: argparse.Namespace,
+    pool: ProcessPoolExecutor | None = None,
+) -> Iterator[dict[str, object]]:
+    """
+    Score a chunk of records against the phase diagram.
+
+    Parameters
+    ----------
+    records
+        Input records, or the errors of records that could not be read.
+    args
+        Parsed command-line arguments.
+    pool
+        Process pool shared by all chunks if ``--n-workers`` is above 1.
+
+    Yields
+    ------
+    dict[str, object]
+        One output row per input record, in order. Records that cannot be
+        parsed or scored get an ``error`` message instead of energies.
+    """
+    rows: list[dict[str, object]] = []
+    valid, compositions, energies = [], [], []
+    for record in records:
+        row: dict[str, object] = dict.fromkeys(_OUTPUT_FIELDS)
+        rows.append(row)
+        if isinstance(record, Exception):
+            row["error"] = f"Could not read record: {record!r}"
+            continue
+        row["id"] = record.get(args.id_key)
+        try:
+            composition = _parse_composition(record[args.composition_key])
+            energy = float(record[args.energy_key])
+        except (KeyError, ValueError, TypeError, AttributeError, OSError) as err:
+            row["error"] = f"Could not read record: {err!r}"
+            continue
+        valid.append(row)
+        compositions.append(composition)
+        energies.append(energy)
+
+    if compositions:
+        results = get_hull_results(
+            compositions,
+            energies,
+            serialized_phase_diagram=args.diagram,
+            engine=args.engine,
+            n_workers=args.n_workers,
+            correction=args.correction,
+            pool=pool,
+        )
+        for j, row in enumerate(valid):
+            result = results[j]
+            row["formula"] = result.formula
+            if (error := results.errors[j]) is not None:
+                row["error"] = error
+                continue
+            row["e_above_hull"] = result.e_above_hull
+            row["hull_energy"] = result.hull_energy
+            row["chemical_space"] = result.chemical_space
+            row["decomposition"] = result.decomposition
+
+    yield from rows
+
+
+def _write_rows(rows: Iterator[dict[str, object]], stream: IO[str], fmt: str) -> int:
+    """
+    Write output rows to a CSV or JSONL stream as they are produced.
+
+    Parameters
+    ----------
+    rows
+        Output rows.
+    stream
+        Text stream to write.
+    fmt
+        ``"csv"`` or ``"jsonl"``. In CSV, decompositions are JSON-encoded.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    n_rows = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=_OUTPUT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            if row["decomposition"] is not None:
+                row["decomposition"] = json.dumps(row["decomposition"])
+            writer.writerow(row)
+            n_rows += 1
+        return n_rows
+
+    for row in rows:
+        stream.write(json.dumps(row) + "\n")
+        n_rows += 1
+    return n_rows
+
+
+def _ehull(args: argparse.Namespace) -> int:
+    """
+    Run the ``ehull`` command.
+
+    Parameters
+    ----------
+    args
+        Parsed command-line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+    """
+    if args.correction is not None:
+        args.correction = getattr(EnergyCorrection, args.correction)()
+    input_format = _infer_format(args.input, args.input_format)
+    output_format = _infer_format(args.output, args.output_format)
+
+    with ExitStack() as stack:
+        instream = (
+            sys.stdin
+            if args.input == "-"
+            else stack.enter_context(Path(args.input).open(newline=""))
+        )
+        outstream = (
+            sys.stdout
+            if args.output == "-"
+            else stack.enter_context(Path(args.output).open("w", newline=""))
+        )
+
+        # One pool for the whole stream, rather than one per chunk. The
+        # diagram is loaded first so that forked workers inherit it.
+        pool = None
+        if args.n_workers > 1:
+            preload(args.diagram, lazy=True)
+            pool = stack.enter_context(
+                _diagram_process_pool(args.diagram, args.n_workers)
+            )
+        records = _read_records(instream, input_format)
+
+        def rows() -> Iterator[dict[str, object]]:
+            while chunk := list(islice(records, args.chunk_size)):
+                yield from _score_chunk(chunk, args, pool)
+                outstream.flush()
+
+        n_rows = _write_rows(rows(), outstream, output_format)
+
+    LOGGER.info(f"Scored {n_rows} records")
+    return 0
+
+
+def _serve(args: argparse.Namespace) -> int:
+    """
+    Run the ``serve`` command.
+
+    Parameters
+    ----------
+    args
+        Parsed command-line arguments.
+
+    Returns
+    -------
+    int
+        Exit code.
+    """
+    from qmof_thermo.service import serve
+
+    serve(
+        args.diagram or [_DEFAULT_PD_JSON],
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket,
+        max_batch_size=args.max_batch_size,
+        max_delay=args.max_delay,
+        engine=args.engine,
+    )
+    return 0
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command-line argument parser.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        Parser for the ``qmof-thermo`` command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="qmof-thermo", description="Thermodynamic stability of MOFs."
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Log progress to stderr."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ehull = subparsers.add_parser(
+        "ehull",
+        help="Score energies above hull of streamed records.",
+        description=(
+            "Stream records with an id, a composition (formula or CIF path) and "
+            "a total energy in eV, and write their energies above hull in "
+            "eV/atom. Records are read and scored in chunks, so memory use "
+            "does not grow with the input."
+        ),
+    )
+    ehull.add_argument(
+        "input", nargs="?", default="-", help="CSV or JSONL input, '-' for stdin."
+    )
+    ehull.add_argument(
+        "-o", "--output", default="-", help="CSV or JSONL output, '-' for stdout."
+    )
+    ehull.add_argument(
+        "--diagram",
+        default=_DEFAULT_PD_JSON,
+        help=(
+            "Phase diagram written by setup_phase_diagrams, JSON or compact "
+            "npz. Defaults to the packaged diagram."
+        ),
+    )
+    ehull.add_argument("--input-format", choices=["csv", "jsonl"])
+    ehull.add_argument("--output-format", choices=["csv", "jsonl"])
+    ehull.add_argument("--id-key", default="id", help="Record field with the id.")
+    ehull.add_argument(
+        "--composition-key",
+        default="composition",
+        help="Record field with the formula or CIF path.",
+    )
+    ehull.add_argument(
+        "--energy-key", default="energy", help="Record field with the energy."
+    )
+    ehull.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10000,
+        help="Number of records scored at once.",
+    )
+    ehull.add_argument(
+        "--n-workers", type=int, default=1, help="Number of worker processes."
+    )
+    ehull.add_argument("--engine", choices=["numpy", "pymatgen"], default="numpy")
+    ehull.add_argument(
+        "--correction",
+        choices=["uma", "esen"],
+        help="Correct MLIP energies to DFT with per-element shifts.",
+    )
+    ehull.set_defaults(func=_ehull)
+
+    serve = subparsers.add_parser(
+        "serve",
+        help="Run a hull-scoring server.",
+        description=(
+            "Hold phase diagrams in memory and score line-delimited JSON "
+            "requests over a localhost TCP or Unix socket, coalescing "
+            "concurrent requests into micro-batches. Query it with "
+            "qmof_thermo.HullClient."
+        ),
+    )
+    serve.add_argument(
+        "--diagram",
+        action="append",
+        help=(
+            "Phase diagram to hold in memory; may be repeated, the first is "
+            "the default. Defaults to the packaged diagram."
+        ),
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="Host to listen on.")
+    serve.add_argument("--port", type=int, default=8765, help="TCP port.")
+    serve.add_argument("--socket", help="Unix socket path to listen on instead.")
+    serve.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=4096,
+        help="Maximum number of items scored at once.",
+    )
+    serve.add_argument(
+        "--max-delay",
+        type=float,
+        default=0.005,
+        help="Maximum time in seconds an item waits for its batch to fill.",
+    )
+    serve.add_argument("--engine", choices=["numpy", "pymatgen"], default="numpy")
+    serve.set_defaults(func=_serve)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Entry point of the ``qmof-thermo`` command.
+
+    Parameters
+    ----------
+    argv
+        Command-line arguments, defaulting to ``sys.argv[1:]``.
+
+    Returns
+    -------
+    int
+        Exit code.
+    """
+    args = _build_parser().parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Client for the hull-scoring service.
+
+This module only depends on the standard library and NumPy, so that
+short-lived processes can query a running :class:`qmof_thermo.HullServer`
+without importing pymatgen or loading a phase diagram.
+"""
+
+from __future__ import annotations
+
+import json
+import socket
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Literal
+
+    from numpy.typing import ArrayLike
+
+    from qmof_thermo.composition import CompositionLike
+
+_DEFAULT_ADDRESS = ("127.0.0.1", 8765)
+
+
+def _encode_composition(struct: CompositionLike) -> str | dict[str, float]:
+    """
+    Convert a structure-like input to a composition the server can read.
+
+    Parameters
+    ----------
+    struct
+        Input structure, in any form accepted by
+        :func:`qmof_thermo.get_energy_above_hull`.
+
+    Returns
+    -------
+    str | dict[str, float]
+        Formula strings and dicts are sent as is, and file paths as absolute
+        paths. Other inputs are reduced to their ``{element: amount}`` dict
+        locally, which imports pymatgen.
+    """
+    if isinstance(struct, dict):
+        return {str(el): float(amt) for el, amt in struct.items()}
+    if isinstance(struct, str) and not struct.lower().endswith(".cif"):
+        return struct
+    if isinstance(struct, str | Path):
+        return str(Path(struct).resolve())
+
+    from qmof_thermo.composition import get_composition
+
+    return get_composition(struct).as_dict()
+
+
+class HullClient:
+    """
+    Blocking client for a :class:`qmof_thermo.HullServer`.
+
+    The methods mirror :func:`qmof_thermo.get_energy_above_hull` and
+    :func:`qmof_thermo.get_energies_above_hull`. One connection is opened
+    on first use and reused for later requests.
+    """
+
+    def __init__(
+        self,
+        address: str | Path | tuple[str, int] = _DEFAULT_ADDRESS,
+        timeout: float | None = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        address
+            Path of the server's Unix socket, or its (host, port).
+        timeout
+            Timeout in seconds of each request, or None to wait indefinitely.
+        """
+        self.address = address
+        self.timeout = timeout
+        self._socket: socket.socket | None = None
+        self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the connection to the server.
+
+        Returns
+        -------
+        None
+        """
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _request(self, payload: dict) -> dict:
+        """Send a request and wait for its response."""
+        if self._socket is None:
+            if isinstance(self.address, tuple):
+                self._socket = socket.create_connection(self.address, self.timeout)
+            else:
+                self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._socket.settimeout(self.timeout)
+                self._socket.connect(str(self.address))
+            self._stream = self._socket.makefile("rwb")
+
+        self._stream.write(json.dumps(payload).encode() + b"\n")
+        self._stream.flush()
+        line = self._stream.readline()
+        if not line:
+            self.close()
+            msg = "The hull server closed the connection."
+            raise ConnectionError(msg)
+
+        response = json.loads(line)
+        if "error" in response:
+            msg = f"The hull server rejected the request: {response['error']}"
+            raise ValueError(msg)
+        return response
+
+    def stats(self) -> dict:
+        """
+        Get the queue depth and latency percentiles of the server.
+
+        Returns
+        -------
+        dict
+            See :meth:`qmof_thermo.HullServer.stats`.
+        """
+        return self._request({"op": "stats"})
+
+    def get_hull_results(
+        self,
+        structs: Sequence[CompositionLike],
+        energies: ArrayLike,
+        serialized_phase_diagram: Path | str | None = None,
+    ) -> list[dict]:
+        """
+        Score many structures on the server.
+
+        Parameters
+        ----------
+        structs
+            Input structures, in any form accepted by
+            :func:`qmof_thermo.get_energy_above_hull`.
+        energies
+            Total relaxed energies of the structures in eV.
+        serialized_phase_diagram
+            Phase diagram to score against. It must be held by the server,
+            which uses its default diagram if None.
+
+        Returns
+        -------
+        list[dict]
+            One result per input, with the ``formula``, ``e_above_hull``,
+            ``hull_energy``, ``decomposition``, ``chemical_space`` and
+            ``error`` of the input.
+
+        Raises
+        ------
+        ValueError
+            If ``structs`` and ``energies`` differ in length, or if the
+            server rejects the request.
+        """
+        energies = np.asarray(energies, dtype=float)
+        if energies.shape != (len(structs),):
+            msg = (
+                f"Got {len(structs)} structures but {energies.size} energies; "
+                "they must have the same length."
+            )
+            raise ValueError(msg)
+
+        payload: dict[str, object] = {
+            "op": "ehull",
+            "items": [
+                {"composition": _encode_composition(struct), "energy": energy}
+                for struct, energy in zip(structs, energies.tolist(), strict=True)
+            ],
+        }
+        if serialized_phase_diagram is not None:
+            payload["diagram"] = str(Path(serialized_phase_diagram).resolve())
+        return self._request(payload)["results"]
+
+    def get_energy_above_hull(
+        self,
+        struct: CompositionLike,
+        energy: float,
+        serialized_phase_diagram: Path | str | None = None,
+    ) -> float:
+        """
+        Calculate the energy above hull of a structure on the server.
+
+        Parameters
+        ----------
+        struct
+            Input structure, in any form accepted by
+            :func:`qmof_thermo.get_energy_above_hull`.
+        energy
+            Total relaxed energy of the structure in eV.
+        serialized_phase_diagram
+            Phase diagram to score against, see :meth:`get_hull_results`.
+
+        Returns
+        -------
+        float
+            Energy above the convex hull in eV/atom.
+
+        Raises
+        ------
+        ValueError
+            If the energy above hull cannot be computed.
+        """
+        (result,) = self.get_hull_results([struct], [energy], serialized_phase_diagram)
+        if result["error"] is not None:
+            raise ValueError(result["error"])
+        return result["e_above_hull"]
+
+    def get_energies_above_hull(
+        self,
+        structs: Sequence[CompositionLike],
+        energies: ArrayLike,
+        serialized_phase_diagram: Path | str | None = None,
+        on_error: Literal["raise", "ignore"] = "ignore",
+    ) -> np.ndarray:
+        """
+        Calculate the energy above hull of many structures on the server.
+
+        Parameters
+        ----------
+        structs
+            Input structures, in any form accepted by
+            :func:`qmof_thermo.get_energy_above_hull`.
+        energies
+            Total relaxed energies of the structures in eV.
+        serialized_phase_diagram
+            Phase diagram to score against, see :meth:`get_hull_results`.
+        on_error
+            ``"raise"`` raises a ValueError for the first input whose energy
+            above hull cannot be computed, ``"ignore"`` stores NaN for it.
+
+        Returns
+        -------
+        np.ndarray
+            Energies above the convex hull in eV/atom, in input order.
+        """
+        results = self.get_hull_results(structs, energies, serialized_phase_diagram)
+        e_above_hull = np.full(len(results), np.nan)
+        for i, result in enumerate(results):
+            if result["error"] is None:
+                e_above_hull[i] = result["e_above_hull"]
+            elif on_error == "raise":
+                raise ValueError(result["error"])
+        return e_above_hull
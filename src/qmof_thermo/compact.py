@@ -0,0 +1,276 @@
+"""
+Compact, array-backed serialization of phase diagrams.
+"""
+
+from __future__ import annotations
+
+import json
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from monty.serialization import loadfn
+from pymatgen.analysis.phase_diagram import PDEntry, PhaseDiagram
+from pymatgen.core import Composition, Element
+from pymatgen.util.coord import Simplex
+
+from qmof_thermo.phase_diagram import (
+    _DEFAULT_COMPACT_PD_FILENAME,
+    LazyPatchedPhaseDiagram,
+    _assemble_patched_phase_diagram,
+    _PatchLayout,
+)
+
+if TYPE_CHECKING:
+    from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram
+
+LOGGER = getLogger(__name__)
+
+_COMPACT_FORMAT_VERSION = 1
+
+
+def _offsets(lengths: list[int]) -> np.ndarray:
+    """
+    Convert a list of group lengths to CSR-style offsets.
+
+    Parameters
+    ----------
+    lengths
+        Number of items in each group.
+
+    Returns
+    -------
+    np.ndarray
+        Array of ``len(lengths) + 1`` offsets, starting at 0.
+    """
+    return np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+
+
+def write_compact_phase_diagram(
+    ppd: PatchedPhaseDiagram, compact_path: str | Path
+) -> None:
+    """
+    Write a PatchedPhaseDiagram to the compact ``.npz`` format.
+
+    The file stores the element list, a dense composition matrix and the
+    energies of all entries, together with the entries, hull data and facets
+    of every sub-space, so that it can be loaded without recomputing any
+    convex hull.
+
+    Parameters
+    ----------
+    ppd
+        PatchedPhaseDiagram to serialize.
+    compact_path
+        Path of the ``.npz`` file to write.
+
+    Returns
+    -------
+    None
+    """
+    elements = list(ppd.elements)
+    element_index = {el: i for i, el in enumerate(elements)}
+    entry_index = {id(e): i for i, e in enumerate(ppd.all_entries)}
+
+    compositions = np.zeros((len(ppd.all_entries), len(elements)))
+    for i, entry in enumerate(ppd.all_entries):
+        for el, amt in entry.composition.items():
+            compositions[i, element_index[el]] = amt
+
+    space_masks = np.zeros((len(ppd.spaces), len(elements)), dtype=bool)
+    space_all, space_qhull, space_facets, space_qhull_data = [], [], [], []
+    for i, space in enumerate(ppd.spaces):
+        pd = ppd.pds[space]
+        space_masks[i, [element_index[el] for el in space]] = True
+        space_all.append([entry_index[id(e)] for e in pd.all_entries])
+        space_qhull.append([entry_index[id(e)] for e in pd.qhull_entries])
+        space_facets.append(np.reshape(pd.facets, (-1, len(space))))
+        space_qhull_data.append(pd.qhull_data)
+
+    np.savez(
+        compact_path,
+        version=np.array(_COMPACT_FORMAT_VERSION),
+        elements=np.array([el.symbol for el in elements]),
+        entry_names=np.array([e.name for e in ppd.all_entries]),
+        entry_attributes=np.array([json.dumps(e.attribute) for e in ppd.all_entries]),
+        entry_compositions=compositions,
+        entry_energies=np.array([e.energy for e in ppd.all_entries]),
+        qhull_indices=np.array([entry_index[id(e)] for e in ppd.qhull_entries]),
+        el_ref_indices=np.array([entry_index[id(ppd.el_refs[el])] for el in elements]),
+        space_masks=space_masks,
+        space_all_offsets=_offsets([len(idx) for idx in space_all]),
+        space_all_indices=np.concatenate(space_all).astype(np.int64),
+        space_qhull_offsets=_offsets([len(idx) for idx in space_qhull]),
+        space_qhull_indices=np.concatenate(space_qhull).astype(np.int64),
+        space_facet_offsets=_offsets([f.size for f in space_facets]),
+        space_facets=np.concatenate([f.ravel() for f in space_facets]).astype(np.int64),
+        space_qhull_data=np.concatenate([d.ravel() for d in space_qhull_data]),
+    )
+    LOGGER.info(f"Saved compact PatchedPhaseDiagram to: {compact_path}")
+
+
+class _CompactReader:
+    """
+    Random access to the entries and sub-spaces of a compact phase diagram.
+
+    Entries are only turned into PDEntry objects, and sub-spaces into
+    PhaseDiagram objects, when first requested.
+    """
+
+    def __init__(self, compact_path: str | Path) -> None:
+        with np.load(compact_path, allow_pickle=False) as data:
+            self.arrays = dict(data)
+
+        if int(self.arrays["version"]) != _COMPACT_FORMAT_VERSION:
+            msg = (
+                "Unsupported compact phase diagram version "
+                f"{int(self.arrays['version'])} in {compact_path}."
+            )
+            raise ValueError(msg)
+
+        self.elements = [Element(symbol) for symbol in self.arrays["elements"]]
+        self.spaces = [
+            frozenset(self.elements[j] for j in np.flatnonzero(mask))
+            for mask in self.arrays["space_masks"]
+        ]
+        self._space_index = {space: i for i, space in enumerate(self.spaces)}
+
+        # The hull data of each sub-space has one extra point on top of the
+        # qhull entries
+        dims = self.arrays["space_masks"].sum(axis=1)
+        n_qhull = np.diff(self.arrays["space_qhull_offsets"])
+        self._qhull_data_offsets = _offsets((n_qhull + 1) * dims)
+
+        self._entries: list[PDEntry | None] = [None] * len(
+            self.arrays["entry_energies"]
+        )
+
+    def entry(self, index: int) -> PDEntry:
+        """Get the PDEntry stored at ``index``."""
+        if (entry := self._entries[index]) is None:
+            amounts = self.arrays["entry_compositions"][index]
+            composition = Composition(
+                {self.elements[j]: float(amounts[j]) for j in np.flatnonzero(amounts)}
+            )
+            entry = self._entries[index] = PDEntry(
+                composition,
+                float(self.arrays["entry_energies"][index]),
+                name=str(self.arrays["entry_names"][index]),
+                attribute=json.loads(str(self.arrays["entry_attributes"][index])),
+            )
+        return entry
+
+    def _group(self, name: str, i: int) -> list[PDEntry]:
+        offsets = self.arrays[f"space_{name}_offsets"]
+        indices = self.arrays[f"space_{name}_indices"][offsets[i] : offsets[i + 1]]
+        return [self.entry(j) for j in indices]
+
+    def build_pd(self, space: frozenset[Element]) -> PhaseDiagram:
+        """Restore the PhaseDiagram of a chemical sub-space from its facets."""
+        i = self._space_index[space]
+        space_elements = sorted(space)
+        dim = len(space_elements)
+        all_entries = self._group("all", i)
+        qhull_entries = self._group("qhull", i)
+
+        facet_offsets = self.arrays["space_facet_offsets"]
+        facets = self.arrays["space_facets"][
+            facet_offsets[i] : facet_offsets[i + 1]
+        ].reshape(-1, dim)
+        qhull_data = self.arrays["space_qhull_data"][
+            self._qhull_data_offsets[i] : self._qhull_data_offsets[i + 1]
+        ].reshape(-1, dim)
+
+        computed_data = {
+            "facets": list(facets),
+            "simplexes": [Simplex(qhull_data[facet, :-1]) for facet in facets],
+            "all_entries": all_entries,
+            "qhull_data": qhull_data,
+            "dim": dim,
+            "el_refs": [
+                (str(e.elements[0]), e)
+                for e in qhull_entries
+                if e.composition.is_element
+            ],
+            "qhull_entries": qhull_entries,
+        }
+        return PhaseDiagram(all_entries, space_elements, computed_data=computed_data)
+
+    def load_layout(self) -> _PatchLayout:
+        """Get all entries and chemical sub-spaces."""
+        return _PatchLayout(
+            [self.entry(j) for j in range(len(self._entries))],
+            self.elements,
+            tuple(self.entry(j) for j in self.arrays["qhull_indices"]),
+            {
+                el: self.entry(j)
+                for el, j in zip(
+                    self.elements, self.arrays["el_ref_indices"], strict=True
+                )
+            },
+            self.spaces,
+        )
+
+
+def read_compact_phase_diagram(
+    compact_path: str | Path, lazy: bool = False
+) -> PatchedPhaseDiagram:
+    """
+    Read a PatchedPhaseDiagram written by :func:`write_compact_phase_diagram`.
+
+    No convex hull is recomputed; every sub-space PhaseDiagram is restored
+    from the stored facets and hull data.
+
+    Parameters
+    ----------
+    compact_path
+        Path of the ``.npz`` file to read.
+    lazy
+        Whether to only restore each sub-space when a query first needs it.
+
+    Returns
+    -------
+    PatchedPhaseDiagram
+        The deserialized phase diagram, a LazyPatchedPhaseDiagram if
+        ``lazy`` is True.
+
+    Raises
+    ------
+    ValueError
+        If the file was written with an unsupported format version.
+    """
+    reader = _CompactReader(compact_path)
+    if lazy:
+        return LazyPatchedPhaseDiagram(reader.elements, reader.spaces, reader)
+
+    return _assemble_patched_phase_diagram(
+        reader.load_layout(), {space: reader.build_pd(space) for space in reader.spaces}
+    )
+
+
+def convert_phase_diagram(
+    serialized_phase_diagram: str | Path, compact_path: str | Path | None = None
+) -> Path:
+    """
+    Convert a JSON-serialized PatchedPhaseDiagram to the compact format.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the JSON PatchedPhaseDiagram written by ``setup_phase_diagrams``.
+    compact_path
+        Path of the ``.npz`` file to write. Defaults to
+        ``patched_phase_diagram.npz`` next to the JSON file.
+
+    Returns
+    -------
+    Path
+        Path of the written ``.npz`` file.
+    """
+    serialized_phase_diagram = Path(serialized_phase_diagram)
+    compact_path = Path(
+        compact_path or serialized_phase_diagram.with_name(_DEFAULT_COMPACT_PD_FILENAME)
+    )
+    write_compact_phase_diagram(loadfn(serialized_phase_diagram), compact_path)
+    return compact_path
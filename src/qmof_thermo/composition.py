@@ -0,0 +1,252 @@
+"""
+Module for reading compositions without building full structures.
+"""
+
+from __future__ import annotations
+
+import re
+import shlex
+from collections import Counter
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from ase import Atoms
+from ase.io import read
+from pymatgen.core import Composition, Element
+
+if TYPE_CHECKING:
+    from pymatgen.core import Structure
+
+    CompositionLike = (
+        Structure | Atoms | Composition | str | Path | dict[str | Element, float]
+    )
+
+LOGGER = getLogger(__name__)
+
+# Tags listing the symmetry operations of a CIF, old and new dictionary names.
+_CIF_SYMOP_TAGS = ("_symmetry_equiv_pos_as_xyz", "_space_group_symop_operation_xyz")
+
+# Tags holding the space group of a CIF, old and new dictionary names.
+_CIF_SPACE_GROUP_TAGS = ("_symmetry_space_group_name_h-m", "_space_group_name_h-m_alt")
+
+_ELEMENT_SYMBOL = re.compile(r"[A-Z][a-z]?")
+
+
+def _atoms_composition(atoms: Atoms) -> Composition:
+    """
+    Count the atomic numbers of an ASE Atoms object.
+
+    Parameters
+    ----------
+    atoms
+        ASE Atoms object.
+
+    Returns
+    -------
+    Composition
+        The composition of the atoms.
+    """
+    numbers, counts = np.unique(atoms.numbers, return_counts=True)
+    return Composition(
+        {Element.from_Z(int(z)): int(n) for z, n in zip(numbers, counts, strict=True)}
+    )
+
+
+def _parse_cif_number(value: str) -> float:
+    """Parse a CIF number, dropping any standard uncertainty in brackets."""
+    return float(value.split("(", 1)[0])
+
+
+def _read_cif_loops(lines: list[str]) -> tuple[dict[str, str], list[dict[str, list]]]:
+    """
+    Split the first data block of a CIF into single-valued tags and loops.
+
+    The values of a loop are read as one stream of tokens, so that rows
+    wrapped over several lines are split into columns correctly.
+
+    Parameters
+    ----------
+    lines
+        Lines of the CIF file.
+
+    Returns
+    -------
+    dict[str, str]
+        Single-valued tags, with lowercase names.
+    list[dict[str, list]]
+        Columns of each loop, keyed by lowercase tag name.
+
+    Raises
+    ------
+    ValueError
+        If the file has more than one data block, uses multi-line values, or
+        has a loop whose number of values is not a multiple of its number of
+        tags.
+    """
+    tags: dict[str, str] = {}
+    raw_loops: list[tuple[list[str], list[str]]] = []
+    in_loop_header = False
+    in_loop = False
+    n_blocks = 0
+
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith(";"):
+            msg = "Multi-line CIF values are not supported by the fast reader."
+            raise ValueError(msg)
+        if line.lower().startswith("data_"):
+            n_blocks += 1
+            if n_blocks > 1:
+                msg = "CIF files with several data blocks are not supported."
+                raise ValueError(msg)
+            in_loop_header = in_loop = False
+            continue
+        if line.lower() == "loop_":
+            raw_loops.append(([], []))
+            in_loop_header = in_loop = True
+            continue
+        if line.startswith("_"):
+            name, *value = line.split(maxsplit=1)
+            if in_loop_header and not value:
+                raw_loops[-1][0].append(name.lower())
+                continue
+            in_loop_header = in_loop = False
+            tags[name.lower()] = value[0].strip("'\"") if value else ""
+            continue
+        if in_loop and raw_loops[-1][0]:
+            in_loop_header = False
+            values = shlex.split(line) if "'" in line or '"' in line else line.split()
+            raw_loops[-1][1].extend(values)
+
+    loops: list[dict[str, list]] = []
+    for loop_tags, values in raw_loops:
+        if len(values) % max(len(loop_tags), 1):
+            msg = (
+                f"Loop with {len(loop_tags)} tags has {len(values)} values, "
+                "which do not split into whole rows."
+            )
+            raise ValueError(msg)
+        loops.append(
+            {tag: values[i :: len(loop_tags)] for i, tag in enumerate(loop_tags)}
+        )
+    return tags, loops
+
+
+def _read_p1_cif_composition(path: Path) -> Composition:
+    """
+    Read the composition of a P1 CIF from its atom-site symbols.
+
+    Parameters
+    ----------
+    path
+        Path to the CIF file.
+
+    Returns
+    -------
+    Composition
+        The composition of the unit cell, weighted by site occupancies.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a P1 CIF with atom sites, or if the fast reader
+        cannot parse it.
+    """
+    tags, loops = _read_cif_loops(path.read_text().splitlines())
+
+    symops = [
+        op for loop in loops for tag in _CIF_SYMOP_TAGS for op in loop.get(tag, [])
+    ]
+    space_group = next(
+        (tags[tag] for tag in _CIF_SPACE_GROUP_TAGS if tag in tags), "P 1"
+    )
+    is_p1 = (
+        [op.replace(" ", "").lower() for op in symops] == ["x,y,z"]
+        if symops
+        else space_group.replace(" ", "").upper() == "P1"
+    )
+    site_loop = next(
+        (
+            loop
+            for loop in loops
+            if "_atom_site_type_symbol" in loop or "_atom_site_label" in loop
+        ),
+        None,
+    )
+    if not is_p1 or site_loop is None:
+        msg = "not a P1 CIF with atom sites."
+        raise ValueError(msg)
+
+    symbols = site_loop.get("_atom_site_type_symbol") or site_loop["_atom_site_label"]
+    occupancies = site_loop.get("_atom_site_occupancy", ["1"] * len(symbols))
+
+    amounts: Counter[str] = Counter()
+    for symbol, occupancy in zip(symbols, occupancies, strict=True):
+        match = _ELEMENT_SYMBOL.match(symbol)
+        if match is None:
+            msg = f"Could not read an element from atom site {symbol!r}."
+            raise ValueError(msg)
+        amounts[match.group()] += _parse_cif_number(occupancy)
+    return Composition(amounts)
+
+
+def _read_cif_composition(path: Path) -> Composition:
+    """
+    Read the composition of a CIF, parsing only its atom sites if possible.
+
+    Only the atom-site loop of a P1 CIF is parsed; no lattice or site
+    objects are built. Files that list symmetry operations other than the
+    identity, or that the fast reader cannot handle, are read in full with
+    ASE instead.
+
+    Parameters
+    ----------
+    path
+        Path to the CIF file.
+
+    Returns
+    -------
+    Composition
+        The composition of the unit cell, weighted by site occupancies.
+    """
+    try:
+        return _read_p1_cif_composition(path)
+    except ValueError as err:
+        LOGGER.debug(f"Reading {path} in full: {err}")
+        return _atoms_composition(read(path))
+
+
+def get_composition(struct: CompositionLike) -> Composition:
+    """
+    Get the composition of a structure-like input.
+
+    Parameters
+    ----------
+    struct
+        A pymatgen Structure or Composition, an ASE Atoms object, a formula
+        string, an ``{element: amount}`` dict, or the path to a structure file.
+        Paths are given as Path objects or as strings ending in ``.cif``.
+
+    Returns
+    -------
+    Composition
+        The composition of the input.
+    """
+    if isinstance(struct, Composition):
+        return struct
+    if isinstance(struct, Atoms):
+        return _atoms_composition(struct)
+    if isinstance(struct, dict):
+        return Composition(struct)
+    if isinstance(struct, str) and not struct.lower().endswith(".cif"):
+        return Composition(struct)
+    if isinstance(struct, str | Path):
+        path = Path(struct)
+        if path.suffix.lower() == ".cif":
+            return _read_cif_composition(path)
+        return _atoms_composition(read(path))
+    return struct.composition
@@ -0,0 +1,219 @@
+"""
+Module for per-element corrections of MLIP energies towards DFT.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+from pymatgen.analysis.phase_diagram import PDEntry
+
+from qmof_thermo.composition import get_composition
+from qmof_thermo.phase_diagram import (
+    LazyPatchedPhaseDiagram,
+    _LayoutReader,
+    _partition_entries,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from numpy.typing import ArrayLike
+    from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram
+    from pymatgen.core import Composition
+
+    from qmof_thermo.composition import CompositionLike
+
+LOGGER = getLogger(__name__)
+
+_DEFAULT_REFERENCE_CSV = (
+    Path(__file__).parent.resolve() / "elemental_reference_DFT_ESEN_UMA_12_25.csv"
+)
+
+
+@dataclass
+class EnergyCorrection:
+    """
+    Per-element energy shifts added to total energies.
+
+    The corrected total energy of a composition is its energy plus the sum
+    over its elements of the number of atoms times the shift of the
+    element. Elements without a shift are left uncorrected.
+
+    Attributes
+    ----------
+    name
+        Name of the correction scheme.
+    shifts
+        Energy shift in eV per atom of each element symbol.
+    """
+
+    name: str
+    shifts: dict[str, float]
+
+    @classmethod
+    def from_table(
+        cls,
+        column: str,
+        path: Path | str = _DEFAULT_REFERENCE_CSV,
+        name: str | None = None,
+    ) -> EnergyCorrection:
+        """
+        Read the shifts from a column of a table of elemental references.
+
+        Parameters
+        ----------
+        column
+            Column holding the shifts, e.g. ``"DFT_minus_UMA"``.
+        path
+            Path to a CSV table with an ``element`` column. Defaults to the
+            DFT, UMA and eSEN elemental references shipped with the package.
+        name
+            Name of the correction scheme. Defaults to ``column``.
+
+        Returns
+        -------
+        EnergyCorrection
+            The correction scheme.
+
+        Raises
+        ------
+        KeyError
+            If ``column`` is not a column of the table.
+        """
+        df = pd.read_csv(path)
+        if column not in df.columns:
+            raise KeyError(f"Column '{column}' not found in {path}.")
+        shifts = dict(zip(df["element"], df[column].astype(float), strict=True))
+        return cls(name or column, shifts)
+
+    @classmethod
+    def uma(cls) -> EnergyCorrection:
+        """
+        Get the correction of UMA-ODAC energies to DFT.
+
+        Returns
+        -------
+        EnergyCorrection
+            Shifts from the ``DFT_minus_UMA`` elemental references.
+        """
+        return cls.from_table("DFT_minus_UMA", name="uma_dft")
+
+    @classmethod
+    def esen(cls) -> EnergyCorrection:
+        """
+        Get the correction of eSEN-ODAC energies to DFT.
+
+        Returns
+        -------
+        EnergyCorrection
+            Shifts from the ``DFT_minus_ESEN`` elemental references.
+        """
+        return cls.from_table("DFT_minus_ESEN", name="esen_dft")
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 digest of the shifts, used to key corrected diagrams."""
+        payload = json.dumps(sorted(self.shifts.items())).encode()
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_shifts(self, compositions: Sequence[Composition]) -> np.ndarray:
+        """
+        Compute the total energy shift of many compositions at once.
+
+        Parameters
+        ----------
+        compositions
+            Input compositions.
+
+        Returns
+        -------
+        np.ndarray
+            Energy shift in eV of each composition, the product of its
+            element amounts with the vector of shifts.
+        """
+        elements = sorted({el for c in compositions for el in c.elements})
+        element_index = {el: j for j, el in enumerate(elements)}
+        if missing := [el.symbol for el in elements if el.symbol not in self.shifts]:
+            LOGGER.warning(
+                f"No {self.name} correction for {missing}; leaving them uncorrected."
+            )
+
+        amounts = np.zeros((len(compositions), len(elements)))
+        for i, composition in enumerate(compositions):
+            for el, amt in composition.items():
+                amounts[i, element_index[el]] = amt
+        shifts = np.array([self.shifts.get(el.symbol, 0.0) for el in elements])
+        return amounts @ shifts
+
+    def correct_energies(
+        self, structs: Sequence[CompositionLike], energies: ArrayLike
+    ) -> np.ndarray:
+        """
+        Correct the total energies of many structures.
+
+        Parameters
+        ----------
+        structs
+            Input structures, in any form accepted by
+            :func:`qmof_thermo.get_energy_above_hull`.
+        energies
+            Total energies of the structures in eV.
+
+        Returns
+        -------
+        np.ndarray
+            Corrected total energies in eV.
+        """
+        compositions = [get_composition(struct) for struct in structs]
+        return np.asarray(energies, dtype=float) + self.get_shifts(compositions)
+
+    def correct_entries(self, entries: Sequence[PDEntry]) -> list[PDEntry]:
+        """
+        Correct the energies of phase diagram entries.
+
+        Parameters
+        ----------
+        entries
+            Entries to correct. They are not modified.
+
+        Returns
+        -------
+        list[PDEntry]
+            New entries with corrected energies and the same names and
+            attributes.
+        """
+        shifts = self.get_shifts([e.composition for e in entries])
+        return [
+            PDEntry(e.composition, e.energy + shift, name=e.name, attribute=e.attribute)
+            for e, shift in zip(entries, shifts.tolist(), strict=True)
+        ]
+
+    def correct_phase_diagram(
+        self, ppd: PatchedPhaseDiagram
+    ) -> LazyPatchedPhaseDiagram:
+        """
+        Correct every entry of a PatchedPhaseDiagram.
+
+        Parameters
+        ----------
+        ppd
+            Phase diagram to correct. It is not modified.
+
+        Returns
+        -------
+        LazyPatchedPhaseDiagram
+            Phase diagram of the corrected entries, whose sub-space convex
+            hulls are computed on first use.
+        """
+        layout = _partition_entries(self.correct_entries(ppd.all_entries))
+        return LazyPatchedPhaseDiagram(
+            layout.elements, layout.spaces, _LayoutReader(layout)
+        )
@@ -0,0 +1,175 @@
+"""
+Module for calculating formation energies from elemental references.
+"""
+
+from __future__ import annotations
+
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+from pymatgen.core import Composition
+
+from qmof_thermo.composition import get_composition
+from qmof_thermo.hull import _DEFAULT_PD_JSON, _get_cached_diagram, _get_fraction_matrix
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+    from typing import Literal
+
+    from numpy.typing import ArrayLike
+    from pymatgen.core import Element
+
+    from qmof_thermo.composition import CompositionLike
+    from qmof_thermo.correction import EnergyCorrection
+
+LOGGER = getLogger(__name__)
+
+
+def _read_elemental_references(
+    references: Mapping[str, float] | str | Path | None,
+    reference_column: str,
+    serialized_phase_diagram: Path | str,
+    reference_correction: EnergyCorrection | None = None,
+) -> dict[str, float]:
+    """
+    Get the energy per atom of each elemental reference.
+
+    Parameters
+    ----------
+    references
+        Mapping from element symbol to energy, path to a CSV table, or None
+        for the elemental entries of the phase diagram.
+    reference_column
+        Column of the CSV table holding the energies.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    reference_correction
+        Correction applied to the entries of the phase diagram.
+
+    Returns
+    -------
+    dict[str, float]
+        Energy per atom in eV of each element.
+    """
+    if references is None:
+        ppd = _get_cached_diagram(
+            serialized_phase_diagram, correction=reference_correction
+        ).ppd
+        return {el.symbol: entry.energy_per_atom for el, entry in ppd.el_refs.items()}
+    if isinstance(references, str | Path):
+        df = pd.read_csv(references)
+        if reference_column not in df.columns:
+            raise KeyError(f"Column '{reference_column}' not found in {references}.")
+        return dict(zip(df["element"], df[reference_column].astype(float), strict=True))
+    return {str(el): float(energy) for el, energy in references.items()}
+
+
+def get_formation_energies(
+    structs: Sequence[CompositionLike],
+    energies: ArrayLike,
+    references: Mapping[str, float] | str | Path | None = None,
+    reference_column: str = "DFT",
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+    on_error: Literal["raise", "ignore"] = "ignore",
+    correction: EnergyCorrection | None = None,
+    reference_correction: EnergyCorrection | None = None,
+) -> np.ndarray:
+    """
+    Calculate the formation energy per atom of many structures at once.
+
+    The formation energy is the energy per atom minus the
+    composition-weighted energies of the elemental references. Distinct
+    compositions are only parsed once, and the reference energies of all
+    inputs are computed as a single product of their atomic-fraction matrix
+    with the vector of elemental references.
+
+    Parameters
+    ----------
+    structs
+        Input structures, in any form accepted by
+        :func:`qmof_thermo.get_energy_above_hull`. Formula strings and
+        Composition objects repeated across inputs are parsed once.
+    energies
+        Total energies of the structures in eV.
+    references
+        Elemental references, as a mapping from element symbol to energy
+        per atom in eV, or the path to a CSV table with an ``element``
+        column such as
+        ``data/external/elemental_reference_DFT_ESEN_UMA_12_25.csv``.
+        Defaults to the elemental entries of the phase diagram.
+    reference_column
+        Column of the CSV table holding the reference energies, e.g.
+        ``"DFT"``, ``"UMA"`` or ``"ESEN"``.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram, used if ``references``
+        is None.
+    on_error
+        What to do for an input containing an element without a reference.
+        ``"raise"`` raises a ValueError, ``"ignore"`` logs a warning and
+        stores NaN for that input.
+    correction
+        Per-element correction applied to ``energies``.
+    reference_correction
+        Per-element correction applied to the entries of the phase diagram,
+        if ``references`` is None.
+
+    Returns
+    -------
+    np.ndarray
+        Formation energies in eV/atom, in the same order as ``structs``.
+
+    Raises
+    ------
+    ValueError
+        If ``structs`` and ``energies`` differ in length, or if
+        ``on_error="raise"`` and an element has no reference.
+    KeyError
+        If ``reference_column`` is not a column of the CSV table.
+    """
+    energies = np.asarray(energies, dtype=float)
+    if energies.shape != (len(structs),):
+        msg = (
+            f"Got {len(structs)} structures but {energies.size} energies; "
+            "they must have the same length."
+        )
+        raise ValueError(msg)
+
+    # Parse each distinct formula or Composition only once
+    compositions: list[Composition] = []
+    seen: dict[str | Composition, int] = {}
+    inverse = np.empty(len(structs), dtype=np.int64)
+    for i, struct in enumerate(structs):
+        if isinstance(struct, str | Composition):
+            if (j := seen.get(struct)) is None:
+                j = seen[struct] = len(compositions)
+                compositions.append(get_composition(struct))
+        else:
+            j = len(compositions)
+            compositions.append(get_composition(struct))
+        inverse[i] = j
+
+    el_refs = _read_elemental_references(
+        references, reference_column, serialized_phase_diagram, reference_correction
+    )
+    elements: list[Element] = sorted({el for c in compositions for el in c.elements})
+    ref_energies = np.array([el_refs.get(el.symbol, np.nan) for el in elements])
+    if missing := [
+        el.symbol for el, e in zip(elements, ref_energies, strict=True) if np.isnan(e)
+    ]:
+        msg = f"No elemental reference for {missing}."
+        if on_error == "raise":
+            raise ValueError(msg)
+        LOGGER.warning(f"{msg} Storing NaN for the inputs containing them.")
+
+    fractions = _get_fraction_matrix(
+        compositions, {el: j for j, el in enumerate(elements)}
+    )
+    reference = fractions @ np.nan_to_num(ref_energies)
+    reference[(fractions[:, np.isnan(ref_energies)] > 0).any(axis=1)] = np.nan
+    if correction is not None:
+        energies = energies + correction.get_shifts(compositions)[inverse]
+    n_atoms = np.array([c.num_atoms for c in compositions])
+    return energies / n_atoms[inverse] - reference[inverse]
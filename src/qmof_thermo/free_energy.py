@@ -0,0 +1,379 @@
+"""
+Module for calculating free energies above hull over a temperature grid.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram, PhaseDiagram
+
+from qmof_thermo.composition import get_composition
+from qmof_thermo.hull import (
+    _CACHE_MAXSIZE,
+    _DEFAULT_PD_JSON,
+    _get_cached_diagram,
+    _get_fraction_matrix,
+    _SubspaceIndex,
+)
+from qmof_thermo.phase_diagram import _entry_id
+from qmof_thermo.uncertainty import _lower_hull_facets
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+    from pathlib import Path
+
+    from numpy.typing import ArrayLike
+    from pymatgen.core import Element
+
+    from qmof_thermo.composition import CompositionLike
+
+LOGGER = getLogger(__name__)
+
+
+@dataclass
+class _FreeEnergyDiagram:
+    """
+    Reference free energies of a phase diagram on a temperature grid.
+
+    Only the lowest free energy of each composition that has a negative
+    formation free energy at some temperature of the grid, and the elemental
+    references, are kept. The chemical sub-spaces cover all of them, so the
+    same sub-space serves a query at every temperature.
+
+    Attributes
+    ----------
+    elements
+        Elements of the phase diagram.
+    masks
+        Element mask of each reference composition, shape
+        (n_references, n_elements).
+    fractions
+        Atomic fractions of each reference composition, shape
+        (n_references, n_elements).
+    energies
+        Free energy per atom of each reference composition at each
+        temperature, shape (n_references, n_temperatures).
+    stable
+        Whether each reference composition can be on the hull at each
+        temperature, shape (n_references, n_temperatures).
+    index
+        Bitmask index of the chemical sub-spaces.
+    planes
+        Lower-hull facet planes of each sub-space at each temperature,
+        computed on first use.
+    """
+
+    elements: list[Element]
+    masks: np.ndarray
+    fractions: np.ndarray
+    energies: np.ndarray
+    stable: np.ndarray
+    index: _SubspaceIndex
+    planes: dict[frozenset[Element], tuple[np.ndarray, list[np.ndarray]]] = field(
+        default_factory=dict
+    )
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get_planes(
+        self, space: frozenset[Element]
+    ) -> tuple[np.ndarray, list[np.ndarray]]:
+        """
+        Get the lower-hull facet planes of a sub-space at every temperature.
+
+        The hull is swept through the temperature grid in order. The facets
+        of the previous temperature are kept as long as the planes through
+        them, recomputed from the new free energies, still lie below every
+        reference composition, which makes them the new lower hull; the hull
+        is only rebuilt when a reaction crosses over.
+
+        Parameters
+        ----------
+        space
+            Chemical sub-space.
+
+        Returns
+        -------
+        tuple[np.ndarray, list[np.ndarray]]
+            Column of each element of the sub-space in ``elements``, and
+            for each temperature the elemental chemical potentials on each
+            facet, shape (n_facets, len(space)).
+        """
+        if (planes := self.planes.get(space)) is not None:
+            return planes
+
+        inside = np.array([el in space for el in self.elements])
+        columns = np.flatnonzero(inside)
+        rows = ~self.masks[:, ~inside].any(axis=1)
+        fractions = self.fractions[np.ix_(rows, columns)]
+        energies = self.energies[rows]
+        stable = self.stable[rows]
+
+        facets = inverse = None
+        chempots_per_t = []
+        for t in range(energies.shape[1]):
+            if facets is not None:
+                chempots = np.einsum("fij,fj->fi", inverse, energies[facets, t])
+                e_hull = (fractions @ chempots.T).max(axis=1)
+                if np.all(e_hull <= energies[:, t] + PhaseDiagram.numerical_tol):
+                    chempots_per_t.append(chempots)
+                    continue
+
+            candidates = np.flatnonzero(stable[:, t])
+            facets = candidates[
+                _lower_hull_facets(fractions[candidates], energies[candidates, t])
+            ]
+            inverse = np.linalg.inv(fractions[facets])
+            chempots_per_t.append(np.einsum("fij,fj->fi", inverse, energies[facets, t]))
+
+        with self.lock:
+            return self.planes.setdefault(space, (columns, chempots_per_t))
+
+
+# (diagram digest, reference digest, temperatures) -> free-energy diagram
+_FREE_ENERGY_CACHE: OrderedDict[tuple[str, str, bytes], _FreeEnergyDiagram] = (
+    OrderedDict()
+)
+_FREE_ENERGY_CACHE_LOCK = threading.Lock()
+
+
+def _reference_digest(reference_free_energies: Mapping[str, ArrayLike] | None) -> str:
+    """Hash reference free energies, to key the cached diagrams."""
+    sha = hashlib.sha256()
+    for key, values in sorted((reference_free_energies or {}).items()):
+        sha.update(key.encode())
+        sha.update(np.asarray(values, dtype=float).tobytes())
+    return sha.hexdigest()
+
+
+def _build_free_energy_diagram(
+    ppd: PatchedPhaseDiagram,
+    temperatures: np.ndarray,
+    reference_free_energies: Mapping[str, ArrayLike] | None,
+) -> _FreeEnergyDiagram:
+    """
+    Tabulate the reference free energies of a phase diagram.
+
+    Parameters
+    ----------
+    ppd
+        Phase diagram holding the reference entries.
+    temperatures
+        Temperatures in K.
+    reference_free_energies
+        Total free energy in eV of reference entries at each temperature,
+        keyed by MPID or entry name.
+
+    Returns
+    -------
+    _FreeEnergyDiagram
+        The reference free energies and their chemical sub-spaces.
+    """
+    elements = list(ppd.elements)
+    element_index = {el: j for j, el in enumerate(elements)}
+    reference_free_energies = reference_free_energies or {}
+
+    # Lowest free energy per atom of each reduced composition
+    keyed = sorted(
+        ((e.composition.reduced_composition, e) for e in ppd.all_entries),
+        key=lambda p: p[0],
+    )
+    compositions, energies = [], []
+    n_missing = 0
+    for composition, group in itertools.groupby(keyed, key=lambda p: p[0]):
+        group_energies = []
+        for _, entry in group:
+            key = _entry_id(entry) or entry.name
+            if key in reference_free_energies:
+                values = np.asarray(reference_free_energies[key], dtype=float)
+                if values.shape != temperatures.shape:
+                    msg = (
+                        f"Got {values.size} reference free energies for {key} "
+                        f"but {temperatures.size} temperatures."
+                    )
+                    raise ValueError(msg)
+            else:
+                n_missing += 1
+                values = np.full(temperatures.shape, entry.energy)
+            group_energies.append(values / entry.composition.num_atoms)
+        compositions.append(composition)
+        energies.append(np.min(group_energies, axis=0))
+    if reference_free_energies and n_missing:
+        LOGGER.info(
+            f"{n_missing} reference entries have no free energies; "
+            "using their energies at every temperature."
+        )
+
+    fractions = _get_fraction_matrix(compositions, element_index)
+    energies = np.array(energies).reshape(len(compositions), len(temperatures))
+    masks = fractions > 0
+    is_element = masks.sum(axis=1) == 1
+
+    # Elemental references at each temperature
+    el_refs = np.full((len(elements), len(temperatures)), np.inf)
+    for i in np.flatnonzero(is_element):
+        j = int(np.flatnonzero(masks[i])[0])
+        el_refs[j] = np.minimum(el_refs[j], energies[i])
+    if missing := [
+        str(el) for el, e in zip(elements, el_refs[:, 0], strict=True) if np.isinf(e)
+    ]:
+        raise ValueError(f"Missing terminal entries for elements {missing}")
+
+    # Only compositions with a negative formation free energy, or elemental
+    # references, can be on the hull at a given temperature
+    form_e = energies - fractions @ el_refs
+    stable = (form_e < -PhaseDiagram.formation_energy_tol) | is_element[:, None]
+    keep = stable.any(axis=1)
+
+    spaces = {
+        frozenset(elements[j] for j in np.flatnonzero(mask))
+        for mask in masks[keep & ~is_element]
+    }
+    spaces = sorted(
+        PatchedPhaseDiagram.remove_redundant_spaces(spaces), key=len, reverse=True
+    )
+    return _FreeEnergyDiagram(
+        elements,
+        masks[keep],
+        fractions[keep],
+        energies[keep],
+        stable[keep],
+        _SubspaceIndex.from_spaces(spaces, elements),
+    )
+
+
+def _get_free_energy_diagram(
+    serialized_phase_diagram: Path | str,
+    temperatures: np.ndarray,
+    reference_free_energies: Mapping[str, ArrayLike] | None,
+) -> _FreeEnergyDiagram:
+    """
+    Get the reference free energies of a phase diagram, reusing a cached copy.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    temperatures
+        Temperatures in K.
+    reference_free_energies
+        Total free energy in eV of reference entries at each temperature.
+
+    Returns
+    -------
+    _FreeEnergyDiagram
+        The same object for repeated calls with the same diagram, grid and
+        reference free energies.
+    """
+    diagram = _get_cached_diagram(serialized_phase_diagram)
+    key = (
+        diagram.digest,
+        _reference_digest(reference_free_energies),
+        temperatures.tobytes(),
+    )
+    with _FREE_ENERGY_CACHE_LOCK:
+        if key in _FREE_ENERGY_CACHE:
+            _FREE_ENERGY_CACHE.move_to_end(key)
+            return _FREE_ENERGY_CACHE[key]
+
+    free_energy_diagram = _build_free_energy_diagram(
+        diagram.ppd, temperatures, reference_free_energies
+    )
+    with _FREE_ENERGY_CACHE_LOCK:
+        free_energy_diagram = _FREE_ENERGY_CACHE.setdefault(key, free_energy_diagram)
+        while len(_FREE_ENERGY_CACHE) > _CACHE_MAXSIZE:
+            _FREE_ENERGY_CACHE.popitem(last=False)
+    return free_energy_diagram
+
+
+def get_free_energy_above_hull(
+    structs: Sequence[CompositionLike],
+    free_energies: ArrayLike,
+    temperatures: ArrayLike,
+    reference_free_energies: Mapping[str, ArrayLike] | None = None,
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+) -> np.ndarray:
+    """
+    Calculate the free energy above hull of many structures on a temperature grid.
+
+    The reference free energies are tabulated once per grid, and the
+    chemical sub-spaces are chosen to hold every composition that is stable
+    at some temperature, so each input is assigned to one sub-space for the
+    whole grid. Each sub-space hull is then built once per temperature from
+    arrays and cached, and all inputs in it are evaluated at once.
+
+    Parameters
+    ----------
+    structs
+        Input structures, in any form accepted by
+        :func:`qmof_thermo.get_energy_above_hull`.
+    free_energies
+        Total free energies of the structures in eV at each temperature,
+        shape (len(structs), len(temperatures)).
+    temperatures
+        Temperatures in K.
+    reference_free_energies
+        Total free energy in eV of reference entries at each temperature,
+        keyed by MPID or, for diagrams without MPIDs, entry name. Entries
+        missing from it keep their energy at every temperature.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram holding the reference
+        entries.
+
+    Returns
+    -------
+    np.ndarray
+        Free energies above hull in eV/atom, shape
+        (len(structs), len(temperatures)), negative for inputs below the
+        reference hull. Inputs outside every sub-space hold NaN.
+
+    Raises
+    ------
+    ValueError
+        If ``free_energies`` or ``reference_free_energies`` do not match
+        the inputs and temperature grid.
+    """
+    compositions = [get_composition(struct) for struct in structs]
+    temperatures = np.atleast_1d(np.asarray(temperatures, dtype=float))
+    free_energies = np.asarray(free_energies, dtype=float)
+    if free_energies.shape != (len(compositions), len(temperatures)):
+        msg = (
+            f"Got free energies of shape {free_energies.shape} for "
+            f"{len(compositions)} structures and {len(temperatures)} "
+            "temperatures."
+        )
+        raise ValueError(msg)
+
+    diagram = _get_free_energy_diagram(
+        serialized_phase_diagram, temperatures, reference_free_energies
+    )
+
+    groups: dict[frozenset[Element] | None, list[int]] = defaultdict(list)
+    for i, composition in enumerate(compositions):
+        groups[diagram.index.find(frozenset(composition.elements))].append(i)
+    if None in groups:
+        LOGGER.warning(
+            f"No sub-space covers {len(groups[None])} inputs; storing NaN for them."
+        )
+
+    n_atoms = np.array([c.num_atoms for c in compositions])
+    g_hull = np.full(free_energies.shape, np.nan)
+    element_index = {el: j for j, el in enumerate(diagram.elements)}
+    for space, indices in groups.items():
+        if space is None:
+            continue
+        fractions = _get_fraction_matrix(
+            [compositions[i] for i in indices], element_index
+        )
+        columns, chempots_per_t = diagram.get_planes(space)
+        for t, chempots in enumerate(chempots_per_t):
+            g_hull[indices, t] = (fractions[:, columns] @ chempots.T).max(axis=1)
+
+    return free_energies / n_atoms[:, None] - g_hull
@@ -4,26 +4,1122 @@ Module for calculating energy above hull.
 
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from logging import getLogger
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from ase import Atoms
-from monty.serialization import loadfn
-from pymatgen.analysis.phase_diagram import PDEntry
-from pymatgen.io.ase import AseAtomsAdaptor
+import numpy as np
+import pandas as pd
+from monty.serialization import dumpfn, loadfn
+from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram, PhaseDiagram
+from pymatgen.core import Composition
 
-from qmof_thermo.phase_diagram import _DEFAULT_PD_FILENAME
+from qmof_thermo.compact import read_compact_phase_diagram
+from qmof_thermo.composition import get_composition
+from qmof_thermo.phase_diagram import (
+    _DEFAULT_PD_FILENAME,
+    LazyPatchedPhaseDiagram,
+    read_lazy_phase_diagram,
+)
 
 if TYPE_CHECKING:
-    from pymatgen.core import Structure
+    from collections.abc import Iterable, Sequence
+    from typing import Literal
+
+    from numpy.typing import ArrayLike
+    from pymatgen.core import Element
+
+    from qmof_thermo.composition import CompositionLike
+    from qmof_thermo.correction import EnergyCorrection
+
+LOGGER = getLogger(__name__)
 
 _DEFAULT_PD_JSON = Path(__file__).parent.resolve() / _DEFAULT_PD_FILENAME
 
+# Maximum number of deserialized phase diagrams kept in memory at once.
+_CACHE_MAXSIZE = 4
+
+# Maximum number of memoized hull energies, least recently used dropped first.
+_HULL_MEMO_MAXSIZE = 200_000
+
+# Significant digits used when keying compositions in the hull-energy memo.
+_COMPOSITION_KEY_DIGITS = 12
+
+
+@dataclass
+class _CachedDiagram:
+    """
+    A deserialized phase diagram held in the in-memory cache.
+
+    Attributes
+    ----------
+    ppd
+        The deserialized PatchedPhaseDiagram.
+    digest
+        SHA-256 digest of the serialized file, used to key hull energies.
+    """
+
+    ppd: PatchedPhaseDiagram
+    digest: str
+
+
+_CACHE: OrderedDict[tuple, _CachedDiagram] = OrderedDict()
+_CACHE_LOCK = threading.RLock()
+
+# (diagram digest, composition key) -> (hull energy per atom, decomposition)
+_HULL_MEMO: OrderedDict[tuple[str, str], tuple[float, dict[str, float]]] = OrderedDict()
+_HULL_MEMO_LOCK = threading.Lock()
+
+
+def _memo_get(
+    keys: Sequence[tuple[str, str]],
+) -> list[tuple[float, dict[str, float]] | None]:
+    """
+    Look up memoized hull energies, marking the ones found as recently used.
+
+    Parameters
+    ----------
+    keys
+        Pairs of diagram digest and composition key.
+
+    Returns
+    -------
+    list[tuple[float, dict[str, float]] | None]
+        The memoized hull energy and decomposition of each key, or None.
+    """
+    with _HULL_MEMO_LOCK:
+        results = [_HULL_MEMO.get(key) for key in keys]
+        for key, result in zip(keys, results, strict=True):
+            if result is not None:
+                _HULL_MEMO.move_to_end(key)
+    return results
+
+
+def _memo_update(
+    items: Iterable[tuple[tuple[str, str], tuple[float, dict[str, float]] | None]],
+) -> None:
+    """
+    Memoize hull energies, dropping the least recently used beyond the limit.
+
+    Parameters
+    ----------
+    items
+        Pairs of key, as in :func:`_memo_get`, and hull energy. Keys whose
+        hull energy is None are skipped.
+
+    Returns
+    -------
+    None
+    """
+    with _HULL_MEMO_LOCK:
+        for key, result in items:
+            if result is not None:
+                _HULL_MEMO[key] = result
+                _HULL_MEMO.move_to_end(key)
+        while len(_HULL_MEMO) > _HULL_MEMO_MAXSIZE:
+            _HULL_MEMO.popitem(last=False)
+
+
+def _evict_diagram(diagram: _CachedDiagram) -> None:
+    """
+    Drop the memoized hull energies of a diagram leaving the cache.
+
+    Entries are kept if another cached diagram has the same digest.
+
+    Parameters
+    ----------
+    diagram
+        The diagram removed from the cache.
+
+    Returns
+    -------
+    None
+    """
+    if any(cached.digest == diagram.digest for cached in _CACHE.values()):
+        return
+    with _HULL_MEMO_LOCK:
+        for key in [key for key in _HULL_MEMO if key[0] == diagram.digest]:
+            del _HULL_MEMO[key]
+
+
+def _cache_key(serialized_phase_diagram: Path | str) -> tuple[str, int, int]:
+    """
+    Build the cache key for a serialized phase diagram.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+
+    Returns
+    -------
+    tuple[str, int, int]
+        The resolved path, modification time (ns), and size (bytes) of the file,
+        so that a diagram rewritten in place is never served stale.
+    """
+    path = Path(serialized_phase_diagram).resolve()
+    stat = path.stat()
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def _read_phase_diagram(path: Path, lazy: bool) -> PatchedPhaseDiagram:
+    """
+    Deserialize a JSON or compact ``.npz`` PatchedPhaseDiagram.
+
+    Parameters
+    ----------
+    path
+        Path to the serialized PatchedPhaseDiagram.
+    lazy
+        Whether to only build each sub-space when a query first needs it.
+
+    Returns
+    -------
+    PatchedPhaseDiagram
+        The deserialized phase diagram.
+    """
+    if path.suffix == ".npz":
+        return read_compact_phase_diagram(path, lazy=lazy)
+    return read_lazy_phase_diagram(path) if lazy else loadfn(path)
+
+
+def _get_cached_diagram(
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+    lazy: bool = True,
+    correction: EnergyCorrection | None = None,
+) -> _CachedDiagram:
+    """
+    Load a serialized PatchedPhaseDiagram, reusing a cached copy if available.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    lazy
+        Whether to only build each sub-space when a query first needs it.
+        If False and a lazily loaded copy is cached, its remaining
+        sub-spaces are built.
+    correction
+        Correction applied to the energies of all entries. The corrected
+        diagram is cached separately from the uncorrected one.
+
+    Returns
+    -------
+    _CachedDiagram
+        The deserialized phase diagram and its digest. The same object is
+        returned for repeated calls until the file changes or the cache is
+        cleared.
+    """
+    key = _cache_key(serialized_phase_diagram)
+    if correction is not None:
+        key = (*key, correction.digest)
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            diagram = _CACHE[key]
+        elif correction is not None:
+            base = _get_cached_diagram(serialized_phase_diagram)
+            LOGGER.info(f"Applying the {correction.name} correction to: {key[0]}")
+            diagram = _CachedDiagram(
+                correction.correct_phase_diagram(base.ppd),
+                hashlib.sha256((base.digest + correction.digest).encode()).hexdigest(),
+            )
+        else:
+            LOGGER.info(f"Loading phase diagram from: {key[0]}")
+            path = Path(key[0])
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            diagram = _CachedDiagram(_read_phase_diagram(path, lazy), digest)
+        if key not in _CACHE:
+            _get_subspace_index(diagram.ppd)
+            _CACHE[key] = diagram
+            while len(_CACHE) > _CACHE_MAXSIZE:
+                _evict_diagram(_CACHE.popitem(last=False)[1])
+
+    if not lazy and isinstance(diagram.ppd, LazyPatchedPhaseDiagram):
+        diagram.ppd.materialize()
+    return diagram
+
+
+def preload(
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON, lazy: bool = False
+) -> PatchedPhaseDiagram:
+    """
+    Load a serialized PatchedPhaseDiagram into the in-memory cache.
+
+    Subsequent calls to the hull functions with the same file reuse the
+    cached object instead of deserializing it again.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    lazy
+        Whether to only index the chemical sub-spaces and build each of them
+        when a query first needs it. The hull functions load diagrams lazily
+        unless they were preloaded with ``lazy=False``.
+
+    Returns
+    -------
+    PatchedPhaseDiagram
+        The cached phase diagram.
+    """
+    return _get_cached_diagram(serialized_phase_diagram, lazy=lazy).ppd
+
+
+def clear_cache(hull_energies: bool = True) -> None:
+    """
+    Remove all phase diagrams from the in-memory cache.
+
+    Parameters
+    ----------
+    hull_energies
+        Whether to also clear the memoized hull energies. These are keyed by
+        the digest of the diagram file, so keeping them is always safe.
+
+    Returns
+    -------
+    None
+    """
+    with _CACHE_LOCK:
+        _CACHE.clear()
+    if hull_energies:
+        with _HULL_MEMO_LOCK:
+            _HULL_MEMO.clear()
+
+
+def save_hull_cache(path: Path | str) -> None:
+    """
+    Write the memoized hull energies and decompositions to disk.
+
+    Parameters
+    ----------
+    path
+        Path of the JSON file to write.
+
+    Returns
+    -------
+    None
+    """
+    with _HULL_MEMO_LOCK:
+        records = [
+            [digest, key, e_hull, decomp]
+            for (digest, key), (e_hull, decomp) in _HULL_MEMO.items()
+        ]
+    dumpfn({"hull_energies": records}, path)
+    LOGGER.info(f"Saved {len(records)} memoized hull energies to: {path}")
+
+
+def load_hull_cache(path: Path | str) -> None:
+    """
+    Merge memoized hull energies written by :func:`save_hull_cache`.
+
+    Parameters
+    ----------
+    path
+        Path of the JSON file to read.
+
+    Returns
+    -------
+    None
+    """
+    records = loadfn(path)["hull_energies"]
+    _memo_update(
+        ((digest, key), (float(e_hull), decomp))
+        for digest, key, e_hull, decomp in records
+    )
+    LOGGER.info(f"Loaded {len(records)} memoized hull energies from: {path}")
+
+
+def _composition_key(composition: Composition) -> str:
+    """
+    Get a hashable key for the reduced (fractional) composition.
+
+    Parameters
+    ----------
+    composition
+        Input composition.
+
+    Returns
+    -------
+    str
+        Symbol-sorted atomic fractions, e.g. ``"C0.5 H0.5"``.
+    """
+    n_atoms = composition.num_atoms
+    return " ".join(
+        sorted(
+            f"{el.symbol}{abs(amt) / n_atoms:.{_COMPOSITION_KEY_DIGITS}g}"
+            for el, amt in composition.items()
+        )
+    )
+
+
+@dataclass
+class _FacetPlanes:
+    """
+    Lower-hull facets of a PhaseDiagram as arrays for vectorized evaluation.
+
+    The lower convex hull is the pointwise maximum of the planes through its
+    facets, so the hull energy of a fractional composition ``x`` is
+    ``max(chempots @ x)``.
+
+    Attributes
+    ----------
+    element_index
+        Column index of each element of the PhaseDiagram.
+    chempots
+        Plane coefficients of each facet, shape (n_facets, n_elements).
+        These are the elemental chemical potentials on each facet.
+    inverse
+        Inverse of each facet's vertex composition matrix, shape
+        (n_facets, n_elements, n_elements), so that ``x @ inverse[f]`` are
+        the barycentric coordinates of ``x`` in facet ``f``.
+    facets
+        Indices into ``qhull_entries`` of each facet's vertices.
+    """
+
+    element_index: dict[Element, int]
+    chempots: np.ndarray
+    inverse: np.ndarray
+    facets: np.ndarray
+
+
+_FACET_PLANES: weakref.WeakKeyDictionary[PhaseDiagram, _FacetPlanes] = (
+    weakref.WeakKeyDictionary()
+)
+
+# Maximum number of (composition, facet) plane evaluations held at once.
+_MAX_CHUNK_EVALUATIONS = 2**22
+
+
+def _get_facet_planes(pd: PhaseDiagram) -> _FacetPlanes:
+    """
+    Get the lower-hull facet planes of a PhaseDiagram, computed once per diagram.
+
+    Parameters
+    ----------
+    pd
+        PhaseDiagram of a single chemical sub-space.
+
+    Returns
+    -------
+    _FacetPlanes
+        The facet planes of ``pd``.
+    """
+    if (planes := _FACET_PLANES.get(pd)) is not None:
+        return planes
+
+    element_index = {el: j for j, el in enumerate(pd.elements)}
+    fractions = _get_fraction_matrix(
+        [e.composition for e in pd.qhull_entries], element_index
+    )
+    energies = np.array([e.energy_per_atom for e in pd.qhull_entries])
+
+    facets = np.asarray(pd.facets, dtype=np.int64).reshape(-1, len(element_index))
+    inverse = np.linalg.inv(fractions[facets])
+    chempots = np.einsum("fij,fj->fi", inverse, energies[facets])
+
+    planes = _FacetPlanes(element_index, chempots, inverse, facets)
+    _FACET_PLANES[pd] = planes
+    return planes
+
+
+def _get_fraction_matrix(
+    compositions: Sequence[Composition], element_index: dict[Element, int]
+) -> np.ndarray:
+    """
+    Build the atomic-fraction matrix of compositions over a set of elements.
+
+    Parameters
+    ----------
+    compositions
+        Input compositions. Their elements must all be in ``element_index``.
+    element_index
+        Column index of each element.
+
+    Returns
+    -------
+    np.ndarray
+        Atomic fractions, shape (len(compositions), len(element_index)).
+    """
+    fractions = np.zeros((len(compositions), len(element_index)))
+    for i, composition in enumerate(compositions):
+        for el, amt in composition.items():
+            fractions[i, element_index[el]] = abs(amt) / composition.num_atoms
+    return fractions
+
+
+def _evaluate_facet_planes(
+    planes: _FacetPlanes, fractions: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Evaluate hull energies for many compositions in one vectorized pass.
+
+    Parameters
+    ----------
+    planes
+        Facet planes of the PhaseDiagram.
+    fractions
+        Atomic fractions, shape (N, n_elements).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        Hull energies in eV/atom (N,), the index of the facet each
+        composition falls in (N,), and the barycentric coordinates within
+        that facet (N, n_elements).
+    """
+    e_hull = np.empty(len(fractions))
+    best = np.empty(len(fractions), dtype=np.int64)
+    chunk = max(1, _MAX_CHUNK_EVALUATIONS // max(1, len(planes.chempots)))
+    for start in range(0, len(fractions), chunk):
+        values = fractions[start : start + chunk] @ planes.chempots.T
+        best[start : start + chunk] = np.argmax(values, axis=1)
+        e_hull[start : start + chunk] = np.take_along_axis(
+            values, best[start : start + chunk, None], axis=1
+        )[:, 0]
+
+    bary = np.einsum("ni,nij->nj", fractions, planes.inverse[best])
+    return e_hull, best, bary
+
+
+def _compute_hull_energies(
+    pd: PhaseDiagram,
+    compositions: Sequence[Composition],
+    engine: Literal["numpy", "pymatgen"],
+) -> list[tuple[float, dict[str, float]] | None]:
+    """
+    Compute hull energies and decompositions of compositions in one diagram.
+
+    Parameters
+    ----------
+    pd
+        Phase diagram to evaluate. The NumPy engine is only used for the
+        PhaseDiagram of a single chemical sub-space.
+    compositions
+        Input compositions.
+    engine
+        ``"numpy"`` evaluates all compositions against precomputed facet
+        planes in one pass, falling back to pymatgen for compositions that
+        do not fall cleanly inside a facet. ``"pymatgen"`` uses
+        ``get_decomp_and_hull_energy_per_atom`` for every composition.
+
+    Returns
+    -------
+    list[tuple[float, dict[str, float]] | None]
+        The hull energy in eV/atom and decomposition of each composition, or
+        None if no decomposition could be found.
+    """
+    results: list[tuple[float, dict[str, float]] | None] = [None] * len(compositions)
+    pending = list(range(len(compositions)))
+
+    if engine == "numpy" and not isinstance(pd, PatchedPhaseDiagram) and pd.facets:
+        planes = _get_facet_planes(pd)
+        inside, pending = [], []
+        for i, composition in enumerate(compositions):
+            covered = all(el in planes.element_index for el in composition.elements)
+            (inside if covered else pending).append(i)
+
+        fractions = _get_fraction_matrix(
+            [compositions[i] for i in inside], planes.element_index
+        )
+        e_hull, best, bary = _evaluate_facet_planes(planes, fractions)
+        for row, i in enumerate(inside):
+            if not np.all(bary[row] >= -PhaseDiagram.numerical_tol):
+                pending.append(i)
+                continue
+            decomp = {
+                pd.qhull_entries[f].name: float(amt)
+                for f, amt in zip(planes.facets[best[row]], bary[row], strict=True)
+                if abs(amt) > PhaseDiagram.numerical_tol
+            }
+            results[i] = (float(e_hull[row]), decomp)
+
+    for i in pending:
+        try:
+            decomp, e_hull_i = pd.get_decomp_and_hull_energy_per_atom(compositions[i])
+        except Exception:
+            continue
+        results[i] = (
+            float(e_hull_i),
+            {e.name: float(amt) for e, amt in decomp.items()},
+        )
+
+    return results
+
+
+def _get_hull_energies(
+    diagram: _CachedDiagram,
+    pd: PhaseDiagram,
+    compositions: Sequence[Composition],
+    engine: Literal["numpy", "pymatgen"] = "pymatgen",
+) -> list[tuple[float, dict[str, float]] | None]:
+    """
+    Get hull energies and decompositions of compositions, memoized.
+
+    Parameters
+    ----------
+    diagram
+        The cached diagram the compositions are evaluated against.
+    pd
+        The (sub-space) phase diagram of ``diagram`` to evaluate.
+    compositions
+        Input compositions.
+    engine
+        Engine used for compositions not yet memoized, see
+        :func:`_compute_hull_energies`.
+
+    Returns
+    -------
+    list[tuple[float, dict[str, float]] | None]
+        The hull energy in eV/atom and the decomposition (mapping of product
+        name to fraction) of each composition, or None if no decomposition
+        could be found.
+    """
+    keys = [(diagram.digest, _composition_key(c)) for c in compositions]
+    results = _memo_get(keys)
+
+    # Each distinct missing composition is only computed once
+    missing: dict[tuple[str, str], int] = {}
+    for i, (key, result) in enumerate(zip(keys, results, strict=True)):
+        if result is None:
+            missing.setdefault(key, i)
+
+    if missing:
+        computed = _compute_hull_energies(
+            pd, [compositions[i] for i in missing.values()], engine
+        )
+        computed_by_key = dict(zip(missing, computed, strict=True))
+        _memo_update(computed_by_key.items())
+        results = [
+            computed_by_key[key] if result is None else result
+            for key, result in zip(keys, results, strict=True)
+        ]
+
+    return results
+
+
+def _parse_composition(struct: CompositionLike) -> Composition:
+    """
+    Get the composition of an input, rejecting compositions without atoms.
+
+    Parameters
+    ----------
+    struct
+        Input structure, in any form accepted by :func:`get_composition`.
+
+    Returns
+    -------
+    Composition
+        The composition of the input.
+
+    Raises
+    ------
+    ValueError
+        If the composition has no atoms.
+    """
+    composition = get_composition(struct)
+    if composition.num_atoms <= 0:
+        msg = f"Composition {composition.formula!r} has no atoms."
+        raise ValueError(msg)
+    return composition
+
+
+def _parse_compositions(
+    structs: Sequence[CompositionLike], on_error: Literal["raise", "ignore"]
+) -> tuple[list[Composition | None], list[str | None]]:
+    """
+    Get the compositions of many inputs, one at a time.
+
+    Parameters
+    ----------
+    structs
+        Input structures, in any form accepted by :func:`get_composition`.
+    on_error
+        ``"raise"`` raises a ValueError for an input that cannot be parsed,
+        ``"ignore"`` logs a warning and returns None for it.
+
+    Returns
+    -------
+    list[Composition | None]
+        The composition of each input, or None if it could not be parsed.
+    list[str | None]
+        The error message of each input that could not be parsed, or None.
+
+    Raises
+    ------
+    ValueError
+        If ``on_error="raise"`` and an input cannot be parsed.
+    """
+    compositions: list[Composition | None] = []
+    errors: list[str | None] = []
+    for i, struct in enumerate(structs):
+        try:
+            compositions.append(_parse_composition(struct))
+            errors.append(None)
+        except Exception as err:
+            msg = f"Could not read the composition of input {i}: {err!r}"
+            if on_error == "raise":
+                raise ValueError(msg) from err
+            LOGGER.warning(f"{msg}. Storing NaN for it.")
+            compositions.append(None)
+            errors.append(msg)
+    return compositions, errors
+
+
+def _e_above_hull(
+    hull_energy: tuple[float, dict[str, float]] | None,
+    composition: Composition,
+    energy: float,
+) -> float | None:
+    """
+    Get the energy above hull of a composition with a given total energy.
+
+    Parameters
+    ----------
+    hull_energy
+        The hull energy and decomposition of the composition.
+    composition
+        Input composition.
+    energy
+        Total energy in eV.
+
+    Returns
+    -------
+    float | None
+        Energy above the convex hull in eV/atom, or None if no valid
+        decomposition exists.
+    """
+    if hull_energy is None:
+        return None
+
+    e_above_hull = energy / composition.num_atoms - hull_energy[0]
+    if e_above_hull < -PhaseDiagram.numerical_tol:
+        return None
+    return e_above_hull
+
+
+@dataclass
+class _SubspaceIndex:
+    """
+    Bitmask index of the chemical sub-spaces of a PatchedPhaseDiagram.
+
+    Each element of the diagram is given one bit, so that a chemical system
+    is an integer mask. Each element also has a bitset of the sub-spaces
+    containing it, so that the sub-spaces covering a chemical system are the
+    bitwise AND of the bitsets of its elements.
+
+    Attributes
+    ----------
+    spaces
+        Chemical sub-spaces, in the order of ``ppd.pds``.
+    element_bits
+        Bit of each element of the diagram.
+    space_index
+        Position in ``spaces`` of the sub-space with each mask.
+    element_spaces
+        Bitset over ``spaces`` of the sub-spaces containing each element.
+    """
+
+    spaces: list[frozenset[Element]]
+    element_bits: dict[Element, int]
+    space_index: dict[int, int]
+    element_spaces: dict[Element, int]
+
+    @classmethod
+    def from_ppd(cls, ppd: PatchedPhaseDiagram) -> _SubspaceIndex:
+        """Index the sub-spaces of a PatchedPhaseDiagram."""
+        return cls.from_spaces(list(ppd.pds), ppd.elements)
+
+    @classmethod
+    def from_spaces(
+        cls, spaces: list[frozenset[Element]], elements: Sequence[Element]
+    ) -> _SubspaceIndex:
+        """Index chemical sub-spaces, searched in the given order."""
+        element_bits = {el: 1 << j for j, el in enumerate(elements)}
+        space_index: dict[int, int] = {}
+        element_spaces = dict.fromkeys(element_bits, 0)
+        for i, space in enumerate(spaces):
+            mask = 0
+            for el in space:
+                mask |= element_bits[el]
+                element_spaces[el] |= 1 << i
+            space_index.setdefault(mask, i)
+        return cls(spaces, element_bits, space_index, element_spaces)
+
+    def find(self, chemsys: frozenset[Element]) -> frozenset[Element] | None:
+        """Find the sub-space covering a chemical system, see ``_get_subspace``."""
+        mask = 0
+        candidates = (1 << len(self.spaces)) - 1
+        for el in chemsys:
+            if el not in self.element_bits:
+                return None
+            mask |= self.element_bits[el]
+            candidates &= self.element_spaces[el]
+
+        if (i := self.space_index.get(mask)) is not None:
+            return self.spaces[i]
+        if not candidates:
+            return None
+        # The lowest set bit is the first (largest) covering sub-space
+        return self.spaces[(candidates & -candidates).bit_length() - 1]
+
+
+_SUBSPACE_INDEX: weakref.WeakKeyDictionary[PatchedPhaseDiagram, _SubspaceIndex] = (
+    weakref.WeakKeyDictionary()
+)
+_SUBSPACE_INDEX_LOCK = threading.Lock()
+
+
+def _get_subspace_index(ppd: PatchedPhaseDiagram) -> _SubspaceIndex:
+    """
+    Get the sub-space index of a PatchedPhaseDiagram, built once per diagram.
+
+    Parameters
+    ----------
+    ppd
+        The patched phase diagram.
+
+    Returns
+    -------
+    _SubspaceIndex
+        The sub-space index of ``ppd``.
+    """
+    with _SUBSPACE_INDEX_LOCK:
+        if (index := _SUBSPACE_INDEX.get(ppd)) is None:
+            index = _SUBSPACE_INDEX[ppd] = _SubspaceIndex.from_ppd(ppd)
+    return index
+
+
+def _get_subspace(
+    ppd: PatchedPhaseDiagram, chemsys: frozenset[Element]
+) -> frozenset[Element] | None:
+    """
+    Find the sub-space of a PatchedPhaseDiagram covering a chemical system.
+
+    This follows ``PatchedPhaseDiagram.get_pd_for_entry``, but does not build
+    the sub-space PhaseDiagram of a lazily loaded diagram, and looks the
+    sub-space up in a bitmask index instead of comparing element sets.
+
+    Parameters
+    ----------
+    ppd
+        The patched phase diagram.
+    chemsys
+        Elements of the chemical system.
+
+    Returns
+    -------
+    frozenset[Element] | None
+        The exact sub-space if there is one, else the first (largest)
+        superset, or None if no sub-space covers ``chemsys``.
+    """
+    return _get_subspace_index(ppd).find(chemsys)
+
+
+def _score_subspaces(
+    serialized_phase_diagram: Path | str,
+    tasks: Sequence[tuple[frozenset[Element] | None, list[Composition]]],
+    engine: Literal["numpy", "pymatgen"],
+    correction: EnergyCorrection | None = None,
+) -> list[list[tuple[float, dict[str, float]] | None]]:
+    """
+    Get memoized hull energies of compositions grouped by sub-space.
+
+    This is also the unit of work of each process in a worker pool.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    tasks
+        Pairs of sub-space (None for compositions outside every sub-space)
+        and the compositions it covers.
+    engine
+        Hull engine, see :func:`get_energies_above_hull`.
+    correction
+        Correction applied to the energies of the reference entries.
+
+    Returns
+    -------
+    list[list[tuple[float, dict[str, float]] | None]]
+        The hull energy and decomposition of each composition of each task.
+    """
+    diagram = _get_cached_diagram(serialized_phase_diagram, correction=correction)
+    ppd = diagram.ppd
+    return [
+        _get_hull_energies(
+            diagram, ppd if space is None else ppd.pds[space], compositions, engine
+        )
+        for space, compositions in tasks
+    ]
+
+
+def _diagram_process_pool(
+    serialized_phase_diagram: Path | str,
+    n_workers: int,
+    correction: EnergyCorrection | None = None,
+) -> ProcessPoolExecutor:
+    """
+    Start a process pool whose workers hold a phase diagram in memory.
+
+    Workers are forked where possible, inheriting the cached diagram instead
+    of receiving it by pickle; otherwise each worker loads it once from disk.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    n_workers
+        Number of worker processes.
+    correction
+        Correction applied to the energies of the reference entries.
+
+    Returns
+    -------
+    ProcessPoolExecutor
+        The process pool.
+    """
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in start_methods else None)
+    return ProcessPoolExecutor(
+        n_workers,
+        mp_context=context,
+        initializer=_get_cached_diagram,
+        initargs=(serialized_phase_diagram, True, correction),
+    )
+
+
+def _score_subspaces_parallel(
+    serialized_phase_diagram: Path | str,
+    diagram: _CachedDiagram,
+    tasks: Sequence[tuple[frozenset[Element] | None, list[Composition]]],
+    engine: Literal["numpy", "pymatgen"],
+    n_workers: int,
+    correction: EnergyCorrection | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> list[list[tuple[float, dict[str, float]] | None]]:
+    """
+    Run :func:`_score_subspaces` over a pool of worker processes.
+
+    Sub-spaces are dealt out to workers in balanced chunks, largest first,
+    so each worker only builds the sub-spaces it needs. Hull energies
+    computed by the workers are merged into the memo of this process.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    diagram
+        The cached diagram, used to key the memoized hull energies.
+    tasks
+        Pairs of sub-space and the compositions it covers.
+    engine
+        Hull engine, see :func:`get_energies_above_hull`.
+    n_workers
+        Number of worker processes.
+    correction
+        Correction applied to the energies of the reference entries.
+    pool
+        Pool from :func:`_diagram_process_pool` for the same diagram and
+        correction, reused instead of starting a new one.
+
+    Returns
+    -------
+    list[list[tuple[float, dict[str, float]] | None]]
+        The hull energy and decomposition of each composition of each task,
+        in the order of ``tasks``.
+    """
+    n_workers = min(n_workers, len(tasks))
+    chunks: list[list[int]] = [[] for _ in range(n_workers)]
+    loads = [0] * n_workers
+    for t in sorted(range(len(tasks)), key=lambda t: -len(tasks[t][1])):
+        worker = loads.index(min(loads))
+        chunks[worker].append(t)
+        loads[worker] += len(tasks[t][1])
+
+    LOGGER.info(f"Scoring {len(tasks)} sub-spaces over {n_workers} processes")
+
+    results: list[list[tuple[float, dict[str, float]] | None]] = [[]] * len(tasks)
+    with ExitStack() as stack:
+        if pool is None:
+            pool = stack.enter_context(
+                _diagram_process_pool(serialized_phase_diagram, n_workers, correction)
+            )
+        futures = {
+            pool.submit(
+                _score_subspaces,
+                serialized_phase_diagram,
+                [tasks[t] for t in chunk],
+                engine,
+                correction,
+            ): chunk
+            for chunk in chunks
+        }
+        for future, chunk in futures.items():
+            for t, task_result in zip(chunk, future.result(), strict=True):
+                results[t] = task_result
+
+    for (_, compositions), task_result in zip(tasks, results, strict=True):
+        _memo_update(
+            ((diagram.digest, _composition_key(c)), result)
+            for c, result in zip(compositions, task_result, strict=True)
+        )
+    return results
+
+
+@dataclass
+class HullResult:
+    """
+    Energy above hull of a single input and the hull phases it decomposes to.
+
+    Attributes
+    ----------
+    formula
+        Reduced formula of the input.
+    e_above_hull
+        Energy above the convex hull in eV/atom.
+    hull_energy
+        Energy of the convex hull at the input composition in eV/atom.
+    decomposition
+        Atomic fraction of each decomposition product, keyed by its reduced
+        formula.
+    chemical_space
+        Chemical system of the sub-space of the PatchedPhaseDiagram the
+        hull was evaluated in, e.g. ``"C-H-N-O-Zn"``.
+    """
+
+    formula: str
+    e_above_hull: float
+    hull_energy: float
+    decomposition: dict[str, float]
+    chemical_space: str
+
+    @property
+    def stoichiometry(self) -> dict[str, float]:
+        """
+        Decomposition reaction coefficients.
+
+        Returns
+        -------
+        dict[str, float]
+            Formula units of each product formed per formula unit of
+            ``formula``.
+        """
+        n_atoms = Composition(self.formula).num_atoms
+        return {
+            product: fraction * n_atoms / Composition(product).num_atoms
+            for product, fraction in self.decomposition.items()
+        }
+
+
+@dataclass
+class HullResults:
+    """
+    Columnar energies above hull and decompositions of many inputs.
+
+    Inputs whose energy above hull could not be computed hold NaN energies,
+    an empty decomposition and an empty chemical system.
+
+    Attributes
+    ----------
+    formula
+        Reduced formula of each input.
+    e_above_hull
+        Energy above the convex hull in eV/atom of each input.
+    hull_energy
+        Energy of the convex hull at each input composition in eV/atom.
+    decomposition
+        Atomic fraction of each decomposition product of each input.
+    chemical_space
+        Chemical system of the sub-space each input was evaluated in.
+    errors
+        Error message of each input whose energy above hull could not be
+        computed, or None.
+    """
+
+    formula: np.ndarray
+    e_above_hull: np.ndarray
+    hull_energy: np.ndarray
+    decomposition: list[dict[str, float]]
+    chemical_space: np.ndarray
+    errors: list[str | None]
+
+    def __len__(self) -> int:
+        return len(self.e_above_hull)
+
+    def __getitem__(self, i: int) -> HullResult:
+        return HullResult(
+            str(self.formula[i]),
+            float(self.e_above_hull[i]),
+            float(self.hull_energy[i]),
+            self.decomposition[i],
+            str(self.chemical_space[i]),
+        )
+
+
+def get_hull_result(
+    struct: CompositionLike,
+    energy: float,
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+    correction: EnergyCorrection | None = None,
+    reference_correction: EnergyCorrection | None = None,
+) -> HullResult:
+    """
+    Calculate the energy above hull of a structure and its decomposition.
+
+    Parameters
+    ----------
+    struct
+        Input structure, in any form accepted by
+        :func:`get_energy_above_hull`.
+    energy
+        Total relaxed energy of the structure in eV.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    correction
+        Correction applied to ``energy``, see
+        :func:`get_energies_above_hull`.
+    reference_correction
+        Correction applied to the reference entries, see
+        :func:`get_energies_above_hull`.
+
+    Returns
+    -------
+    HullResult
+        The energy above hull, hull energy, decomposition products and
+        chemical sub-space, all from a single hull evaluation.
+
+    Raises
+    ------
+    ValueError
+        If the energy above hull cannot be computed.
+    """
+    return get_hull_results(
+        [struct],
+        [energy],
+        serialized_phase_diagram=serialized_phase_diagram,
+        on_error="raise",
+        engine="pymatgen",
+        correction=correction,
+        reference_correction=reference_correction,
+    )[0]
+
 
 def get_energy_above_hull(
-    struct: Structure | Atoms,
+    struct: CompositionLike,
     energy: float,
     serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+    correction: EnergyCorrection | None = None,
+    reference_correction: EnergyCorrection | None = None,
 ) -> float:
     """
     Calculate the energy above hull for a structure with a given total energy.
@@ -31,32 +1127,369 @@ def get_energy_above_hull(
     Parameters
     ----------
     struct
-        Input structure as either a pymatgen Structure or ASE Atoms object.
-        If an Atoms object is provided, it will be converted to a Structure.
+        Input structure as a pymatgen Structure or Composition, an ASE Atoms
+        object, a formula string, an ``{element: amount}`` dict, or the path
+        to a structure file. Only the composition is read: Atoms are counted
+        directly and P1 CIF files are read from their atom-site symbols,
+        without building a pymatgen Structure.
     energy
         Total relaxed energy of the structure in eV.
-    references_dir
-        Path to the directory containing the precomputed PatchedPhaseDiagram.
-        Default is ``"data/references"``.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram, either the JSON file or
+        the compact ``.npz`` file. The diagram is loaded lazily, one
+        chemical sub-space at a time. The deserialized diagram
+        and the hull energy of each composition are cached in memory, see
+        :func:`preload`, :func:`clear_cache` and :func:`save_hull_cache`.
+    correction
+        Correction applied to ``energy``, see
+        :func:`get_energies_above_hull`.
+    reference_correction
+        Correction applied to the reference entries, see
+        :func:`get_energies_above_hull`.
 
     Returns
     -------
     float
-        Energy above the convex hull in eV/atom.
+        Energy above the convex hull in eV/atom. Use :func:`get_hull_result`
+        to also get the decomposition products.
     """
-    if isinstance(struct, Atoms):
-        struct = AseAtomsAdaptor.get_structure(struct)
+    return get_hull_result(
+        struct,
+        energy,
+        serialized_phase_diagram,
+        correction=correction,
+        reference_correction=reference_correction,
+    ).e_above_hull
 
-    ppd = loadfn(serialized_phase_diagram)
 
-    entry = PDEntry(struct.composition, energy)
-    result = ppd.get_decomp_and_e_above_hull(entry)
+def get_energies_above_hull(
+    structs: Sequence[CompositionLike],
+    energies: ArrayLike,
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+    on_error: Literal["raise", "ignore"] = "ignore",
+    engine: Literal["numpy", "pymatgen"] = "numpy",
+    n_workers: int = 1,
+    correction: EnergyCorrection | None = None,
+    reference_correction: EnergyCorrection | None = None,
+) -> np.ndarray:
+    """
+    Calculate the energy above hull for many structures at once.
+
+    The phase diagram is loaded once and the inputs are grouped by chemical
+    system, so that the sub-space of the PatchedPhaseDiagram covering each
+    group is only resolved once.
+
+    Parameters
+    ----------
+    structs
+        Input structures, in any form accepted by
+        :func:`get_energy_above_hull`.
+    energies
+        Total relaxed energies of the structures in eV, in the same order
+        as ``structs``.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    on_error
+        What to do if an input cannot be parsed, has no atoms, or its energy
+        above hull cannot be computed. ``"raise"`` raises a ValueError,
+        ``"ignore"`` logs a warning and stores NaN for that input.
+    engine
+        ``"numpy"`` evaluates each chemical system in one vectorized pass
+        over the lower-hull facet planes of its sub-space, falling back to
+        pymatgen for compositions on facet edges it cannot resolve.
+        ``"pymatgen"`` calls ``get_decomp_and_hull_energy_per_atom`` for
+        every distinct composition. Both agree to within 1e-8 eV/atom.
+    n_workers
+        Number of processes to spread the chemical sub-spaces over. Each
+        worker only builds the sub-spaces of the inputs it is given, and
+        results are returned in input order regardless.
+    correction
+        Per-element correction applied to ``energies``, e.g.
+        ``EnergyCorrection.uma()`` to compare UMA-ODAC energies with DFT
+        references.
+    reference_correction
+        Per-element correction applied to the energies of the reference
+        entries, for diagrams built from MLIP energies. The corrected
+        diagram is cached, so it is only built once per correction.
+
+    Returns
+    -------
+    np.ndarray
+        Energies above the convex hull in eV/atom, in the same order as
+        ``structs``. Use :func:`get_hull_results` to also get the
+        decomposition products.
+
+    Raises
+    ------
+    ValueError
+        If ``structs`` and ``energies`` differ in length, or if
+        ``on_error="raise"`` and an input cannot be parsed or its energy
+        above hull cannot be computed.
+    """
+    return get_hull_results(
+        structs,
+        energies,
+        serialized_phase_diagram=serialized_phase_diagram,
+        on_error=on_error,
+        engine=engine,
+        n_workers=n_workers,
+        correction=correction,
+        reference_correction=reference_correction,
+    ).e_above_hull
+
+
+def get_hull_results(
+    structs: Sequence[CompositionLike],
+    energies: ArrayLike,
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+    on_error: Literal["raise", "ignore"] = "ignore",
+    engine: Literal["numpy", "pymatgen"] = "numpy",
+    n_workers: int = 1,
+    correction: EnergyCorrection | None = None,
+    reference_correction: EnergyCorrection | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> HullResults:
+    """
+    Calculate energies above hull and decompositions for many structures.
+
+    This takes the same arguments as :func:`get_energies_above_hull`, and
+    returns the decomposition computed in the same pass as the hull energy.
+
+    Parameters
+    ----------
+    structs
+        Input structures, in any form accepted by
+        :func:`get_energy_above_hull`.
+    energies
+        Total relaxed energies of the structures in eV, in the same order
+        as ``structs``.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    on_error
+        What to do if the energy above hull cannot be computed for an input,
+        see :func:`get_energies_above_hull`.
+    engine
+        Hull engine, see :func:`get_energies_above_hull`.
+    n_workers
+        Number of worker processes, see :func:`get_energies_above_hull`.
+    correction
+        Correction applied to ``energies``, see
+        :func:`get_energies_above_hull`.
+    reference_correction
+        Correction applied to the reference entries, see
+        :func:`get_energies_above_hull`.
+    pool
+        Process pool to spread the sub-spaces over if ``n_workers > 1``,
+        reused instead of starting one per call. Its workers must hold the
+        same diagram and reference correction, as those of the pool from
+        ``qmof_thermo.hull._diagram_process_pool``.
+
+    Returns
+    -------
+    HullResults
+        Columnar results, in the same order as ``structs``.
+
+    Raises
+    ------
+    ValueError
+        If ``structs`` and ``energies`` differ in length, or if
+        ``on_error="raise"`` and an input cannot be parsed or its energy
+        above hull cannot be computed.
+    """
+    energies = np.asarray(energies, dtype=float)
+    if energies.shape != (len(structs),):
+        msg = (
+            f"Got {len(structs)} structures but {energies.size} energies; "
+            "they must have the same length."
+        )
+        raise ValueError(msg)
+    parsed, parse_errors = _parse_compositions(structs, on_error)
+    valid = [i for i, composition in enumerate(parsed) if composition is not None]
+    compositions = [parsed[i] for i in valid]
+    energies = energies[valid]
+    if correction is not None:
+        energies = energies + correction.get_shifts(compositions)
+
+    diagram = _get_cached_diagram(
+        serialized_phase_diagram, correction=reference_correction
+    )
+    ppd = diagram.ppd
+
+    # Group inputs by the sub-space covering them, so that each sub-space is
+    # resolved (and, for lazy diagrams, built) once and by a single worker
+    space_of_chemsys: dict[frozenset[Element], frozenset[Element] | None] = {}
+    groups: dict[frozenset[Element] | None, list[int]] = defaultdict(list)
+    for i, composition in enumerate(compositions):
+        chemsys = frozenset(composition.elements)
+        if chemsys not in space_of_chemsys:
+            space_of_chemsys[chemsys] = _get_subspace(ppd, chemsys)
+        groups[space_of_chemsys[chemsys]].append(i)
+
+    tasks = [(space, [compositions[i] for i in idx]) for space, idx in groups.items()]
+    if n_workers > 1 and len(tasks) > 1:
+        group_results = _score_subspaces_parallel(
+            serialized_phase_diagram,
+            diagram,
+            tasks,
+            engine,
+            n_workers,
+            reference_correction,
+            pool,
+        )
+    else:
+        group_results = _score_subspaces(
+            serialized_phase_diagram, tasks, engine, reference_correction
+        )
+
+    hull_energies: list[tuple[float, dict[str, float]] | None] = [None] * len(
+        compositions
+    )
+    chemical_spaces = [""] * len(compositions)
+    for (space, indices), group_result in zip(
+        groups.items(), group_results, strict=True
+    ):
+        chemical_space = "-".join(sorted(el.symbol for el in space or ppd.elements))
+        for i, hull_energy in zip(indices, group_result, strict=True):
+            hull_energies[i] = hull_energy
+            chemical_spaces[i] = chemical_space
+
+    results = HullResults(
+        formula=np.array([c.reduced_formula for c in compositions], dtype=object),
+        e_above_hull=np.full(len(compositions), np.nan),
+        hull_energy=np.full(len(compositions), np.nan),
+        decomposition=[{} for _ in compositions],
+        chemical_space=np.full(len(compositions), "", dtype=object),
+        errors=[None] * len(compositions),
+    )
+    for i, hull_energy in enumerate(hull_energies):
+        e_above_hull = _e_above_hull(hull_energy, compositions[i], energies[i])
+        if e_above_hull is not None:
+            results.e_above_hull[i] = e_above_hull
+            results.hull_energy[i] = hull_energy[0]
+            results.decomposition[i] = dict(hull_energy[1])
+            results.chemical_space[i] = chemical_spaces[i]
+            continue
 
-    if result[1] is None:
         msg = (
             f"Could not compute energy above hull for composition "
-            f"{struct.composition.reduced_formula}."
+            f"{compositions[i].reduced_formula}."
+        )
+        if on_error == "raise":
+            raise ValueError(msg)
+        LOGGER.warning(f"{msg} Storing NaN for input {valid[i]}.")
+        results.errors[i] = msg
+
+    if len(valid) == len(structs):
+        return results
+    return _scatter_results(results, valid, parse_errors)
+
+
+def _scatter_results(
+    results: HullResults, valid: list[int], errors: list[str | None]
+) -> HullResults:
+    """
+    Place the results of the parsed inputs among those that failed to parse.
+
+    Parameters
+    ----------
+    results
+        Results of the parsed inputs.
+    valid
+        Index of each parsed input among all inputs.
+    errors
+        Error message of each input that could not be parsed, or None.
+
+    Returns
+    -------
+    HullResults
+        Results of all inputs, with NaN energies for those not parsed.
+    """
+    n_inputs = len(errors)
+    scattered = HullResults(
+        formula=np.full(n_inputs, "", dtype=object),
+        e_above_hull=np.full(n_inputs, np.nan),
+        hull_energy=np.full(n_inputs, np.nan),
+        decomposition=[{} for _ in range(n_inputs)],
+        chemical_space=np.full(n_inputs, "", dtype=object),
+        errors=list(errors),
+    )
+    scattered.formula[valid] = results.formula
+    scattered.e_above_hull[valid] = results.e_above_hull
+    scattered.hull_energy[valid] = results.hull_energy
+    scattered.chemical_space[valid] = results.chemical_space
+    for j, i in enumerate(valid):
+        scattered.decomposition[i] = results.decomposition[j]
+        scattered.errors[i] = results.errors[j]
+    return scattered
+
+
+def compare_energies_above_hull(
+    structs: Sequence[CompositionLike],
+    energies: ArrayLike,
+    serialized_phase_diagrams: Mapping[str, Path | str] | Sequence[Path | str],
+    engine: Literal["numpy", "pymatgen"] = "numpy",
+    n_workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Calculate energies above hull against several phase diagrams at once.
+
+    This is meant for comparing reference sets, such as the diagrams built
+    for each tolerance by ``setup_phase_diagrams(ehull_tolerances=...)``.
+    Inputs are parsed once and scored against every diagram.
+
+    Parameters
+    ----------
+    structs
+        Input structures, in any form accepted by
+        :func:`get_energy_above_hull`.
+    energies
+        Total relaxed energies of the structures in eV.
+    serialized_phase_diagrams
+        Paths to the serialized PatchedPhaseDiagrams, keyed by label, or a
+        sequence of paths labelled by their string form. The first one is
+        the baseline of the differences.
+    engine
+        Hull engine, see :func:`get_energies_above_hull`.
+    n_workers
+        Number of worker processes, see :func:`get_energies_above_hull`.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per input, in input order, with its ``formula``, its energy
+        above hull in eV/atom against each diagram in a column named by the
+        diagram's label, and for every other diagram a ``delta_<label>``
+        column with its difference from the baseline. Failed inputs hold
+        NaN.
+    """
+    if not isinstance(serialized_phase_diagrams, Mapping):
+        serialized_phase_diagrams = {str(p): p for p in serialized_phase_diagrams}
+    energies = np.asarray(energies, dtype=float)
+    if energies.shape != (len(structs),):
+        msg = (
+            f"Got {len(structs)} structures but {energies.size} energies; "
+            "they must have the same length."
         )
         raise ValueError(msg)
+    parsed, _ = _parse_compositions(structs, "ignore")
+    valid = [i for i, composition in enumerate(parsed) if composition is not None]
+    compositions = [parsed[i] for i in valid]
+
+    formulas = np.full(len(structs), "", dtype=object)
+    formulas[valid] = [c.reduced_formula for c in compositions]
+    columns: dict[str, object] = {"formula": formulas}
+    for label, path in serialized_phase_diagrams.items():
+        e_above_hull = np.full(len(structs), np.nan)
+        e_above_hull[valid] = get_hull_results(
+            compositions,
+            energies[valid],
+            serialized_phase_diagram=path,
+            engine=engine,
+            n_workers=n_workers,
+        ).e_above_hull
+        columns[label] = e_above_hull
 
-    return float(result[1])
+    baseline, *others = serialized_phase_diagrams
+    for label in others:
+        columns[f"delta_{label}"] = columns[label] - columns[baseline]
+    return pd.DataFrame(columns)
@@ -4,19 +4,71 @@ Set up phase diagrams.
 
 from __future__ import annotations
 
+import gzip
+import hashlib
+import itertools
 import json
-from dataclasses import dataclass
+import multiprocessing
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from importlib.metadata import version
 from logging import getLogger
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
-from monty.serialization import dumpfn
-from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram, PDEntry
-from pymatgen.core import Structure
+from monty.json import MontyDecoder
+from monty.serialization import dumpfn, loadfn
+from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram, PDEntry, PhaseDiagram
+from pymatgen.core import Composition, Element, Structure
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+    from typing import Any, TextIO
+
+    from pymatgen.entries import Entry
+
+    from qmof_thermo.correction import EnergyCorrection
 
 LOGGER = getLogger(__name__)
 
 _DEFAULT_PD_FILENAME = "patched_phase_diagram.json"
+_DEFAULT_COMPACT_PD_FILENAME = "patched_phase_diagram.npz"
+_DEFAULT_CHANGELOG_FILENAME = "patched_phase_diagram_changelog.json"
+
+_DEFAULT_BUILD_RECORD_FILENAME = "patched_phase_diagram_build.json"
+_DEFAULT_METRICS_FILENAME = "patched_phase_diagram_build_metrics.json"
+_BUILD_CACHE_DIRNAME = ".build_cache"
+
+# Bump when a change to the builder changes its output for the same inputs
+_BUILD_FORMAT_VERSION = 1
+
+# Characters of the structures JSON read at a time when streaming its records
+_JSON_CHUNK_SIZE = 1 << 20
+
+# Rows of a CSV or JSON Lines table read at a time
+_TABLE_CHUNK_ROWS = 100_000
+
+# Format of the thermo and structure tables by file suffix, after stripping
+# any compression suffix. Unknown suffixes are read as a JSON array.
+_TABLE_FORMATS = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
+_COMPRESSION_SUFFIXES = {".gz", ".bz2", ".xz", ".zst", ".zip"}
 
 
 @dataclass
@@ -29,17 +81,54 @@ class HullEntry:
     mpid
         Materials Project ID for this entry.
     structure
-        Pymatgen Structure object for this material.
+        Pymatgen Structure object for this material, or None if only its
+        composition was loaded.
     energy
         Total energy in eV.
     elements
         Frozenset of element symbols present in the structure.
+    energy_above_hull
+        Energy above hull in eV/atom reported in the thermo data.
+    composition
+        Composition of the material. Defaults to that of ``structure``, so it
+        is never None after construction.
     """
 
     mpid: str
-    structure: Structure
+    structure: Structure | None
     energy: float  # total energy (eV)
     elements: frozenset[str]  # e.g. frozenset({"Ba", "O", "V"})
+    energy_above_hull: float = 0.0
+    composition: Composition | None = None
+
+    def __post_init__(self) -> None:
+        if self.composition is None:
+            if self.structure is None:
+                raise ValueError(f"{self.mpid} needs a structure or a composition.")
+            self.composition = self.structure.composition
+
+
+def _to_pd_entry(entry: HullEntry) -> PDEntry:
+    """
+    Convert a HullEntry to a PDEntry that remembers its MPID.
+
+    Parameters
+    ----------
+    entry
+        Reference hull entry.
+
+    Returns
+    -------
+    PDEntry
+        Entry with the MPID stored as ``attribute["mpid"]``.
+    """
+    return PDEntry(entry.composition, entry.energy, attribute={"mpid": entry.mpid})
+
+
+def _entry_id(entry: PDEntry) -> str | None:
+    """Get the MPID of a PDEntry built by ``_to_pd_entry``, if any."""
+    attribute = entry.attribute
+    return attribute.get("mpid") if isinstance(attribute, dict) else None
 
 
 def chemical_space_from_structure(struct: Structure) -> set[str]:
@@ -59,28 +148,984 @@ def chemical_space_from_structure(struct: Structure) -> set[str]:
     return {str(el.symbol) for el in struct.composition.elements}
 
 
+def _element_amounts(composition: Composition) -> dict[str, float]:
+    """Get the number of atoms of each element symbol of a composition."""
+    return {el.symbol: amt for el, amt in composition.element_composition.items()}
+
+
+def _element_amounts_from_structure_dict(
+    struct_dict: dict[str, Any],
+) -> dict[str, float]:
+    """
+    Get the composition of a serialized Structure without deserializing it.
+
+    Only the species and occupancies of the sites are read, so that no
+    lattice, coordinates or site objects are built.
+
+    Parameters
+    ----------
+    struct_dict
+        Output of ``Structure.as_dict()``.
+
+    Returns
+    -------
+    dict[str, float]
+        Number of atoms of each element symbol, without oxidation states.
+    """
+    amounts: dict[str, float] = defaultdict(float)
+    for site in struct_dict["sites"]:
+        for species in site["species"]:
+            amounts[species["element"]] += species.get("occu", 1.0)
+    return dict(amounts)
+
+
+@dataclass
+class HullEntryTable:
+    """
+    Array-backed table of reference hull entries.
+
+    Compositions are stored as a sparse matrix over an index of element
+    symbols, so that memory grows by a few bytes per element of each entry
+    instead of by a graph of Python objects. Rows are read as
+    :class:`HullEntryRow` views with the attributes of a
+    :class:`HullEntry`.
+
+    Attributes
+    ----------
+    ids
+        Material ID of each entry.
+    elements
+        Element symbols indexed by ``element_indices``.
+    indptr
+        Start of the elements of each entry in ``element_indices`` and
+        ``amounts``, shape (n_entries + 1,).
+    element_indices
+        Index in ``elements`` of each element of each entry.
+    amounts
+        Number of atoms of each element of each entry.
+    energies
+        Total energy of each entry in eV.
+    energy_above_hull
+        Energy above hull of each entry in eV/atom reported in the thermo
+        data.
+    masks
+        Bitmask of the elements of each entry over ``elements``, as 64-bit
+        words, shape (n_entries, n_words).
+    structures
+        Structure of each entry, if kept.
+    """
+
+    ids: np.ndarray
+    elements: list[str]
+    indptr: np.ndarray
+    element_indices: np.ndarray
+    amounts: np.ndarray
+    energies: np.ndarray
+    energy_above_hull: np.ndarray
+    masks: np.ndarray
+    structures: list[Structure] | None = None
+
+    @classmethod
+    def from_amounts(
+        cls,
+        ids: Sequence[str],
+        amounts: Sequence[dict[str, float]],
+        energies: Sequence[float],
+        energy_above_hull: Sequence[float],
+        structures: list[Structure] | None = None,
+    ) -> HullEntryTable:
+        """
+        Build a table from the element amounts of each entry.
+
+        Parameters
+        ----------
+        ids
+            Material ID of each entry.
+        amounts
+            Number of atoms of each element symbol of each entry.
+        energies
+            Total energy of each entry in eV.
+        energy_above_hull
+            Energy above hull of each entry in eV/atom.
+        structures
+            Structure of each entry, if kept.
+
+        Returns
+        -------
+        HullEntryTable
+            The table.
+        """
+        elements = sorted({el for entry_amounts in amounts for el in entry_amounts})
+        element_index = {el: j for j, el in enumerate(elements)}
+        counts = np.fromiter((len(a) for a in amounts), np.int64, len(amounts))
+        indptr = np.zeros(len(amounts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        element_indices = np.fromiter(
+            (element_index[el] for a in amounts for el in a), np.uint8, indptr[-1]
+        )
+        values = np.fromiter(
+            (amt for a in amounts for amt in a.values()), np.float64, indptr[-1]
+        )
+        masks = np.zeros((len(amounts), max(1, -(-len(elements) // 64))), np.uint64)
+        bits = np.left_shift(np.uint64(1), (element_indices % 64).astype(np.uint64))
+        np.bitwise_or.at(
+            masks,
+            (np.repeat(np.arange(len(amounts)), counts), element_indices // 64),
+            bits,
+        )
+
+        return cls(
+            np.array(ids, dtype=object),
+            elements,
+            indptr,
+            element_indices,
+            values,
+            np.asarray(energies, dtype=np.float64),
+            np.asarray(energy_above_hull, dtype=np.float64),
+            masks,
+            structures,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> HullEntryRow:
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Row {index} out of range for {len(self)} entries.")
+        return HullEntryRow(self, index % len(self))
+
+    def __iter__(self) -> Iterator[HullEntryRow]:
+        return (HullEntryRow(self, i) for i in range(len(self)))
+
+    def element_amounts(self, index: int) -> dict[str, float]:
+        """Get the number of atoms of each element symbol of an entry."""
+        start, stop = self.indptr[index], self.indptr[index + 1]
+        return {
+            self.elements[j]: float(amt)
+            for j, amt in zip(
+                self.element_indices[start:stop], self.amounts[start:stop], strict=True
+            )
+        }
+
+    def select(self, rows: np.ndarray) -> HullEntryTable:
+        """
+        Get a table of some of the entries.
+
+        Parameters
+        ----------
+        rows
+            Boolean mask or indices of the entries to keep.
+
+        Returns
+        -------
+        HullEntryTable
+            The selected entries, over the same element index.
+        """
+        rows = np.asarray(rows)
+        indices = np.flatnonzero(rows) if rows.dtype == bool else rows
+        counts = np.diff(self.indptr)[indices]
+        indptr = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        gather = np.repeat(self.indptr[indices] - indptr[:-1], counts) + np.arange(
+            indptr[-1]
+        )
+        return HullEntryTable(
+            self.ids[indices],
+            self.elements,
+            indptr,
+            self.element_indices[gather],
+            self.amounts[gather],
+            self.energies[indices],
+            self.energy_above_hull[indices],
+            self.masks[indices],
+            [self.structures[i] for i in indices]
+            if self.structures is not None
+            else None,
+        )
+
+    def chemical_systems(self) -> set[frozenset[Element]]:
+        """Get the distinct chemical systems of the entries."""
+        systems = set()
+        for mask in np.unique(self.masks, axis=0):
+            systems.add(
+                frozenset(
+                    Element(el)
+                    for j, el in enumerate(self.elements)
+                    if int(mask[j // 64]) >> (j % 64) & 1
+                )
+            )
+        return systems
+
+    def to_pd_entries(self) -> list[PDEntry]:
+        """Convert every entry to a PDEntry that remembers its MPID."""
+        return [_to_pd_entry(row) for row in self]
+
+
+class HullEntryRow:
+    """
+    Read-only view of one entry of a HullEntryTable.
+
+    It has the attributes of a :class:`HullEntry`, computed on access.
+    """
+
+    __slots__ = ("_index", "_table")
+
+    def __init__(self, table: HullEntryTable, index: int) -> None:
+        self._table = table
+        self._index = index
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(mpid={self.mpid!r}, "
+            f"composition={self.composition.formula!r}, energy={self.energy})"
+        )
+
+    @property
+    def mpid(self) -> str:
+        """Materials Project ID for this entry."""
+        return self._table.ids[self._index]
+
+    @property
+    def structure(self) -> Structure | None:
+        """Structure of this material, or None if it was not kept."""
+        structures = self._table.structures
+        return structures[self._index] if structures is not None else None
+
+    @property
+    def energy(self) -> float:
+        """Total energy in eV."""
+        return float(self._table.energies[self._index])
+
+    @property
+    def energy_above_hull(self) -> float:
+        """Energy above hull in eV/atom reported in the thermo data."""
+        return float(self._table.energy_above_hull[self._index])
+
+    @property
+    def composition(self) -> Composition:
+        """Composition of the material."""
+        return Composition(self._table.element_amounts(self._index))
+
+    @property
+    def elements(self) -> frozenset[str]:
+        """Frozenset of element symbols present in the material."""
+        return frozenset(self._table.element_amounts(self._index))
+
+
+@dataclass
+class _PatchLayout:
+    """
+    Entries and chemical sub-spaces of a PatchedPhaseDiagram.
+
+    This is everything ``PatchedPhaseDiagram.__init__`` computes before
+    building the convex hull of each sub-space.
+
+    Attributes
+    ----------
+    all_entries
+        All entries, sorted by reduced composition.
+    elements
+        Elements of the phase diagram.
+    qhull_entries
+        Entries with negative formation energy plus the elemental references.
+    el_refs
+        Elemental reference entry for each element.
+    spaces
+        Chemical sub-spaces, largest first.
+    """
+
+    all_entries: list[PDEntry]
+    elements: list[Element]
+    qhull_entries: tuple[PDEntry, ...]
+    el_refs: dict[Element, PDEntry]
+    spaces: list[frozenset[Element]]
+    qhull_spaces: tuple[frozenset[Element], ...] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.qhull_spaces = tuple(frozenset(e.elements) for e in self.qhull_entries)
+
+    def space_entries(self, space: frozenset[Element]) -> list[PDEntry]:
+        """
+        Get the qhull entries that lie within a chemical sub-space.
+
+        Parameters
+        ----------
+        space
+            Chemical sub-space.
+
+        Returns
+        -------
+        list[PDEntry]
+            Entries whose elements are a subset of ``space``.
+        """
+        return [
+            e
+            for e, s in zip(self.qhull_entries, self.qhull_spaces, strict=True)
+            if space.issuperset(s)
+        ]
+
+
+def _partition_entries(
+    entries: Sequence[PDEntry], elements: Sequence[Element] | None = None
+) -> _PatchLayout:
+    """
+    Partition entries into the chemical sub-spaces of a PatchedPhaseDiagram.
+
+    Mirrors ``PatchedPhaseDiagram.__init__`` up to, but excluding, the convex
+    hull construction.
+
+    Parameters
+    ----------
+    entries
+        Entries of the phase diagram.
+    elements
+        Elements of the phase diagram. Determined from the entries if None.
+
+    Returns
+    -------
+    _PatchLayout
+        The partitioned entries.
+
+    Raises
+    ------
+    ValueError
+        If an element has no terminal entry, or a terminal entry is not
+        in ``elements``.
+    """
+    if elements is None:
+        elements = sorted({el for entry in entries for el in entry.elements})
+    elements = list(elements)
+
+    # Reduced compositions are expensive, so compute each one only once
+    keyed = sorted(
+        ((e.composition.reduced_composition, e) for e in entries), key=lambda p: p[0]
+    )
+
+    el_refs: dict[Element, PDEntry] = {}
+    min_entries: list[PDEntry] = []
+    all_entries: list[PDEntry] = []
+    for composition, group_iter in itertools.groupby(keyed, key=lambda p: p[0]):
+        group = [e for _, e in group_iter]
+        min_entry = min(group, key=lambda e: e.energy_per_atom)
+        if composition.is_element:
+            el_refs[composition.elements[0]] = min_entry
+        min_entries.append(min_entry)
+        all_entries.extend(group)
+
+    if missing := set(elements) - set(el_refs):
+        raise ValueError(
+            f"Missing terminal entries for elements {sorted(map(str, missing))}"
+        )
+    if extra := set(el_refs) - set(elements):
+        raise ValueError(
+            f"There are more terminal elements than dimensions: {sorted(map(str, extra))}"
+        )
+
+    # Same atomic fractions as Composition.get_atomic_fraction, without the
+    # per-element lookups
+    element_index = {el: j for j, el in enumerate(elements)}
+    data = np.zeros((len(min_entries), len(elements) + 1))
+    for i, entry in enumerate(min_entries):
+        composition = entry.composition
+        for el, amt in composition.items():
+            data[i, element_index[el]] = abs(amt) / composition.num_atoms
+        data[i, -1] = entry.energy_per_atom
+
+    # Use only entries with negative formation energy
+    vec = [el_refs[el].energy_per_atom for el in elements] + [-1]
+    form_e = -np.dot(data, vec)
+    inds = np.where(form_e < -PhaseDiagram.formation_energy_tol)[0].tolist()
+
+    # Add the elemental references. Min entries have unique compositions, so
+    # matching by identity is equivalent to list.index() and much faster.
+    min_entry_index = {id(e): i for i, e in enumerate(min_entries)}
+    inds.extend([min_entry_index[id(el)] for el in el_refs.values()])
+
+    qhull_entries = tuple(min_entries[idx] for idx in inds)
+    spaces = {s for s in (frozenset(e.elements) for e in qhull_entries) if len(s) > 1}
+    spaces = PatchedPhaseDiagram.remove_redundant_spaces(spaces)
+
+    return _PatchLayout(
+        all_entries,
+        elements,
+        qhull_entries,
+        el_refs,
+        sorted(spaces, key=len, reverse=True),
+    )
+
+
+def _assemble_patched_phase_diagram(
+    layout: _PatchLayout, pds: dict[frozenset[Element], PhaseDiagram]
+) -> PatchedPhaseDiagram:
+    """
+    Assemble a PatchedPhaseDiagram from already computed sub-space diagrams.
+
+    This sets the same attributes as ``PatchedPhaseDiagram.__init__`` but
+    skips the convex hull construction of every sub-space.
+
+    Parameters
+    ----------
+    layout
+        Entries and chemical sub-spaces of the PatchedPhaseDiagram.
+    pds
+        PhaseDiagram for each chemical sub-space.
+
+    Returns
+    -------
+    PatchedPhaseDiagram
+        The assembled PatchedPhaseDiagram.
+    """
+    ppd = PatchedPhaseDiagram.__new__(PatchedPhaseDiagram)
+    ppd.dim = len(layout.elements)
+    ppd.spaces = list(layout.spaces)
+    ppd.qhull_entries = layout.qhull_entries
+    ppd._qhull_spaces = layout.qhull_spaces
+    ppd.pds = {space: pds[space] for space in ppd.spaces}
+    ppd.all_entries = layout.all_entries
+    ppd.el_refs = layout.el_refs
+    ppd.elements = layout.elements
+
+    _stable_entries = {se for pd in ppd.pds.values() for se in pd._stable_entries}
+    ppd._stable_entries = tuple(_stable_entries | {*ppd.el_refs.values()})
+    ppd._stable_spaces = tuple(frozenset(e.elements) for e in ppd._stable_entries)
+    return ppd
+
+
+class _LayoutReader:
+    """
+    Builds sub-space PhaseDiagrams from entries already held in memory.
+    """
+
+    def __init__(self, layout: _PatchLayout) -> None:
+        self.layout = layout
+
+    def build_pd(self, space: frozenset[Element]) -> PhaseDiagram:
+        """Compute the PhaseDiagram of a chemical sub-space."""
+        return PhaseDiagram(self.layout.space_entries(space))
+
+    def load_layout(self) -> _PatchLayout:
+        """Get all entries and chemical sub-spaces."""
+        return self.layout
+
+
+class _LazySubspaces(MutableMapping):
+    """
+    Mapping of chemical sub-space to PhaseDiagram, built on first access.
+    """
+
+    def __init__(
+        self,
+        spaces: Sequence[frozenset[Element]],
+        build_pd: Callable[[frozenset[Element]], PhaseDiagram],
+    ) -> None:
+        self._pds: dict[frozenset[Element], PhaseDiagram | None] = dict.fromkeys(spaces)
+        self._build_pd = build_pd
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __getitem__(self, space: frozenset[Element]) -> PhaseDiagram:
+        pd = self._pds[space]
+        if pd is None:
+            with self._lock:
+                if (pd := self._pds[space]) is None:
+                    pd = self._pds[space] = self._build_pd(space)
+        return pd
+
+    def __setitem__(self, space: frozenset[Element], pd: PhaseDiagram) -> None:
+        self._pds[space] = pd
+
+    def __delitem__(self, space: frozenset[Element]) -> None:
+        del self._pds[space]
+
+    def __iter__(self) -> Iterator[frozenset[Element]]:
+        return iter(self._pds)
+
+    def __len__(self) -> int:
+        return len(self._pds)
+
+    def __contains__(self, space: object) -> bool:
+        return space in self._pds
+
+    @property
+    def n_built(self) -> int:
+        """Number of sub-space PhaseDiagrams built so far."""
+        return sum(pd is not None for pd in self._pds.values())
+
+
+class LazyPatchedPhaseDiagram(PatchedPhaseDiagram):
+    """
+    PatchedPhaseDiagram that builds each sub-space PhaseDiagram on first use.
+
+    The chemical sub-spaces are indexed up front, but the PhaseDiagram of a
+    sub-space is only built when a query needs it. Read from JSON, all
+    entries are decoded up front and only the convex hulls are deferred;
+    read from the compact ``.npz`` format, each sub-space is also only
+    deserialized on first use. Attributes spanning every sub-space, such as
+    ``stable_entries``, build all remaining sub-spaces on access.
+
+    It serializes as a plain PatchedPhaseDiagram, so that files written
+    from it can be read without this package.
+    """
+
+    def __init__(
+        self,
+        elements: Sequence[Element],
+        spaces: Sequence[frozenset[Element]],
+        reader: _LayoutReader,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        elements
+            Elements of the phase diagram.
+        spaces
+            Chemical sub-spaces, largest first.
+        reader
+            Object whose ``build_pd(space)`` returns the PhaseDiagram of a
+            chemical sub-space and whose ``load_layout()`` returns all
+            entries, called the first time an attribute spanning all entries
+            is accessed.
+        """
+        self.dim = len(elements)
+        self.elements = list(elements)
+        self.spaces = list(spaces)
+        self.pds = _LazySubspaces(self.spaces, reader.build_pd)
+        self._reader = reader
+        self._layout: _PatchLayout | None = None
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__} covering {len(self.spaces)} sub-spaces "
+            f"({self.pds.n_built} built)"
+        )
+
+    @property
+    def layout(self) -> _PatchLayout:
+        """Entries and chemical sub-spaces of the phase diagram."""
+        if self._layout is None:
+            self._layout = self._reader.load_layout()
+        return self._layout
+
+    @property
+    def all_entries(self) -> list[PDEntry]:
+        """All entries provided for phase diagram construction."""
+        return self.layout.all_entries
+
+    @property
+    def qhull_entries(self) -> tuple[PDEntry, ...]:
+        """Entries with negative formation energy plus elemental references."""
+        return self.layout.qhull_entries
+
+    @property
+    def _qhull_spaces(self) -> tuple[frozenset[Element], ...]:
+        return self.layout.qhull_spaces
+
+    @property
+    def el_refs(self) -> dict[Element, PDEntry]:
+        """Elemental reference entry for each element."""
+        return self.layout.el_refs
+
+    @property
+    def _stable_entries(self) -> tuple[PDEntry, ...]:
+        _stable_entries = {se for pd in self.pds.values() for se in pd._stable_entries}
+        return tuple(_stable_entries | {*self.el_refs.values()})
+
+    @property
+    def _stable_spaces(self) -> tuple[frozenset[Element], ...]:
+        return tuple(frozenset(e.elements) for e in self._stable_entries)
+
+    def get_pd_for_entry(self, entry: Entry | Composition) -> PhaseDiagram:
+        """
+        Get the phase diagram of the sub-space covering an entry.
+
+        Same as ``PatchedPhaseDiagram.get_pd_for_entry``, but only the
+        returned sub-space is built.
+
+        Parameters
+        ----------
+        entry
+            A PDEntry or Composition-like object.
+
+        Returns
+        -------
+        PhaseDiagram
+            Phase diagram that the entry is part of.
+
+        Raises
+        ------
+        ValueError
+            If no suitable PhaseDiagram is found for the entry.
+        """
+        entry_space = frozenset(entry.elements)
+        if entry_space in self.pds:
+            return self.pds[entry_space]
+        for space in self.pds:
+            if space.issuperset(entry_space):
+                return self.pds[space]
+
+        raise ValueError(f"No suitable PhaseDiagrams found for {entry}.")
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Get the MSONable dict of the equivalent PatchedPhaseDiagram.
+
+        Returns
+        -------
+        dict[str, Any]
+            The entries and elements, under the ``PatchedPhaseDiagram`` class.
+        """
+        return {
+            "@module": PatchedPhaseDiagram.__module__,
+            "@class": PatchedPhaseDiagram.__name__,
+            "all_entries": [entry.as_dict() for entry in self.all_entries],
+            "elements": [el.as_dict() for el in self.elements],
+        }
+
+    @classmethod
+    def from_dict(cls, dct: dict[str, Any]) -> LazyPatchedPhaseDiagram:
+        """
+        Partition the entries of a serialized PatchedPhaseDiagram.
+
+        Parameters
+        ----------
+        dct
+            MSONable dict of a PatchedPhaseDiagram.
+
+        Returns
+        -------
+        LazyPatchedPhaseDiagram
+            Phase diagram whose sub-space convex hulls are computed on first
+            use.
+        """
+        decoder = MontyDecoder()
+        entries = [decoder.process_decoded(entry) for entry in dct["all_entries"]]
+        elements = [Element.from_dict(el) for el in dct["elements"]]
+        layout = _partition_entries(entries, elements)
+        return cls(layout.elements, layout.spaces, _LayoutReader(layout))
+
+    def materialize(self) -> None:
+        """
+        Build every sub-space PhaseDiagram and load all entries.
+
+        Returns
+        -------
+        None
+        """
+        for space in self.spaces:
+            self.pds[space]
+        self.layout  # noqa: B018
+
+
+def read_lazy_phase_diagram(
+    serialized_phase_diagram: str | Path,
+) -> LazyPatchedPhaseDiagram:
+    """
+    Read a JSON-serialized PatchedPhaseDiagram without building its sub-spaces.
+
+    Only the convex hull construction is deferred: the JSON format has no
+    index of the entries of each sub-space, so the whole file is decoded and
+    every entry partitioned up front. The compact ``.npz`` format written by
+    :func:`qmof_thermo.convert_phase_diagram` is indexed, and its reader
+    also deserializes each sub-space on first use only.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the JSON PatchedPhaseDiagram written by ``setup_phase_diagrams``.
+
+    Returns
+    -------
+    LazyPatchedPhaseDiagram
+        Phase diagram whose sub-space convex hulls are computed on first use.
+    """
+    return LazyPatchedPhaseDiagram.from_dict(loadfn(serialized_phase_diagram, cls=None))
+
+
+def _open_text(path: Path) -> TextIO:
+    """Open a text file for reading, decompressing it if it is gzipped."""
+    with path.open("rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open(encoding="utf-8")
+
+
+def _iter_json_records(
+    path: Path, chunk_size: int = _JSON_CHUNK_SIZE
+) -> Iterator[dict[str, Any]]:
+    """
+    Iterate over the records of a JSON array without loading the whole file.
+
+    The file is read in chunks, and each record is decoded as soon as it is
+    complete, so that only one record and one chunk are held in memory at a
+    time.
+
+    Parameters
+    ----------
+    path
+        Path to a JSON file holding an array of objects, optionally
+        gzip-compressed.
+    chunk_size
+        Number of characters read at a time. Records longer than this are
+        read in growing chunks until they are complete.
+
+    Yields
+    ------
+    dict[str, Any]
+        Each record of the array, in file order.
+
+    Raises
+    ------
+    ValueError
+        If the file does not hold a JSON array or ends before it is closed.
+    """
+    decoder = json.JSONDecoder()
+    with _open_text(path) as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array of records.")
+        pos = 1
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\n\r,":
+                pos += 1
+            if pos == len(buffer):
+                buffer, pos = f.read(chunk_size), 0
+                if not buffer:
+                    raise ValueError(f"Unexpected end of {path}.")
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The record runs past the buffer. Reading at least as much as
+                # is left keeps the cost of the retries linear in its length.
+                chunk = f.read(max(chunk_size, len(buffer) - pos))
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            eof = False
+            yield record
+
+
+def _table_format(path: Path) -> str:
+    """Get the format of a thermo or structure table from its file suffix."""
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if suffixes and suffixes[-1] in _COMPRESSION_SUFFIXES:
+        suffixes.pop()
+    return _TABLE_FORMATS.get(suffixes[-1] if suffixes else "", "json")
+
+
+def _table_columns(path: Path, table_format: str) -> list[str] | None:
+    """Get the column names of a table without reading its rows, if possible."""
+    if table_format == "csv":
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    if table_format == "jsonl":
+        return pd.read_json(path, lines=True, nrows=1).columns.tolist()
+    if table_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path).names
+    if table_format == "feather":
+        import pyarrow.ipc
+
+        with pyarrow.ipc.open_file(path) as reader:
+            return reader.schema.names
+    return None
+
+
+def _read_thermo_table(
+    path: Path, columns: Sequence[str], ehull_key: str, max_ehull: float
+) -> pd.DataFrame:
+    """
+    Read the rows of a thermo table within ``max_ehull`` of the hull.
+
+    Only ``columns`` are read where the format allows it. The filter on the
+    energy above hull is applied by the Parquet reader itself, and to each
+    chunk of a CSV or JSON Lines table, so that rows further from the hull
+    are never all held in memory.
+
+    Parameters
+    ----------
+    path
+        Path to a JSON, JSON Lines, CSV, Parquet or Feather table. Text
+        formats may be compressed, as inferred by pandas from the suffix.
+    columns
+        Columns to read, including ``ehull_key``.
+    ehull_key
+        Column of the energy above hull in eV/atom.
+    max_ehull
+        Largest energy above hull in eV/atom of the rows kept.
+
+    Returns
+    -------
+    pd.DataFrame
+        The ``columns`` of the rows with ``0 <= ehull_key <= max_ehull``.
+
+    Raises
+    ------
+    KeyError
+        If one of ``columns`` is not in the table.
+    """
+    table_format = _table_format(path)
+    available = _table_columns(path, table_format)
+
+    def check_columns(available: Sequence[str]) -> None:
+        for column in columns:
+            if column not in available:
+                raise KeyError(f"Column '{column}' not found in thermo data.")
+
+    if available is not None:
+        check_columns(available)
+    columns = list(columns)
+
+    if table_format == "parquet":
+        return pd.read_parquet(
+            path,
+            columns=columns,
+            filters=[(ehull_key, ">=", 0.0), (ehull_key, "<=", max_ehull)],
+        )
+    if table_format == "feather":
+        df = pd.read_feather(path, columns=columns)
+        return df[df[ehull_key].between(0, max_ehull)]
+    if table_format in ("csv", "jsonl"):
+        chunks = (
+            pd.read_csv(path, usecols=columns, chunksize=_TABLE_CHUNK_ROWS)
+            if table_format == "csv"
+            else pd.read_json(path, lines=True, chunksize=_TABLE_CHUNK_ROWS)
+        )
+        with chunks as reader:
+            return pd.concat(
+                [
+                    chunk.loc[chunk[ehull_key].between(0, max_ehull), columns]
+                    for chunk in reader
+                ],
+                ignore_index=True,
+            )
+
+    df = pd.read_json(path)
+    check_columns(df.columns)
+    return df.loc[df[ehull_key].between(0, max_ehull), columns]
+
+
+def _iter_structure_records(
+    path: Path, mpid_key: str, mpids: set[str]
+) -> Iterator[dict[str, Any]]:
+    """
+    Iterate over the records of a structures table.
+
+    Parameters
+    ----------
+    path
+        Path to a JSON array or JSON Lines file, optionally gzip-compressed,
+        or to a CSV, Parquet or Feather table with ``mpid_key`` and
+        ``"structure"`` columns. Structures stored as JSON strings are
+        decoded.
+    mpid_key
+        Column/key of the material IDs.
+    mpids
+        IDs of the records needed. Columnar formats only yield these, and
+        Parquet only reads the row groups that may contain them; other
+        formats yield every record.
+
+    Yields
+    ------
+    dict[str, Any]
+        Each record, with at least ``mpid_key`` and ``"structure"`` if the
+        table is columnar.
+    """
+    table_format = _table_format(path)
+    if table_format == "json":
+        yield from _iter_json_records(path)
+        return
+    if table_format == "jsonl":
+        with _open_text(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    columns = [mpid_key, "structure"]
+    if table_format == "parquet":
+        dfs = [
+            pd.read_parquet(
+                path, columns=columns, filters=[(mpid_key, "in", sorted(mpids))]
+            )
+        ]
+    elif table_format == "feather":
+        dfs = [pd.read_feather(path, columns=columns)]
+    else:
+        dfs = pd.read_csv(path, usecols=columns, chunksize=_TABLE_CHUNK_ROWS)
+    for df in dfs:
+        for mpid, struct_obj in zip(df[mpid_key], df["structure"], strict=True):
+            if mpid in mpids:
+                yield {
+                    mpid_key: mpid,
+                    "structure": json.loads(struct_obj)
+                    if isinstance(struct_obj, str)
+                    else struct_obj,
+                }
+
+
+def _peak_rss_mb() -> float | None:
+    """Get the peak resident set size of this process in MB, if available."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
 def _load_hull_entries(
-    structures_path: Path,
+    structures_path: Path | None,
     thermo_path: Path,
     mpid_key: str = "mpid",
     energy_key: str = "energy_total",
     ehull_key: str = "energy_above_hull",
-) -> list[HullEntry]:
+    max_ehull: float = 0.0,
+    keep_structures: bool = True,
+    composition_key: str | None = None,
+    composition_cache: dict[str, dict[str, float] | None] | None = None,
+    metrics: _BuildMetrics | None = None,
+) -> HullEntryTable:
     """
-    Load all hull entries (energy_above_hull == 0) with structures and energies.
+    Load all hull entries (energy_above_hull <= max_ehull) with structures and energies.
 
-    Reads structure and thermodynamic data from separate JSON files, filters
-    for materials on the convex hull, and returns a list of HullEntry objects
-    containing matched data.
+    Reads structure and thermodynamic data from separate tables in any of
+    the supported formats, filters for materials on or near the convex hull,
+    and returns their matched data as a HullEntryTable. The structures file
+    is streamed one record at a time, and only the structures of hull
+    entries are converted, so that memory use grows with the number of hull
+    entries rather than with the size of the file.
 
     Parameters
     ----------
     structures_path
-        Path to a JSON file containing structure records. Each record should
-        have an ID field (matching ``mpid_key``) and a ``"structure"`` field
-        containing a Structure object.
+        Path to a JSON or JSON Lines file containing structure records,
+        optionally gzip-compressed, or to a CSV, Parquet or Feather table.
+        Each record should have an ID field (matching ``mpid_key``) and a
+        ``"structure"`` field containing a Structure object or its JSON.
+        Not read, and may be None, if ``composition_key`` is given.
     thermo_path
-        Path to a JSON file containing thermodynamic data.
+        Path to a JSON, JSON Lines, CSV, Parquet or Feather table containing
+        thermodynamic data, the text formats optionally compressed. Only
+        the needed columns and the rows within ``max_ehull`` are read where
+        the format allows it.
         Must include columns of ID, total energy, and energy above hull.
     mpid_key
         Column/key for the material ID in both data sources.
@@ -88,127 +1133,432 @@ def _load_hull_entries(
         Column name for total energy (eV) in thermo data.
     ehull_key
         Column name for energy above hull (eV) in thermo data.
+    max_ehull
+        Largest energy above hull (eV/atom) of the loaded entries.
+    keep_structures
+        Whether to deserialize the full Structure of each entry. If False,
+        only the compositions are read from the species of the sites and
+        the table holds no structures.
+    composition_key
+        Column of formulas or compositions in the thermo data. If given, the
+        compositions are taken from it and ``structures_path`` is not read.
+    composition_cache
+        Element amounts already parsed from ``structures_path``, or None for
+        hull MPIDs without a usable structure. Cached MPIDs are not parsed
+        again if ``keep_structures`` is False, and the structures file is not
+        read at all if every hull MPID is cached. Newly parsed hull MPIDs are
+        added to it.
+    metrics
+        Records the time and memory of each loading stage, if given.
 
     Returns
     -------
-    list[HullEntry]
-        List of HullEntry objects for all valid materials
-        with ``energy_above_hull = 0``.
+    HullEntryTable
+        Array-backed table of the energies, energies above hull and element
+        amounts of all valid materials with
+        ``0 <= energy_above_hull <= max_ehull``, and their structures if
+        ``keep_structures`` is True.
 
     Raises
     ------
     KeyError
-        If required columns (``mpid_key``, ``energy_key``, or ``ehull_key``)
-        not found in the thermo JSON.
+        If required columns (``mpid_key``, ``energy_key``, ``ehull_key`` or
+        ``composition_key``) not found in the thermo data.
+    ValueError
+        If neither ``structures_path`` nor ``composition_key`` is given.
     """
+    if (peak_rss := _peak_rss_mb()) is not None:
+        LOGGER.info(f"Peak RSS before loading reference data: {peak_rss:.1f} MB")
+    if metrics is None:
+        metrics = _BuildMetrics()
 
-    LOGGER.info(f"Loading structures from: {structures_path}")
-    with structures_path.open() as f:
-        struct_records = json.load(f)
-    LOGGER.info(f"Loaded {len(struct_records)} structure records.")
+    if composition_key is None and structures_path is None:
+        raise ValueError("Either structures_path or composition_key is needed.")
 
     LOGGER.info(f"Loading thermo data from: {thermo_path}")
-    df = pd.read_json(thermo_path)
-
-    if ehull_key not in df.columns:
-        raise KeyError(f"Column '{ehull_key}' not found in thermo JSON.")
-    if energy_key not in df.columns:
-        raise KeyError(f"Column '{energy_key}' not found in thermo JSON.")
-    if mpid_key not in df.columns:
-        raise KeyError(f"Column '{mpid_key}' not found in thermo JSON.")
+    columns = [ehull_key, energy_key, mpid_key]
+    if composition_key is not None:
+        columns.append(composition_key)
 
     # Only hull entries
-    hull_df = df[df[ehull_key] == 0].copy()
-    hull_mpids = hull_df[mpid_key].tolist()
-    LOGGER.info(f"Found {len(hull_mpids)} hull MPIDs with {ehull_key} == 0.")
-    LOGGER.info(f"Using {len(hull_mpids)} MPIDs as reference hull entries.")
-
-    # Lookup from mpid -> energy_total
-    hull_energy_lookup: dict[str, float] = dict(
-        zip(hull_df[mpid_key], hull_df[energy_key], strict=True)
-    )
+    with metrics.stage("thermo_load") as record:
+        hull_df = _read_thermo_table(thermo_path, columns, ehull_key, max_ehull)
+        record["n_hull_rows"] = len(hull_df)
 
-    # Build mpid -> structure mapping
-    struct_lookup: dict[str, Structure] = {}
-    missing_struct_count = 0
-
-    for rec in struct_records:
-        if mpid_key not in rec:
-            continue
-        mpid = rec[mpid_key]
-        if mpid not in hull_energy_lookup:
-            # not on hull; we don't need this entry
-            continue
-
-        if "structure" not in rec:
-            missing_struct_count += 1
-            if missing_struct_count <= 10:
-                LOGGER.warning(f"Warning: structure missing for {mpid}, skipping.")
-            elif missing_struct_count == 11:
-                LOGGER.warning("Further missing structure warnings suppressed...")
-            continue
-
-        struct_obj = rec["structure"]
-        if isinstance(struct_obj, dict):
-            struct = Structure.from_dict(struct_obj)
-        elif isinstance(struct_obj, Structure):
-            struct = struct_obj
-        else:
-            LOGGER.warning(
-                f"Warning: structure for {mpid} is not a dict or Structure "
-                f"(type={type(struct_obj)}), skipping."
+    with metrics.stage("filter") as record:
+        hull_mpids = hull_df[mpid_key].tolist()
+        LOGGER.info(
+            f"Found {len(hull_mpids)} hull MPIDs with {ehull_key} <= {max_ehull}."
+        )
+        LOGGER.info(f"Using {len(hull_mpids)} MPIDs as reference hull entries.")
+
+        # Lookup from mpid -> energy_total
+        hull_energy_lookup: dict[str, float] = dict(
+            zip(hull_df[mpid_key], hull_df[energy_key], strict=True)
+        )
+        ehull_lookup: dict[str, float] = dict(
+            zip(hull_df[mpid_key], hull_df[ehull_key], strict=True)
+        )
+
+        # Build mpid -> structure and element amounts mapping
+        struct_lookup: dict[str, Structure] = {}
+        amounts_lookup: dict[str, dict[str, float]] = {}
+        if composition_key is not None:
+            LOGGER.info(f"Reading compositions from the '{composition_key}' column.")
+            for mpid, value in zip(
+                hull_df[mpid_key], hull_df[composition_key], strict=True
+            ):
+                amounts_lookup[mpid] = _element_amounts(Composition(value))
+        del hull_df
+
+        use_cache = composition_key is None and not keep_structures
+        cached = composition_cache if composition_cache and use_cache else {}
+        for mpid in hull_mpids:
+            if (amounts := cached.get(mpid)) is not None:
+                amounts_lookup[mpid] = amounts
+        to_parse = (
+            {mpid for mpid in hull_mpids if mpid not in cached}
+            if composition_key is None
+            else set()
+        )
+        if cached:
+            LOGGER.info(
+                f"Reusing cached compositions of {len(hull_mpids) - len(to_parse)} "
+                f"of {len(hull_mpids)} hull MPIDs."
             )
-            continue
+        record["n_hull_mpids"] = len(hull_mpids)
+        record["n_to_parse"] = len(to_parse)
 
-        struct_lookup[mpid] = struct
+    if to_parse:
+        LOGGER.info(f"Streaming structures from: {structures_path}")
+        missing_struct_count = 0
+        n_records = 0
+        decode_wall_time = decode_cpu_time = 0.0
 
-    LOGGER.info(
-        f"Structures available for {len(struct_lookup)} "
-        f"of {len(hull_mpids)} hull MPIDs."
+        with metrics.stage("structures_load") as record:
+            for rec in _iter_structure_records(structures_path, mpid_key, to_parse):
+                n_records += 1
+                if mpid_key not in rec:
+                    continue
+                mpid = rec[mpid_key]
+                if mpid not in to_parse:
+                    # not on hull or already cached; we don't need this entry
+                    continue
+
+                if "structure" not in rec:
+                    missing_struct_count += 1
+                    if missing_struct_count <= 10:
+                        LOGGER.warning(
+                            f"Warning: structure missing for {mpid}, skipping."
+                        )
+                    elif missing_struct_count == 11:
+                        LOGGER.warning(
+                            "Further missing structure warnings suppressed..."
+                        )
+                    continue
+
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                decoded = _decode_structure(mpid, rec["structure"], keep_structures)
+                decode_wall_time += time.perf_counter() - wall_start
+                decode_cpu_time += time.process_time() - cpu_start
+                if decoded is None:
+                    continue
+                struct, amounts_lookup[mpid] = decoded
+                if struct is not None:
+                    struct_lookup[mpid] = struct
+            record["n_records"] = n_records
+
+        metrics.add(
+            {"stage": "structure_decoding", "n_structures": len(to_parse)},
+            decode_wall_time,
+            decode_cpu_time,
+        )
+        LOGGER.info(f"Read {n_records} structure records.")
+        if composition_cache is not None:
+            composition_cache.update(
+                {mpid: amounts_lookup.get(mpid) for mpid in to_parse}
+            )
+        LOGGER.info(
+            f"Structures available for {len(amounts_lookup)} "
+            f"of {len(hull_mpids)} hull MPIDs."
+        )
+
+    with metrics.stage("entry_table") as record:
+        table = _assemble_hull_entries(
+            hull_mpids,
+            struct_lookup if keep_structures else None,
+            amounts_lookup,
+            hull_energy_lookup,
+            ehull_lookup,
+        )
+        record["n_entries"] = len(table)
+    return table
+
+
+def _decode_structure(
+    mpid: str, struct_obj: Any, keep_structures: bool
+) -> tuple[Structure | None, dict[str, float]] | None:
+    """
+    Decode the structure of a record into its element amounts.
+
+    Parameters
+    ----------
+    mpid
+        Material ID of the record, for warnings.
+    struct_obj
+        Structure or ``Structure.as_dict()`` output.
+    keep_structures
+        Whether to deserialize and return the full Structure.
+
+    Returns
+    -------
+    tuple[Structure | None, dict[str, float]] | None
+        The Structure if kept, and the number of atoms of each element
+        symbol, or None if ``struct_obj`` is neither a dict nor a Structure.
+    """
+    if isinstance(struct_obj, dict) and not keep_structures:
+        return None, _element_amounts_from_structure_dict(struct_obj)
+    if isinstance(struct_obj, dict):
+        struct = Structure.from_dict(struct_obj)
+    elif isinstance(struct_obj, Structure):
+        struct = struct_obj
+    else:
+        LOGGER.warning(
+            f"Warning: structure for {mpid} is not a dict or Structure "
+            f"(type={type(struct_obj)}), skipping."
+        )
+        return None
+    return struct if keep_structures else None, _element_amounts(struct.composition)
+
+
+def _assemble_hull_entries(
+    hull_mpids: list[str],
+    struct_lookup: dict[str, Structure] | None,
+    amounts_lookup: dict[str, dict[str, float]],
+    hull_energy_lookup: dict[str, float],
+    ehull_lookup: dict[str, float],
+) -> HullEntryTable:
+    """
+    Assemble the table of the hull MPIDs with a known composition.
+
+    Parameters
+    ----------
+    hull_mpids
+        MPIDs of the hull entries, in the order of the thermo data.
+    struct_lookup
+        Structure of each MPID with a composition, or None if structures are
+        not kept.
+    amounts_lookup
+        Number of atoms of each element symbol of each MPID.
+    hull_energy_lookup
+        Total energy in eV of each MPID.
+    ehull_lookup
+        Energy above hull in eV/atom of each MPID.
+
+    Returns
+    -------
+    HullEntryTable
+        The hull entries, in the order of ``hull_mpids``.
+    """
+    mpids = [mpid for mpid in hull_mpids if mpid in amounts_lookup]
+    table = HullEntryTable.from_amounts(
+        mpids,
+        [amounts_lookup[mpid] for mpid in mpids],
+        [hull_energy_lookup[mpid] for mpid in mpids],
+        [ehull_lookup[mpid] for mpid in mpids],
+        [struct_lookup[mpid] for mpid in mpids] if struct_lookup is not None else None,
     )
 
-    # Assemble final HullEntry list
-    all_entries: list[HullEntry] = []
-    used_count = 0
-    for mpid in hull_mpids:
-        if mpid not in struct_lookup:
-            continue
+    LOGGER.info(f"Total hull entries with both energy and composition: {len(table)}")
+    if (peak_rss := _peak_rss_mb()) is not None:
+        LOGGER.info(f"Peak RSS after loading reference data: {peak_rss:.1f} MB")
+
+    return table
+
+
+class _BuildMetrics:
+    """
+    Wall time, CPU time and peak RSS of each stage of a phase diagram build.
+
+    CPU time is that of the building process, excluding worker processes.
 
-        struct = struct_lookup[mpid]
-        energy = float(hull_energy_lookup[mpid])
-        elements = frozenset(chemical_space_from_structure(struct))
+    Parameters
+    ----------
+    callback
+        Called with the record of each stage as soon as it ends.
+    """
+
+    def __init__(
+        self, callback: Callable[[dict[str, Any]], None] | None = None
+    ) -> None:
+        self.callback = callback
+        self.stages: list[dict[str, Any]] = []
+        self._start = (time.perf_counter(), time.process_time())
+
+    @contextmanager
+    def stage(self, name: str, **info: Any) -> Iterator[dict[str, Any]]:
+        """
+        Measure a stage of the build.
+
+        Parameters
+        ----------
+        name
+            Name of the stage.
+        **info
+            Extra fields of the record, such as the tolerance being built.
 
-        all_entries.append(HullEntry(mpid, struct, energy, elements))
-        used_count += 1
+        Yields
+        ------
+        dict[str, Any]
+            Record of the stage, to which the stage may add counts.
+        """
+        record: dict[str, Any] = {"stage": name, **info}
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        yield record
+        self.add(
+            record, time.perf_counter() - wall_start, time.process_time() - cpu_start
+        )
 
-    LOGGER.info(f"Total hull entries with both energy and structure: {used_count}")
+    def add(self, record: dict[str, Any], wall_time: float, cpu_time: float) -> None:
+        """Record a stage that was measured separately."""
+        record["wall_time_s"] = wall_time
+        record["cpu_time_s"] = cpu_time
+        record["peak_rss_mb"] = _peak_rss_mb()
+        self.stages.append(record)
+        LOGGER.debug(
+            f"Stage {record['stage']} took {wall_time:.3f} s wall, {cpu_time:.3f} s CPU"
+        )
+        if self.callback is not None:
+            self.callback(record)
 
-    return all_entries
+    def write(self, path: Path, **info: Any) -> None:
+        """Write the records of all stages, the totals and ``info`` as JSON."""
+        report = {
+            **info,
+            "stages": self.stages,
+            "total": {
+                "wall_time_s": time.perf_counter() - self._start[0],
+                "cpu_time_s": time.process_time() - self._start[1],
+                "peak_rss_mb": _peak_rss_mb(),
+            },
+        }
+        path.write_text(json.dumps(report, indent=2))
+        LOGGER.info(f"Saved build metrics to: {path}")
+
+
+def _file_digest(path: Path) -> str:
+    """Compute the SHA-256 digest of a file, reading it in chunks."""
+    sha = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(_JSON_CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _json_digest(obj: Any) -> str:
+    """Compute the SHA-256 digest of a JSON-serializable object."""
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()
+
+
+def _read_build_record(
+    output_dir: Path, digest: str, compact: bool
+) -> dict[float, Path] | None:
+    """
+    Get the outputs of a previous build with the same inputs, if any.
+
+    Parameters
+    ----------
+    output_dir
+        Directory of the previous build.
+    digest
+        Digest of the inputs of the current build.
+    compact
+        Whether the compact ``.npz`` files must exist too.
+
+    Returns
+    -------
+    dict[float, Path] | None
+        Path of the ``patched_phase_diagram.json`` of each tolerance, or None
+        if the inputs changed or an output is missing.
+    """
+    record_path = output_dir / _DEFAULT_BUILD_RECORD_FILENAME
+    if not record_path.exists():
+        return None
+    try:
+        record = json.loads(record_path.read_text())
+    except json.JSONDecodeError:
+        LOGGER.warning(f"Ignoring unreadable build record: {record_path}")
+        return None
+    if record.get("digest") != digest:
+        return None
+
+    pd_paths = {float(tol): output_dir / path for tol, path in record["outputs"]}
+    expected = list(pd_paths.values())
+    if compact:
+        expected += [p.with_name(_DEFAULT_COMPACT_PD_FILENAME) for p in expected]
+    if not all(p.exists() for p in expected):
+        return None
+    return pd_paths
+
+
+def _read_composition_cache(path: Path) -> dict[str, dict[str, float] | None]:
+    """Read the compositions parsed from a structures file by a previous build."""
+    if not path.exists():
+        return {}
+    LOGGER.info(f"Loading cached compositions from: {path}")
+    return json.loads(path.read_text())
+
+
+def _write_composition_cache(
+    path: Path, cache: dict[str, dict[str, float] | None]
+) -> None:
+    """Write the compositions parsed from a structures file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(cache))
 
 
 def setup_phase_diagrams(
-    structures_path: str | Path,
+    structures_path: str | Path | None,
     thermo_path: str | Path,
     output_dir: str | Path = Path("data/references"),
     id_key: str = "mpid",
     energy_key: str = "energy_total",
     ehull_key: str = "energy_above_hull",
-) -> None:
+    compact: bool = False,
+    correction: EnergyCorrection | None = None,
+    ehull_tolerances: Sequence[float] | None = None,
+    composition_key: str | None = None,
+    n_workers: int = 1,
+    force: bool = False,
+    metrics_callback: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[float, Path]:
     """
-    Load reference hull data and construct a PatchedPhaseDiagram.
+    Load reference hull data and construct PatchedPhaseDiagrams.
 
-    Builds a single PatchedPhaseDiagram from all stable compounds
-    (energy_above_hull = 0) and saves it to disk. The PatchedPhaseDiagram
+    Without ``ehull_tolerances``, builds a single PatchedPhaseDiagram from
+    all stable compounds (energy_above_hull = 0) and saves it to
+    ``output_dir``. With ``ehull_tolerances``, builds one PatchedPhaseDiagram
+    per tolerance from the compounds within that energy above hull, each
+    saved to its own ``within_<tolerance>_eVperatom`` subdirectory. The
+    input files are read once for all tolerances. Diagrams are built from
+    the smallest tolerance up, and each one only recomputes the sub-spaces
+    containing the entries it adds to the previous one. A PatchedPhaseDiagram
     internally partitions entries by chemical space for efficient
     energy-above-hull queries.
 
     Parameters
     ----------
-    structures_path : str | Path
-        Path to a JSON file containing structure records. Each record should
-        have an ID field and a "structure" field (pymatgen Structure).
+    structures_path : str | Path | None
+        Path to a JSON or JSON Lines file containing structure records,
+        optionally gzip-compressed, or to a CSV, Parquet or Feather table.
+        Each record should have an ID field and a "structure" field
+        (pymatgen Structure or its JSON). The file is streamed, and only the
+        compositions of hull entries are read from it. Not read, and may be
+        None, if ``composition_key`` is given.
     thermo_path : str | Path
-        Path to a JSON file containing thermo data.
+        Path to a JSON, JSON Lines, CSV, Parquet or Feather table containing
+        thermo data, the text formats optionally compressed. Parquet and
+        Feather need ``pyarrow``.
         Must include columns for ID, total energy, and energy above hull.
     output_dir : str | Path
         Directory where the PatchedPhaseDiagram JSON file will be saved.
@@ -219,31 +1569,476 @@ def setup_phase_diagrams(
         Column name for total energy (eV) in the thermo data.
     ehull_key : str, default "energy_above_hull"
         Column name for energy above hull (eV) in the thermo data.
+    compact : bool, default False
+        Whether to also write ``patched_phase_diagram.npz``, the compact
+        array-backed format that loads without recomputing convex hulls.
+    correction : EnergyCorrection, optional
+        Per-element correction applied to the reference energies, e.g. to
+        bring MLIP energies onto the DFT scale.
+    ehull_tolerances : Sequence[float], optional
+        Largest energy above hull (eV/atom) of the reference entries of each
+        diagram. Each diagram is saved to a ``within_<tolerance>_eVperatom``
+        subdirectory of ``output_dir``.
+    composition_key : str, optional
+        Column of formulas or compositions in the thermo data to take the
+        compositions from instead of the structures file.
+    n_workers : int, default 1
+        Number of processes computing the convex hulls of the chemical
+        sub-spaces. The result does not depend on it.
+    force : bool, default False
+        Whether to rebuild even if ``output_dir`` holds a build with the
+        same inputs, and to parse every structure again.
+    metrics_callback : Callable[[dict], None], optional
+        Called with the record of each build stage as soon as it ends. Each
+        record holds the ``stage`` name, its ``wall_time_s``, ``cpu_time_s``
+        and the ``peak_rss_mb`` of the process so far, plus counts such as
+        the number of entries, and the time of each chemical sub-space for
+        the ``subspace_hulls`` stage. All records are also written to
+        ``patched_phase_diagram_build_metrics.json`` in ``output_dir``.
 
     Returns
     -------
-    None
-        Outputs ``patched_phase_diagram.json`` to ``output_dir``.
+    dict[float, Path]
+        Path of the ``patched_phase_diagram.json`` written for each
+        tolerance, keyed by tolerance in ascending order, next to the
+        optional ``patched_phase_diagram.npz``. Without
+        ``ehull_tolerances``, the only key is 0.0.
     """
-    structures_path = Path(structures_path)
+    structures_path = Path(structures_path) if structures_path is not None else None
     thermo_path = Path(thermo_path)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    tolerances = sorted(ehull_tolerances) if ehull_tolerances is not None else [0.0]
+
+    metrics = _BuildMetrics(metrics_callback)
+    metrics_path = output_dir / _DEFAULT_METRICS_FILENAME
+
+    # Skip the build if the inputs and options are those of the last one
+    with metrics.stage("input_digest"):
+        structures_digest = (
+            _file_digest(structures_path)
+            if structures_path is not None and composition_key is None
+            else None
+        )
+        inputs = {
+            "format_version": _BUILD_FORMAT_VERSION,
+            "pymatgen": version("pymatgen"),
+            "structures": structures_digest,
+            "thermo": _file_digest(thermo_path),
+            "id_key": id_key,
+            "energy_key": energy_key,
+            "ehull_key": ehull_key,
+            "composition_key": composition_key,
+            "ehull_tolerances": tolerances if ehull_tolerances is not None else None,
+            "correction": correction.digest if correction is not None else None,
+        }
+        digest = _json_digest(inputs)
+    if not force and (pd_paths := _read_build_record(output_dir, digest, compact)):
+        LOGGER.info(
+            f"Inputs unchanged since the last build in {output_dir}; "
+            "reusing its phase diagrams."
+        )
+        metrics.write(metrics_path, skipped=True)
+        return pd_paths
+    # An interrupted build must not pass for the previous one
+    (output_dir / _DEFAULT_BUILD_RECORD_FILENAME).unlink(missing_ok=True)
+
+    # Compositions only depend on the structures file and the ID key
+    composition_cache_path = None
+    composition_cache: dict[str, dict[str, float] | None] = {}
+    if structures_digest is not None:
+        composition_cache_path = (
+            output_dir
+            / _BUILD_CACHE_DIRNAME
+            / f"compositions_{_json_digest([structures_digest, id_key])[:16]}.json"
+        )
+        if not force:
+            composition_cache = _read_composition_cache(composition_cache_path)
+    n_cached = len(composition_cache)
+
     hull_entries = _load_hull_entries(
-        structures_path, thermo_path, id_key, energy_key, ehull_key
+        structures_path,
+        thermo_path,
+        id_key,
+        energy_key,
+        ehull_key,
+        tolerances[-1],
+        keep_structures=False,
+        composition_key=composition_key,
+        composition_cache=composition_cache,
+        metrics=metrics,
     )
+    if composition_cache_path is not None and len(composition_cache) > n_cached:
+        _write_composition_cache(composition_cache_path, composition_cache)
+
+    with metrics.stage("pdentry_creation") as record:
+        pd_entries = hull_entries.to_pd_entries()
+        if correction is not None:
+            LOGGER.info(f"Applying the {correction.name} correction to the entries.")
+            pd_entries = correction.correct_entries(pd_entries)
+        record["n_entries"] = len(pd_entries)
+
+    pd_paths: dict[float, Path] = {}
+    ppd: PatchedPhaseDiagram | None = None
+    for i, tolerance in enumerate(tolerances):
+        within = hull_entries.energy_above_hull <= tolerance
+        tol_entries = [pd_entries[j] for j in np.flatnonzero(within)]
+        timings: dict[frozenset[Element], float] = {}
+        if ppd is None:
+            LOGGER.info(
+                f"Building PatchedPhaseDiagram from {len(tol_entries)} entries..."
+            )
+            with metrics.stage("partition", tolerance=tolerance):
+                layout = _partition_entries(tol_entries)
+            with metrics.stage(
+                "subspace_hulls", tolerance=tolerance, n_workers=n_workers
+            ) as record:
+                ppd = _assemble_patched_phase_diagram(
+                    layout, _build_subspaces(layout, layout.spaces, n_workers, timings)
+                )
+                record["subspace_times_s"] = {
+                    _space_label(space): t for space, t in timings.items()
+                }
+        else:
+            added = hull_entries.select(
+                within & (hull_entries.energy_above_hull > tolerances[i - 1])
+            )
+            LOGGER.info(
+                f"Adding {len(added)} entries within {tolerance} eV/atom of the hull..."
+            )
+            with metrics.stage(
+                "subspace_hulls", tolerance=tolerance, n_workers=n_workers
+            ) as record:
+                ppd, _ = _rebuild_changed_subspaces(
+                    ppd, tol_entries, added.chemical_systems(), n_workers, timings
+                )
+                record["subspace_times_s"] = {
+                    _space_label(space): t for space, t in timings.items()
+                }
+        n_elements = len(ppd.elements) if ppd.elements else 0
+        LOGGER.info(
+            f"PatchedPhaseDiagram built with {n_elements} elements "
+            f"and {len(ppd)} chemical sub-spaces."
+        )
+
+        tol_dir = (
+            output_dir
+            if ehull_tolerances is None
+            else output_dir / f"within_{tolerance}_eVperatom"
+        )
+        tol_dir.mkdir(parents=True, exist_ok=True)
+        with metrics.stage("serialization", tolerance=tolerance):
+            pd_path = pd_paths[tolerance] = tol_dir / _DEFAULT_PD_FILENAME
+            dumpfn(ppd, pd_path)
+            LOGGER.info(f"Saved PatchedPhaseDiagram to: {pd_path}")
+
+            if compact:
+                from qmof_thermo.compact import write_compact_phase_diagram
+
+                write_compact_phase_diagram(ppd, tol_dir / _DEFAULT_COMPACT_PD_FILENAME)
+
+    record = {
+        "digest": digest,
+        "inputs": inputs,
+        "outputs": [
+            [tolerance, str(path.relative_to(output_dir))]
+            for tolerance, path in pd_paths.items()
+        ],
+    }
+    (output_dir / _DEFAULT_BUILD_RECORD_FILENAME).write_text(
+        json.dumps(record, indent=2)
+    )
+    metrics.write(metrics_path, skipped=False)
+    return pd_paths
+
+
+def _space_label(space: frozenset[Element]) -> str:
+    """Format a chemical space as its sorted element symbols joined by dashes."""
+    return "-".join(sorted(el.symbol for el in space))
+
+
+# Layout of the PatchedPhaseDiagram being built by a worker process of
+# ``_build_subspaces``, and the index of each of its qhull entries
+_WORKER_STATE: dict[str, Any] = {}
+
+# Number of slowest sub-spaces reported after a build
+_N_SLOWEST_SPACES = 5
+
+
+def _init_build_worker(layout: _PatchLayout) -> None:
+    """Hold the layout of the PatchedPhaseDiagram in a worker process."""
+    _WORKER_STATE["layout"] = layout
+    _WORKER_STATE["index"] = {id(e): i for i, e in enumerate(layout.qhull_entries)}
+
+
+def _compute_subspace(space: frozenset[Element]) -> tuple[dict[str, Any], float]:
+    """
+    Compute the convex hull of a sub-space in a worker process.
+
+    Entries are returned as indices into the qhull entries of the layout,
+    so that the parent process can rebuild the PhaseDiagram around its own
+    entry objects instead of unpickled copies.
+
+    Parameters
+    ----------
+    space
+        Chemical sub-space of the layout held by the worker.
+
+    Returns
+    -------
+    dict[str, Any]
+        ``PhaseDiagram.computed_data`` with entries replaced by indices,
+        plus the ``entries`` and ``elements`` the diagram was built from.
+    float
+        Time spent computing the convex hull in seconds.
+    """
+    start = time.perf_counter()
+    entries = _WORKER_STATE["layout"].space_entries(space)
+    pd = PhaseDiagram(entries)
+    elapsed = time.perf_counter() - start
+
+    index = _WORKER_STATE["index"]
+    data = {
+        **pd.computed_data,
+        "all_entries": [index[id(e)] for e in pd.computed_data["all_entries"]],
+        "qhull_entries": [index[id(e)] for e in pd.computed_data["qhull_entries"]],
+        "el_refs": [(el, index[id(e)]) for el, e in pd.computed_data["el_refs"]],
+        "entries": [index[id(e)] for e in entries],
+        "elements": pd.elements,
+    }
+    return data, elapsed
 
-    pd_entries = [PDEntry(e.structure.composition, e.energy) for e in hull_entries]
 
-    LOGGER.info(f"Building PatchedPhaseDiagram from {len(pd_entries)} entries...")
-    ppd = PatchedPhaseDiagram(pd_entries)
-    n_elements = len(ppd.elements) if ppd.elements else 0
+def _restore_subspace(layout: _PatchLayout, data: dict[str, Any]) -> PhaseDiagram:
+    """Rebuild a PhaseDiagram computed by ``_compute_subspace`` from its indices."""
+    entries = layout.qhull_entries
+    computed_data = {
+        **data,
+        "all_entries": [entries[i] for i in data["all_entries"]],
+        "qhull_entries": [entries[i] for i in data["qhull_entries"]],
+        "el_refs": [(el, entries[i]) for el, i in data["el_refs"]],
+    }
+    del computed_data["entries"], computed_data["elements"]
+    return PhaseDiagram(
+        [entries[i] for i in data["entries"]],
+        data["elements"],
+        computed_data=computed_data,
+    )
+
+
+def _build_subspaces(
+    layout: _PatchLayout,
+    spaces: Sequence[frozenset[Element]],
+    n_workers: int = 1,
+    timings: dict[frozenset[Element], float] | None = None,
+) -> dict[frozenset[Element], PhaseDiagram]:
+    """
+    Compute the PhaseDiagram of chemical sub-spaces, optionally in parallel.
+
+    Sub-spaces are scheduled from the most to the fewest entries, so that
+    the slowest convex hulls do not end up last in the queue. The diagrams
+    are identical to those computed serially, and share the entry objects
+    of the layout.
+
+    Parameters
+    ----------
+    layout
+        Entries and chemical sub-spaces of the PatchedPhaseDiagram.
+    spaces
+        Sub-spaces of the layout to compute.
+    n_workers
+        Number of worker processes. Workers are forked where possible,
+        inheriting the layout instead of receiving it by pickle.
+    timings
+        Filled with the time spent computing each sub-space in seconds, if
+        given.
+
+    Returns
+    -------
+    dict[frozenset[Element], PhaseDiagram]
+        PhaseDiagram of each sub-space.
+    """
+    if timings is None:
+        timings = {}
+    pds: dict[frozenset[Element], PhaseDiagram] = {}
+    start = time.perf_counter()
+    if n_workers > 1 and len(spaces) > 1:
+        sizes = {space: len(layout.space_entries(space)) for space in spaces}
+        ordered = sorted(spaces, key=sizes.__getitem__, reverse=True)
+        n_workers = min(n_workers, len(spaces))
+        LOGGER.info(
+            f"Building {len(spaces)} chemical sub-spaces over {n_workers} processes"
+        )
+        start_methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "fork" if "fork" in start_methods else None
+        )
+        with ProcessPoolExecutor(
+            n_workers,
+            mp_context=context,
+            initializer=_init_build_worker,
+            initargs=(layout,),
+        ) as pool:
+            futures = {
+                space: pool.submit(_compute_subspace, space) for space in ordered
+            }
+            for space in spaces:
+                data, timings[space] = futures[space].result()
+                pds[space] = _restore_subspace(layout, data)
+    else:
+        for space in spaces:
+            space_start = time.perf_counter()
+            pds[space] = PhaseDiagram(layout.space_entries(space))
+            timings[space] = time.perf_counter() - space_start
+
+    for space in spaces:
+        LOGGER.debug(f"Built sub-space {_space_label(space)} in {timings[space]:.3f} s")
+    if spaces:
+        slowest = sorted(spaces, key=timings.__getitem__, reverse=True)
+        LOGGER.info(
+            f"Built {len(spaces)} chemical sub-spaces in "
+            f"{time.perf_counter() - start:.1f} s; slowest: "
+            + ", ".join(
+                f"{_space_label(space)} ({timings[space]:.2f} s)"
+                for space in slowest[:_N_SLOWEST_SPACES]
+            )
+        )
+    return pds
+
+
+def _rebuild_changed_subspaces(
+    existing: PatchedPhaseDiagram,
+    entries: Sequence[PDEntry],
+    changed: set[frozenset[Element]],
+    n_workers: int = 1,
+    timings: dict[frozenset[Element], float] | None = None,
+) -> tuple[PatchedPhaseDiagram, list[frozenset[Element]]]:
+    """
+    Build a PatchedPhaseDiagram, reusing the unchanged sub-spaces of another.
+
+    Parameters
+    ----------
+    existing
+        Phase diagram whose sub-space PhaseDiagrams may be reused. Entries
+        kept from it must be the same objects.
+    entries
+        Entries of the new phase diagram.
+    changed
+        Chemical systems of the entries added or removed since ``existing``.
+    n_workers
+        Number of worker processes computing the rebuilt sub-spaces.
+    timings
+        Filled with the time spent computing each rebuilt sub-space in
+        seconds, if given.
+
+    Returns
+    -------
+    PatchedPhaseDiagram
+        The new phase diagram.
+    list[frozenset[Element]]
+        Sub-spaces whose convex hull was computed, because they are new or
+        contain a changed chemical system.
+    """
+    layout = _partition_entries(entries)
+    pds: dict[frozenset[Element], PhaseDiagram] = {}
+    rebuilt = []
+    for space in layout.spaces:
+        if space in existing.pds and not any(space >= s for s in changed):
+            pds[space] = existing.pds[space]
+        else:
+            rebuilt.append(space)
+    pds.update(_build_subspaces(layout, rebuilt, n_workers, timings))
     LOGGER.info(
-        f"PatchedPhaseDiagram built with {n_elements} elements "
-        f"and {len(ppd)} chemical sub-spaces."
+        f"Rebuilt {len(rebuilt)} and reused {len(pds) - len(rebuilt)} "
+        "chemical sub-spaces."
     )
+    return _assemble_patched_phase_diagram(layout, pds), rebuilt
+
+
+def update_phase_diagram(
+    existing: str | Path | PatchedPhaseDiagram,
+    new_entries: Sequence[HullEntry | PDEntry] = (),
+    removed_ids: Sequence[str] = (),
+    output_dir: str | Path = Path("data/references"),
+    compact: bool = False,
+) -> PatchedPhaseDiagram:
+    """
+    Add and remove reference entries without rebuilding the whole diagram.
+
+    Only the sub-spaces that contain the chemical system of an added or
+    removed entry, or that did not exist before, have their convex hull
+    recomputed. Every other sub-space PhaseDiagram is reused as is. Hulls
+    are only stored by the compact format, so reading ``existing`` from a
+    JSON file still computes the reused hulls once.
+
+    Parameters
+    ----------
+    existing
+        PatchedPhaseDiagram to update, or the path to one written by
+        ``setup_phase_diagrams``, JSON or compact ``.npz``.
+    new_entries
+        Entries to add. HullEntry objects keep their MPID, so that they can
+        be removed by a later update.
+    removed_ids
+        MPIDs of the entries to remove. Only entries written by
+        ``setup_phase_diagrams`` or this function carry an MPID.
+    output_dir
+        Directory where the updated diagram and its changelog are saved.
+        Created if it does not exist.
+    compact
+        Whether to also write ``patched_phase_diagram.npz``.
+
+    Returns
+    -------
+    PatchedPhaseDiagram
+        The updated phase diagram. It is also saved to
+        ``patched_phase_diagram.json`` in ``output_dir``, next to
+        ``patched_phase_diagram_changelog.json`` listing the added and
+        removed MPIDs, the changed chemical systems, and the rebuilt and
+        dropped sub-spaces.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if isinstance(existing, str | Path):
+        if Path(existing).suffix == ".npz":
+            from qmof_thermo.compact import read_compact_phase_diagram
+
+            existing = read_compact_phase_diagram(existing, lazy=True)
+        else:
+            existing = read_lazy_phase_diagram(existing)
+
+    removed = set(removed_ids)
+    kept = [e for e in existing.all_entries if _entry_id(e) not in removed]
+    dropped = [e for e in existing.all_entries if _entry_id(e) in removed]
+    if missing := removed - {_entry_id(e) for e in dropped}:
+        LOGGER.warning(f"No entries to remove with MPIDs {sorted(missing)}")
+    added = [e if isinstance(e, PDEntry) else _to_pd_entry(e) for e in new_entries]
+
+    changed = {frozenset(e.elements) for e in (*added, *dropped)}
+    ppd, rebuilt = _rebuild_changed_subspaces(existing, kept + added, changed)
 
     pd_path = output_dir / _DEFAULT_PD_FILENAME
     dumpfn(ppd, pd_path)
     LOGGER.info(f"Saved PatchedPhaseDiagram to: {pd_path}")
+
+    if compact:
+        from qmof_thermo.compact import write_compact_phase_diagram
+
+        write_compact_phase_diagram(ppd, output_dir / _DEFAULT_COMPACT_PD_FILENAME)
+
+    changelog = {
+        "added": [_entry_id(e) for e in added],
+        "removed": sorted({_entry_id(e) for e in dropped}),
+        "changed_chemical_systems": sorted(map(_space_label, changed)),
+        "rebuilt_spaces": sorted(map(_space_label, rebuilt)),
+        "dropped_spaces": sorted(
+            _space_label(s) for s in existing.spaces if s not in ppd.pds
+        ),
+        "n_reused_spaces": len(ppd.spaces) - len(rebuilt),
+    }
+    changelog_path = output_dir / _DEFAULT_CHANGELOG_FILENAME
+    dumpfn(changelog, changelog_path, indent=2)
+    LOGGER.info(f"Saved changelog to: {changelog_path}")
+    return ppd
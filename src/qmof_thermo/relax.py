@@ -23,6 +23,8 @@ if TYPE_CHECKING:
     from ase import Atoms
     from ase.optimize.optimize import Optimizer
 
+    from qmof_thermo.correction import EnergyCorrection
+
 LOGGER = getLogger(__name__)
 
 
@@ -36,6 +38,7 @@ def relax_mof(
     optimizer: type[Optimizer] = BFGS,
     device: Literal["cpu", "cuda"] | None = None,
     out_dir: Path | str = Path("data/relaxations"),
+    correction: EnergyCorrection | None = None,
 ) -> float:
     """
     Relax an ASE Atoms structure using a FAIRChem MLIP calculator.
@@ -69,11 +72,15 @@ def relax_mof(
     out_dir
         Base directory for output files. Subdirectory ``<label>``
         created and stores all relaxation specific outputs.
+    correction
+        Per-element correction applied to the final energy, e.g.
+        ``EnergyCorrection.uma()`` to compare it with DFT references.
 
     Returns
     -------
     float
-        The final relaxed total energy in eV.
+        The final relaxed total energy in eV, corrected if ``correction``
+        is given.
 
     Notes
     -----
@@ -125,6 +132,10 @@ def relax_mof(
         "final_volume": final_volume,
         "final_fmax": final_fmax,
     }
+    if correction is not None:
+        final_energy = float(correction.correct_energies([atoms], [final_energy])[0])
+        summary["correction"] = correction.name
+        summary["corrected_energy"] = final_energy
     summary_path = out_dir / "results.json"
     dumpfn(summary, summary_path)
     LOGGER.info(f"Summary written to: {summary_path}")
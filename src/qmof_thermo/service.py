@@ -0,0 +1,459 @@
+"""
+Long-running hull-scoring service with micro-batching.
+
+Requests and responses are line-delimited JSON objects sent over a
+localhost TCP or Unix socket:
+
+- ``{"op": "ehull", "items": [{"composition": ..., "energy": ...}, ...]}``
+  scores the items, optionally against a ``"diagram"`` other than the
+  default one, given by its absolute path. Compositions are formulas,
+  ``{element: amount}`` dicts or CIF paths readable by the server.
+- ``{"op": "stats"}`` reports the queue depth and latency percentiles.
+
+Any ``"id"`` field of a request is echoed back in its response.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from qmof_thermo.hull import (
+    _DEFAULT_PD_JSON,
+    _parse_composition,
+    get_hull_results,
+    preload,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Literal
+
+    from pymatgen.core import Composition
+
+LOGGER = getLogger(__name__)
+
+_DEFAULT_HOST = "127.0.0.1"
+_DEFAULT_PORT = 8765
+
+# Maximum size in bytes of a single request line.
+_MAX_REQUEST_BYTES = 2**28
+
+# Number of recent per-item latencies kept for the percentiles.
+_LATENCY_WINDOW = 10000
+
+
+def _error_row(msg: str) -> dict[str, object]:
+    """Build the response row of an item that could not be scored."""
+    return {
+        "formula": None,
+        "e_above_hull": None,
+        "hull_energy": None,
+        "decomposition": None,
+        "chemical_space": None,
+        "error": msg,
+    }
+
+
+def _read_items(items: Sequence[dict]) -> list[tuple[Composition, float] | str]:
+    """
+    Read the composition and energy of the items of a request.
+
+    Parameters
+    ----------
+    items
+        Items of an ``ehull`` request.
+
+    Returns
+    -------
+    list[tuple[Composition, float] | str]
+        The composition and total energy of each item, or the error message
+        of an item that could not be read or has no atoms.
+    """
+    parsed: list[tuple[Composition, float] | str] = []
+    for item in items:
+        try:
+            composition = _parse_composition(item["composition"])
+            parsed.append((composition, float(item["energy"])))
+        except Exception as err:
+            parsed.append(f"Could not read item: {err!r}")
+    return parsed
+
+
+@dataclass
+class _PendingItem:
+    """
+    An item waiting to be scored in a micro-batch.
+
+    Attributes
+    ----------
+    composition
+        Composition of the item.
+    energy
+        Total energy in eV.
+    future
+        Future resolved with the output row of the item.
+    submitted
+        Time at which the item was queued, from ``time.perf_counter``.
+    """
+
+    composition: Composition
+    energy: float
+    future: asyncio.Future
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class HullServer:
+    """
+    Server holding phase diagrams in memory and scoring requests in batches.
+
+    Items from concurrent requests to the same diagram are coalesced into
+    micro-batches: a batch is scored as soon as it holds ``max_batch_size``
+    items, or ``max_delay`` seconds after its first item arrived.
+    """
+
+    def __init__(
+        self,
+        diagrams: Sequence[Path | str] = (_DEFAULT_PD_JSON,),
+        host: str = _DEFAULT_HOST,
+        port: int = _DEFAULT_PORT,
+        socket_path: Path | str | None = None,
+        max_batch_size: int = 4096,
+        max_delay: float = 0.005,
+        engine: Literal["numpy", "pymatgen"] = "numpy",
+    ) -> None:
+        """
+        Parameters
+        ----------
+        diagrams
+            Serialized PatchedPhaseDiagrams the server may score against. The
+            first one is the default. All of them are loaded when the server
+            starts.
+        host
+            Host to listen on if ``socket_path`` is not given.
+        port
+            TCP port to listen on, or 0 to pick a free one.
+        socket_path
+            Path of a Unix socket to listen on instead of TCP.
+        max_batch_size
+            Maximum number of items scored in one batch.
+        max_delay
+            Maximum time in seconds an item waits for its batch to fill.
+        engine
+            Hull engine, see :func:`qmof_thermo.get_energies_above_hull`.
+        """
+        self.diagrams = [str(Path(d).resolve()) for d in diagrams]
+        self.host = host
+        self.port = port
+        self.socket_path = None if socket_path is None else str(socket_path)
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.engine = engine
+
+        self._server: asyncio.Server | None = None
+        self._queues: dict[str, asyncio.Queue[_PendingItem]] = {}
+        self._batchers: list[asyncio.Task] = []
+        # Batches are scored off the event loop, one at a time
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        self._n_requests = 0
+        self._n_items = 0
+        self._n_batches = 0
+        self._latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    @property
+    def address(self) -> str | tuple[str, int]:
+        """Unix socket path, or (host, port) the server listens on."""
+        if self.socket_path is not None:
+            return self.socket_path
+        if self._server is not None:
+            return self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def start(self) -> None:
+        """
+        Load the phase diagrams and start listening.
+
+        Returns
+        -------
+        None
+        """
+        loop = asyncio.get_running_loop()
+        for diagram in self.diagrams:
+            await loop.run_in_executor(
+                self._executor, partial(preload, diagram, lazy=True)
+            )
+            self._queues[diagram] = asyncio.Queue()
+            self._batchers.append(loop.create_task(self._batch_loop(diagram)))
+
+        if self.socket_path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle, path=self.socket_path, limit=_MAX_REQUEST_BYTES
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._handle, self.host, self.port, limit=_MAX_REQUEST_BYTES
+            )
+        LOGGER.info(f"Hull server listening on {self.address}")
+
+    async def serve_forever(self) -> None:
+        """
+        Start the server if needed, and serve until cancelled.
+
+        Returns
+        -------
+        None
+        """
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """
+        Stop listening and cancel the batching tasks.
+
+        Returns
+        -------
+        None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._batchers:
+            task.cancel()
+        await asyncio.gather(*self._batchers, return_exceptions=True)
+        self._batchers.clear()
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict[str, object]:
+        """
+        Report the load of the server.
+
+        Returns
+        -------
+        dict[str, object]
+            Items waiting to be scored (``queue_depth``), request, item and
+            batch counts, and percentiles of the time items spent between
+            being queued and scored, in ms, over recent items.
+        """
+        latencies = np.array(self._latencies) * 1000
+        percentiles = (
+            dict(
+                zip(
+                    ("p50", "p90", "p99"),
+                    np.percentile(latencies, [50, 90, 99]).tolist(),
+                    strict=True,
+                )
+            )
+            if latencies.size
+            else dict.fromkeys(("p50", "p90", "p99"))
+        )
+        return {
+            "queue_depth": sum(queue.qsize() for queue in self._queues.values()),
+            "requests": self._n_requests,
+            "items": self._n_items,
+            "batches": self._n_batches,
+            "latency_ms": percentiles,
+        }
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer the requests of one connection, in order."""
+        try:
+            while line := await reader.readline():
+                request: dict = {}
+                try:
+                    request = json.loads(line)
+                    response = await self._dispatch(request)
+                except Exception as err:
+                    response = {"error": f"{type(err).__name__}: {err}"}
+                if "id" in request:
+                    response["id"] = request["id"]
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: dict) -> dict[str, object]:
+        """Answer a single request."""
+        op = request.get("op", "ehull")
+        if op == "stats":
+            return self.stats()
+        if op != "ehull":
+            msg = f"Unknown op {op!r}."
+            raise ValueError(msg)
+
+        diagram = request.get("diagram", self.diagrams[0])
+        if diagram not in self._queues:
+            msg = f"The server does not hold the phase diagram {diagram}."
+            raise ValueError(msg)
+
+        self._n_requests += 1
+        # CIF paths are read from disk, so parse off the event loop
+        parsed = await asyncio.get_running_loop().run_in_executor(
+            None, _read_items, list(request["items"])
+        )
+        futures = [self._submit(diagram, item) for item in parsed]
+        return {"results": list(await asyncio.gather(*futures))}
+
+    def _submit(
+        self, diagram: str, item: tuple[Composition, float] | str
+    ) -> asyncio.Future:
+        """Queue a parsed item for scoring, or fail it if it could not be read."""
+        future = asyncio.get_running_loop().create_future()
+        self._n_items += 1
+        if isinstance(item, str):
+            future.set_result(_error_row(item))
+            return future
+        self._queues[diagram].put_nowait(_PendingItem(*item, future))
+        return future
+
+    async def _batch_loop(self, diagram: str) -> None:
+        """Collect queued items of a diagram into batches and score them."""
+        loop = asyncio.get_running_loop()
+        queue = self._queues[diagram]
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                rows = await loop.run_in_executor(
+                    self._executor, self._score_batch, diagram, batch
+                )
+            except Exception as err:
+                rows = [_error_row(f"{type(err).__name__}: {err}")] * len(batch)
+
+            self._n_batches += 1
+            now = time.perf_counter()
+            for item, row in zip(batch, rows, strict=True):
+                # The client may have gone away and cancelled the future
+                if not item.future.done():
+                    item.future.set_result(row)
+                self._latencies.append(now - item.submitted)
+
+    def _score_batch(
+        self, diagram: str, batch: Sequence[_PendingItem]
+    ) -> list[dict[str, object]]:
+        """
+        Score a batch of items, one at a time if the batch as a whole fails.
+
+        Batches mix the items of several clients, so an item that makes
+        scoring fail only fails its own row.
+
+        Parameters
+        ----------
+        diagram
+            Serialized PatchedPhaseDiagram to score against.
+        batch
+            Items to score.
+
+        Returns
+        -------
+        list[dict[str, object]]
+            Output row of each item, in order.
+        """
+        score = partial(
+            get_hull_results, serialized_phase_diagram=diagram, engine=self.engine
+        )
+        try:
+            results = score(
+                [item.composition for item in batch], [item.energy for item in batch]
+            )
+        except Exception as err:
+            if len(batch) == 1:
+                return [_error_row(f"{type(err).__name__}: {err}")]
+            LOGGER.warning(f"Scoring a batch failed ({err!r}); scoring its items apart")
+            return [row for item in batch for row in self._score_batch(diagram, [item])]
+
+        rows = []
+        for j in range(len(batch)):
+            result = results[j]
+            row = {
+                "formula": result.formula,
+                "e_above_hull": result.e_above_hull,
+                "hull_energy": result.hull_energy,
+                "decomposition": result.decomposition,
+                "chemical_space": result.chemical_space,
+                "error": results.errors[j],
+            }
+            if row["error"] is not None:
+                row = {**_error_row(row["error"]), "formula": result.formula}
+            rows.append(row)
+        return rows
+
+
+def serve(
+    diagrams: Sequence[Path | str] = (_DEFAULT_PD_JSON,),
+    host: str = _DEFAULT_HOST,
+    port: int = _DEFAULT_PORT,
+    socket_path: Path | str | None = None,
+    max_batch_size: int = 4096,
+    max_delay: float = 0.005,
+    engine: Literal["numpy", "pymatgen"] = "numpy",
+) -> None:
+    """
+    Run a :class:`HullServer` until interrupted.
+
+    Parameters
+    ----------
+    diagrams
+        Serialized PatchedPhaseDiagrams to hold in memory, the first one
+        being the default.
+    host
+        Host to listen on if ``socket_path`` is not given.
+    port
+        TCP port to listen on.
+    socket_path
+        Path of a Unix socket to listen on instead of TCP.
+    max_batch_size
+        Maximum number of items scored in one batch.
+    max_delay
+        Maximum time in seconds an item waits for its batch to fill.
+    engine
+        Hull engine, see :func:`qmof_thermo.get_energies_above_hull`.
+
+    Returns
+    -------
+    None
+    """
+    server = HullServer(
+        diagrams,
+        host=host,
+        port=port,
+        socket_path=socket_path,
+        max_batch_size=max_batch_size,
+        max_delay=max_delay,
+        engine=engine,
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        LOGGER.info("Hull server stopped")
@@ -0,0 +1,396 @@
+"""
+Module for propagating energy uncertainties to the energy above hull.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import defaultdict
+from dataclasses import dataclass
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pymatgen.analysis.phase_diagram import PhaseDiagram, get_facets
+
+from qmof_thermo.composition import get_composition
+from qmof_thermo.hull import (
+    _DEFAULT_PD_JSON,
+    _diagram_process_pool,
+    _evaluate_facet_planes,
+    _get_cached_diagram,
+    _get_facet_planes,
+    _get_fraction_matrix,
+    _get_subspace,
+)
+from qmof_thermo.phase_diagram import _entry_id
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+    from pathlib import Path
+
+    from numpy.typing import ArrayLike
+    from pymatgen.analysis.phase_diagram import PDEntry
+    from pymatgen.core import Composition, Element
+
+    from qmof_thermo.composition import CompositionLike
+
+LOGGER = getLogger(__name__)
+
+# Reference entries further above the unperturbed hull than this many
+# standard deviations of their energy are left out of the perturbed hulls.
+_HULL_WINDOW_SIGMAS = 8.0
+
+
+@dataclass
+class HullUncertainty:
+    """
+    Distribution of the energy above hull of many inputs.
+
+    Inputs whose energy above hull could not be computed hold NaN.
+
+    Attributes
+    ----------
+    formula
+        Reduced formula of each input.
+    e_above_hull
+        Energy above hull in eV/atom of each input, without perturbation.
+    mean
+        Mean energy above hull over the samples in eV/atom.
+    std
+        Standard deviation of the energy above hull over the samples in
+        eV/atom.
+    p_stable
+        Fraction of samples in which each input is on or below the hull.
+    samples
+        Energy above hull of each input in each sample, shape
+        (n_inputs, n_samples), if requested.
+    """
+
+    formula: np.ndarray
+    e_above_hull: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    p_stable: np.ndarray
+    samples: np.ndarray | None = None
+
+
+def _lower_hull_facets(fractions: np.ndarray, energies: np.ndarray) -> np.ndarray:
+    """
+    Compute the facets of the lower convex hull of points.
+
+    The hull is built as in ``PhaseDiagram``, with an extra point above all
+    others so that upper facets can be discarded.
+
+    Parameters
+    ----------
+    fractions
+        Atomic fractions of the points, shape (n_points, n_elements). Every
+        element must have a pure point.
+    energies
+        Energies of the points in eV/atom.
+
+    Returns
+    -------
+    np.ndarray
+        Indices of the vertices of each facet, shape (n_facets, n_elements).
+    """
+    dim = fractions.shape[1]
+    if dim == 1:
+        return np.array([[np.argmin(energies)]])
+
+    qhull_data = np.column_stack([fractions[:, 1:], energies])
+    extra_point = np.full(dim, 1 / dim)
+    extra_point[-1] = qhull_data.max() + 1
+    qhull_data = np.vstack([qhull_data, extra_point])
+
+    facets = np.asarray(get_facets(qhull_data))
+    facets = facets[(facets < len(fractions)).all(axis=1)]
+    vertices = qhull_data[facets]
+    vertices[..., -1] = 1
+    return facets[np.abs(np.linalg.det(vertices)) > 1e-14]
+
+
+def _lower_hull_energies(
+    fractions: np.ndarray, energies: np.ndarray, queries: np.ndarray
+) -> np.ndarray:
+    """
+    Compute the lower convex hull of points and evaluate it at queries.
+
+    The hull is the maximum of the planes through its facets.
+
+    Parameters
+    ----------
+    fractions
+        Atomic fractions of the points, shape (n_points, n_elements). Every
+        element must have a pure point.
+    energies
+        Energies of the points in eV/atom.
+    queries
+        Atomic fractions to evaluate, shape (n_queries, n_elements).
+
+    Returns
+    -------
+    np.ndarray
+        Hull energy at each query in eV/atom.
+    """
+    facets = _lower_hull_facets(fractions, energies)
+    inverse = np.linalg.inv(fractions[facets])
+    chempots = np.einsum("fij,fj->fi", inverse, energies[facets])
+    return (queries @ chempots.T).max(axis=1)
+
+
+def _entry_noise(
+    entries: Sequence[PDEntry], n_samples: int, entry_sigma: float, entropy: int
+) -> np.ndarray:
+    """
+    Draw the energy errors of reference entries in every sample.
+
+    The errors of an entry are seeded by its identity rather than by its
+    position, so that an entry shared by several sub-spaces gets the same
+    error in each of them within a sample.
+
+    Parameters
+    ----------
+    entries
+        Reference entries.
+    n_samples
+        Number of samples.
+    entry_sigma
+        Standard deviation of the energies in eV/atom.
+    entropy
+        Entropy of the root seed of the Monte Carlo run.
+
+    Returns
+    -------
+    np.ndarray
+        Error of each entry in each sample in eV/atom, shape
+        (n_samples, len(entries)).
+    """
+    noise = np.empty((n_samples, len(entries)))
+    for j, entry in enumerate(entries):
+        key = f"{_entry_id(entry)}|{entry.composition.reduced_formula}|"
+        key += repr(entry.energy_per_atom)
+        key_int = int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "little")
+        seed = np.random.SeedSequence(entropy, spawn_key=(1, key_int))
+        noise[:, j] = np.random.default_rng(seed).normal(0.0, entry_sigma, n_samples)
+    return noise
+
+
+def _sample_subspace_hull(
+    serialized_phase_diagram: Path | str,
+    space: frozenset[Element],
+    compositions: list[Composition],
+    n_samples: int,
+    entry_sigma: float,
+    entropy: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sample the hull energy of a sub-space with perturbed reference energies.
+
+    This is also the unit of work of each process in a worker pool.
+
+    Parameters
+    ----------
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    space
+        Chemical sub-space of the PatchedPhaseDiagram.
+    compositions
+        Compositions covered by the sub-space.
+    n_samples
+        Number of samples.
+    entry_sigma
+        Standard deviation of the reference energies in eV/atom.
+    entropy
+        Entropy of the root seed, from which the errors of each reference
+        entry are drawn, see :func:`_entry_noise`.
+
+    Returns
+    -------
+    np.ndarray
+        Unperturbed hull energy of each composition in eV/atom.
+    np.ndarray
+        Hull energy of each composition in each sample, shape
+        (len(compositions), n_samples).
+    """
+    pd = _get_cached_diagram(serialized_phase_diagram).ppd.pds[space]
+    planes = _get_facet_planes(pd)
+    queries = _get_fraction_matrix(compositions, planes.element_index)
+    nominal, _, _ = _evaluate_facet_planes(planes, queries)
+    if entry_sigma == 0:
+        return nominal, np.repeat(nominal[:, None], n_samples, axis=1)
+
+    # Only entries close to the hull can end up on a perturbed hull
+    fractions = _get_fraction_matrix(
+        [e.composition for e in pd.all_entries], planes.element_index
+    )
+    energies = np.array([e.energy_per_atom for e in pd.all_entries])
+    e_hull, _, _ = _evaluate_facet_planes(planes, fractions)
+    near_hull = energies - e_hull <= _HULL_WINDOW_SIGMAS * entry_sigma
+    fractions, energies = fractions[near_hull], energies[near_hull]
+
+    entries = [e for e, near in zip(pd.all_entries, near_hull, strict=True) if near]
+    noise = _entry_noise(entries, n_samples, entry_sigma, entropy)
+    samples = np.empty((len(queries), n_samples))
+    for k in range(n_samples):
+        samples[:, k] = _lower_hull_energies(fractions, energies + noise[k], queries)
+    return nominal, samples
+
+
+def get_hull_uncertainty(
+    structs: Sequence[CompositionLike],
+    energies: ArrayLike,
+    n_samples: int = 1000,
+    entry_sigma: float = 0.0,
+    query_sigma: float = 0.0,
+    element_sigma: float | Mapping[str, float] | None = None,
+    serialized_phase_diagram: Path | str = _DEFAULT_PD_JSON,
+    stable_tol: float = 0.0,
+    return_samples: bool = False,
+    seed: int | None = None,
+    n_workers: int = 1,
+) -> HullUncertainty:
+    """
+    Propagate energy uncertainties to the energy above hull by Monte Carlo.
+
+    Each sample draws Gaussian errors for every reference entry and input
+    energy. A reference entry shared by several sub-spaces has the same
+    error in all of them within a sample. The convex hull of each chemical
+    sub-space is then rebuilt once per sample. All inputs in that sub-space
+    are evaluated against it in one vectorized pass, so the cost scales
+    with the number of sub-spaces times ``n_samples``, not with the number
+    of inputs.
+
+    Parameters
+    ----------
+    structs
+        Input structures, in any form accepted by
+        :func:`qmof_thermo.get_energy_above_hull`.
+    energies
+        Total energies of the structures in eV.
+    n_samples
+        Number of Monte Carlo samples.
+    entry_sigma
+        Standard deviation in eV/atom of independent errors in the energies
+        of the reference entries.
+    query_sigma
+        Standard deviation in eV/atom of independent errors in the input
+        energies.
+    element_sigma
+        Standard deviation in eV per atom of each element of a systematic
+        error shared by all inputs within a sample, such as the offset
+        between an MLIP and the DFT references. Either one value for all
+        elements or a mapping from element symbol to value; elements
+        missing from the mapping have no error. The ``DFT_minus_UMA`` column
+        of ``data/external/elemental_reference_DFT_ESEN_UMA_12_25.csv`` is
+        a suitable magnitude.
+    serialized_phase_diagram
+        Path to the serialized PatchedPhaseDiagram.
+    stable_tol
+        Energy above hull in eV/atom at or below which a sample counts as
+        stable.
+    return_samples
+        Whether to also return the energy above hull of every sample.
+    seed
+        Seed of the random number generator. Results do not depend on
+        ``n_workers`` for a given seed.
+    n_workers
+        Number of processes to spread the chemical sub-spaces over.
+
+    Returns
+    -------
+    HullUncertainty
+        Unperturbed energies above hull, and the mean, standard deviation
+        and probability of stability over the samples, in input order.
+
+    Raises
+    ------
+    ValueError
+        If ``structs`` and ``energies`` differ in length.
+    """
+    compositions = [get_composition(struct) for struct in structs]
+    energies = np.asarray(energies, dtype=float)
+    if energies.shape != (len(compositions),):
+        msg = (
+            f"Got {len(compositions)} structures but {energies.size} energies; "
+            "they must have the same length."
+        )
+        raise ValueError(msg)
+
+    diagram = _get_cached_diagram(serialized_phase_diagram)
+    ppd = diagram.ppd
+
+    groups: dict[frozenset[Element] | None, list[int]] = defaultdict(list)
+    for i, composition in enumerate(compositions):
+        groups[_get_subspace(ppd, frozenset(composition.elements))].append(i)
+    if None in groups:
+        LOGGER.warning(
+            f"No sub-space covers {len(groups[None])} inputs; storing NaN for them."
+        )
+    tasks = [(space, indices) for space, indices in groups.items() if space]
+
+    # One random stream for the inputs, and one per reference entry
+    root_seed = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(root_seed.spawn(1)[0])
+
+    # Errors of the input energies, in eV/atom
+    elements = sorted({el for c in compositions for el in c.elements})
+    if isinstance(element_sigma, float | int):
+        sigmas = np.full(len(elements), float(element_sigma))
+    else:
+        sigmas = np.array(
+            [(element_sigma or {}).get(el.symbol, 0.0) for el in elements]
+        )
+    fractions = _get_fraction_matrix(
+        compositions, {el: j for j, el in enumerate(elements)}
+    )
+    offsets = rng.normal(0.0, 1.0, size=(n_samples, len(elements))) * sigmas
+    query_energies = (
+        (energies / np.array([c.num_atoms for c in compositions]))[:, None]
+        + fractions @ offsets.T
+        + rng.normal(0.0, query_sigma, size=(len(compositions), n_samples))
+    )
+
+    args = [
+        (
+            serialized_phase_diagram,
+            space,
+            [compositions[i] for i in indices],
+            n_samples,
+            entry_sigma,
+            root_seed.entropy,
+        )
+        for space, indices in tasks
+    ]
+    if n_workers > 1 and len(tasks) > 1:
+        with _diagram_process_pool(
+            serialized_phase_diagram, min(n_workers, len(tasks))
+        ) as pool:
+            futures = [pool.submit(_sample_subspace_hull, *a) for a in args]
+            task_results = [future.result() for future in futures]
+    else:
+        task_results = [_sample_subspace_hull(*a) for a in args]
+
+    nominal = np.full(len(compositions), np.nan)
+    hull_samples = np.full((len(compositions), n_samples), np.nan)
+    for (_, indices), (task_nominal, task_samples) in zip(
+        tasks, task_results, strict=True
+    ):
+        nominal[indices] = task_nominal
+        hull_samples[indices] = task_samples
+
+    e_above_hull = energies / np.array([c.num_atoms for c in compositions]) - nominal
+    samples = query_energies - hull_samples
+    return HullUncertainty(
+        formula=np.array([c.reduced_formula for c in compositions], dtype=object),
+        e_above_hull=e_above_hull,
+        mean=samples.mean(axis=1),
+        std=samples.std(axis=1),
+        p_stable=np.where(
+            np.isnan(nominal),
+            np.nan,
+            (samples <= stable_tol + PhaseDiagram.numerical_tol).mean(axis=1),
+        ),
+        samples=samples if return_samples else None,
+    )
@@ -1,17 +1,66 @@
 from __future__ import annotations
 
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 import pytest
 from ase.io import read
-from monty.serialization import loadfn
-from pymatgen.core import Structure
+from monty.serialization import dumpfn, loadfn
+from pymatgen.analysis.phase_diagram import PatchedPhaseDiagram, PDEntry
+from pymatgen.core import Composition, Structure
 
-from qmof_thermo import get_energy_above_hull, relax_mof, setup_phase_diagrams
-from qmof_thermo.phase_diagram import _DEFAULT_PD_FILENAME
+from qmof_thermo import (
+    EnergyCorrection,
+    clear_cache,
+    compare_energies_above_hull,
+    convert_phase_diagram,
+    get_energies_above_hull,
+    get_energy_above_hull,
+    get_formation_energies,
+    get_free_energy_above_hull,
+    get_hull_result,
+    get_hull_results,
+    get_hull_uncertainty,
+    load_hull_cache,
+    preload,
+    relax_mof,
+    save_hull_cache,
+    setup_phase_diagrams,
+    update_phase_diagram,
+)
+from qmof_thermo.cli import main
+from qmof_thermo.client import HullClient
+from qmof_thermo.composition import get_composition
+from qmof_thermo.hull import _DEFAULT_PD_JSON, _get_cached_diagram, _get_subspace
+from qmof_thermo.phase_diagram import (
+    _DEFAULT_BUILD_RECORD_FILENAME,
+    _DEFAULT_METRICS_FILENAME,
+    _DEFAULT_PD_FILENAME,
+    HullEntryTable,
+    LazyPatchedPhaseDiagram,
+    _assemble_patched_phase_diagram,
+    _build_subspaces,
+    _iter_json_records,
+    _load_hull_entries,
+    _partition_entries,
+    _to_pd_entry,
+    read_lazy_phase_diagram,
+)
+from qmof_thermo.service import HullServer, _PendingItem
+from qmof_thermo.uncertainty import _entry_noise
 
 FILE_DIR = Path(__file__).parent
 TEST_DATA_DIR = FILE_DIR / "test_data"
+ELEMENTAL_REFERENCES = (
+    FILE_DIR.parent / "data" / "external" / "elemental_reference_DFT_ESEN_UMA_12_25.csv"
+)
 
 
 @pytest.fixture(scope="module")
@@ -69,3 +118,906 @@ def test_energy_above_hull(relaxed_structure, pd_dir):
         serialized_phase_diagram=pd_dir / _DEFAULT_PD_FILENAME,
     )
     assert e_above_hull == pytest.approx(0.1921294352092806)
+
+
+def test_phase_diagram_cache(pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    clear_cache()
+    ppd = preload(pd_path)
+    assert preload(pd_path) is ppd
+
+    clear_cache()
+    assert preload(pd_path) is not ppd
+
+
+def test_energies_above_hull(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    energy = -1191.972703923097
+    structs = [relaxed_structure, relaxed_structure.composition, relaxed_structure]
+    e_above_hull = get_energies_above_hull(
+        structs,
+        [energy, energy, energy + relaxed_structure.num_sites],
+        serialized_phase_diagram=pd_path,
+    )
+    assert e_above_hull.shape == (3,)
+    assert e_above_hull[0] == pytest.approx(0.1921294352092806)
+    assert e_above_hull[1] == pytest.approx(0.1921294352092806)
+    assert e_above_hull[2] == pytest.approx(1.1921294352092806)
+
+
+def test_energies_above_hull_errors(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    energy = -1191.972703923097
+    structs = [relaxed_structure, relaxed_structure]
+    energies = [energy, energy - 10 * relaxed_structure.num_sites]
+    e_above_hull = get_energies_above_hull(
+        structs, energies, serialized_phase_diagram=pd_path
+    )
+    assert e_above_hull[0] == pytest.approx(0.1921294352092806)
+    assert np.isnan(e_above_hull[1])
+
+    with pytest.raises(ValueError, match="Could not compute"):
+        get_energies_above_hull(
+            structs, energies, serialized_phase_diagram=pd_path, on_error="raise"
+        )
+
+
+def test_energies_above_hull_bad_inputs(pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    structs = ["ZnO", "NotAFormula", "", {}, Composition(), "Zn0O0", "ZnO"]
+    energies = [-5.0] * len(structs)
+    results = get_hull_results(structs, energies, serialized_phase_diagram=pd_path)
+    assert results.errors[0] is None
+    assert results.errors[-1] is None
+    assert all(results.errors[1:-1])
+    assert np.isnan(results.e_above_hull[1:-1]).all()
+    assert results.e_above_hull[0] == results.e_above_hull[-1]
+    assert results.decomposition[-1] == {"ZnO": 1.0}
+
+    comparison = compare_energies_above_hull(structs, energies, {"a": pd_path})
+    np.testing.assert_array_equal(comparison["a"], results.e_above_hull)
+
+    with pytest.raises(ValueError, match="input 1"):
+        get_energies_above_hull(
+            structs, energies, serialized_phase_diagram=pd_path, on_error="raise"
+        )
+
+
+def test_hull_cache_persistence(relaxed_structure, pd_dir, tmp_path):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    energy = -1191.972703923097
+    clear_cache()
+    e_above_hull = get_energy_above_hull(
+        relaxed_structure, energy, serialized_phase_diagram=pd_path
+    )
+
+    cache_path = tmp_path / "hull_cache.json"
+    save_hull_cache(cache_path)
+    records = loadfn(cache_path)["hull_energies"]
+    assert len(records) == 1
+    assert sum(records[0][3].values()) == pytest.approx(1.0)
+
+    clear_cache()
+    load_hull_cache(cache_path)
+    shifted = get_energy_above_hull(
+        relaxed_structure,
+        energy + relaxed_structure.num_sites,
+        serialized_phase_diagram=pd_path,
+    )
+    assert shifted == pytest.approx(e_above_hull + 1.0)
+
+
+def test_hull_memo_bounded(pd_dir, tmp_path, monkeypatch):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    clear_cache()
+    monkeypatch.setattr("qmof_thermo.hull._HULL_MEMO_MAXSIZE", 2)
+    get_energies_above_hull(
+        ["ZnO", "ZnO2", "Zn2O"], [-5.0, -5.0, -5.0], serialized_phase_diagram=pd_path
+    )
+    records = tmp_path / "hull_cache.json"
+    save_hull_cache(records)
+    assert len(loadfn(records)["hull_energies"]) == 2
+
+    # Hull energies leave the memo with their diagram
+    monkeypatch.setattr("qmof_thermo.hull._CACHE_MAXSIZE", 1)
+    compact_path = convert_phase_diagram(pd_path, tmp_path / "ppd.npz")
+    get_energies_above_hull(["ZnO"], [-5.0], serialized_phase_diagram=compact_path)
+    save_hull_cache(records)
+    digests = {record[0] for record in loadfn(records)["hull_energies"]}
+    assert len(digests) == 1
+    assert digests != {hashlib.sha256(pd_path.read_bytes()).hexdigest()}
+    clear_cache()
+
+
+def test_compact_phase_diagram(relaxed_structure, pd_dir, tmp_path):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    compact_path = convert_phase_diagram(pd_path, tmp_path / "ppd.npz")
+    assert compact_path.is_file()
+
+    ppd = loadfn(pd_path)
+    compact_ppd = preload(compact_path)
+    assert compact_ppd.spaces == ppd.spaces
+    for space in ppd.spaces:
+        assert np.array_equal(ppd[space].facets, compact_ppd[space].facets)
+        assert np.array_equal(ppd[space].qhull_data, compact_ppd[space].qhull_data)
+
+    energy = -1191.972703923097
+    e_above_hull = get_energy_above_hull(
+        relaxed_structure, energy, serialized_phase_diagram=compact_path
+    )
+    assert e_above_hull == pytest.approx(0.1921294352092806)
+
+
+def test_update_phase_diagram(pd_dir, tmp_path):
+    compact_path = tmp_path / "ppd.npz"
+    ppd = preload(convert_phase_diagram(pd_dir / _DEFAULT_PD_FILENAME, compact_path))
+    (old_space,) = ppd.spaces
+    new_entries = [PDEntry("Cu", -4.0), PDEntry("CuZn", -6.0)]
+
+    updated = update_phase_diagram(ppd, new_entries, output_dir=tmp_path)
+    assert updated.pds[old_space] is ppd.pds[old_space]
+    changelog = loadfn(tmp_path / "patched_phase_diagram_changelog.json")
+    assert changelog["changed_chemical_systems"] == ["Cu", "Cu-Zn"]
+    assert changelog["rebuilt_spaces"] == ["Cu-Zn"]
+    assert changelog["n_reused_spaces"] == 1
+
+    updated = update_phase_diagram(
+        tmp_path / _DEFAULT_PD_FILENAME,
+        removed_ids=["mp-2133", "mp-0"],
+        output_dir=tmp_path,
+        compact=True,
+    )
+    changelog = loadfn(tmp_path / "patched_phase_diagram_changelog.json")
+    assert changelog["removed"] == ["mp-2133"]
+    assert changelog["rebuilt_spaces"] == ["C-H-N-O-Zn"]
+
+    entries = [e for e in ppd.all_entries if e.attribute["mpid"] != "mp-2133"]
+    rebuilt = PatchedPhaseDiagram(entries + new_entries)
+    compact_ppd = preload(tmp_path / "patched_phase_diagram.npz")
+    for entry in rebuilt.all_entries:
+        expected = rebuilt.get_hull_energy_per_atom(entry.composition)
+        for diagram in (updated, compact_ppd):
+            assert diagram.get_hull_energy_per_atom(entry.composition) == (
+                pytest.approx(expected)
+            )
+
+
+def test_lazy_phase_diagram(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    clear_cache()
+    ppd = preload(pd_path, lazy=True)
+    assert isinstance(ppd, LazyPatchedPhaseDiagram)
+    assert ppd.pds.n_built == 0
+
+    energy = -1191.972703923097
+    e_above_hull = get_energy_above_hull(
+        relaxed_structure, energy, serialized_phase_diagram=pd_path
+    )
+    assert e_above_hull == pytest.approx(0.1921294352092806)
+    assert ppd.pds.n_built == 1
+
+    assert preload(pd_path) is ppd
+    assert ppd.pds.n_built == len(ppd.spaces)
+    eager_ppd = loadfn(pd_path)
+    assert ppd.spaces == eager_ppd.spaces
+    for space in ppd.spaces:
+        assert np.array_equal(ppd[space].facets, eager_ppd[space].facets)
+
+
+def test_lazy_phase_diagram_serialization(pd_dir, tmp_path):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    lazy_ppd = read_lazy_phase_diagram(pd_path)
+    round_trip_path = tmp_path / "ppd.json"
+    dumpfn(lazy_ppd, round_trip_path)
+    assert lazy_ppd.pds.n_built == 0
+
+    ppd = loadfn(round_trip_path)
+    assert type(ppd) is PatchedPhaseDiagram
+    assert ppd.spaces == lazy_ppd.spaces
+    assert len(ppd.all_entries) == len(lazy_ppd.all_entries)
+
+    restored = LazyPatchedPhaseDiagram.from_dict(lazy_ppd.as_dict())
+    assert restored.spaces == lazy_ppd.spaces
+    assert restored.pds.n_built == 0
+
+
+def test_energies_above_hull_numpy_engine(pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    ppd = loadfn(pd_path)
+    rng = np.random.default_rng(42)
+    compositions = []
+    for space in ppd.spaces:
+        for _ in range(5):
+            n_elements = rng.integers(1, len(space) + 1)
+            elements = rng.choice(sorted(space), n_elements, replace=False)
+            amounts = rng.integers(1, 10, size=n_elements)
+            compositions.append(
+                Composition(dict(zip(elements, amounts.tolist(), strict=True)))
+            )
+    hull_energies = np.array([ppd.get_hull_energy(c) for c in compositions])
+    energies = hull_energies + np.array([c.num_atoms for c in compositions])
+
+    clear_cache()
+    e_above_hull = get_energies_above_hull(
+        compositions, energies, serialized_phase_diagram=pd_path, engine="numpy"
+    )
+    np.testing.assert_allclose(e_above_hull, 1.0, atol=1e-8)
+
+    clear_cache()
+    e_above_hull = get_energies_above_hull(
+        compositions, energies, serialized_phase_diagram=pd_path, engine="pymatgen"
+    )
+    np.testing.assert_allclose(e_above_hull, 1.0, atol=1e-8)
+
+
+def test_energy_above_hull_composition_inputs(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    energy = -1191.972703923097
+    cif_path = TEST_DATA_DIR / "qmof-bda2f7d_relaxed.cif"
+    inputs = [
+        read(cif_path),
+        cif_path,
+        str(cif_path),
+        relaxed_structure.composition.formula,
+        relaxed_structure.composition.as_dict(),
+    ]
+    for struct in inputs:
+        e_above_hull = get_energy_above_hull(
+            struct, energy, serialized_phase_diagram=pd_path
+        )
+        assert e_above_hull == pytest.approx(0.1921294352092806)
+
+    e_above_hull = get_energies_above_hull(
+        inputs, [energy] * len(inputs), serialized_phase_diagram=pd_path
+    )
+    np.testing.assert_allclose(e_above_hull, 0.1921294352092806)
+
+
+def test_cif_composition_with_symmetry(tmp_path):
+    cif_path = tmp_path / "nacl.cif"
+    Structure.from_spacegroup(
+        "Fm-3m",
+        [[5.69, 0, 0], [0, 5.69, 0], [0, 0, 5.69]],
+        ["Na", "Cl"],
+        [[0, 0, 0], [0.5, 0.5, 0.5]],
+    ).to(filename=str(cif_path), symprec=0.1)
+    assert get_composition(cif_path) == Composition("Na4Cl4")
+
+
+def test_cif_composition_wrapped_rows(tmp_path):
+    cif_path = tmp_path / "zno.cif"
+    cif_path.write_text(
+        "data_ZnO\n"
+        "_symmetry_space_group_name_H-M 'P 1'\n"
+        "_cell_length_a 3.25\n_cell_length_b 3.25\n_cell_length_c 5.21\n"
+        "_cell_angle_alpha 90\n_cell_angle_beta 90\n_cell_angle_gamma 120\n"
+        "loop_\n"
+        "_atom_site_label\n_atom_site_type_symbol\n"
+        "_atom_site_fract_x\n_atom_site_fract_y\n_atom_site_fract_z\n"
+        "_atom_site_occupancy\n"
+        "Zn1 Zn\n0.3333 0.6667 0.0 1\n"
+        "O1 O 0.3333\n0.6667 0.38 1\n"
+    )
+    assert get_composition(cif_path) == Composition("ZnO")
+
+
+def test_hull_results(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    energy = -1191.972703923097
+    result = get_hull_result(relaxed_structure, energy, pd_path)
+    assert result.e_above_hull == pytest.approx(0.1921294352092806)
+    assert result.hull_energy == pytest.approx(
+        energy / relaxed_structure.num_sites - result.e_above_hull
+    )
+    assert result.chemical_space == "C-H-N-O-Zn"
+    assert sum(result.decomposition.values()) == pytest.approx(1.0)
+    assert result.stoichiometry == pytest.approx(
+        {"H2O": 6.0, "H4C": 3.0, "ZnO": 4.0, "H5NO": 3.0, "C": 33.0}
+    )
+
+    results = get_hull_results(
+        [relaxed_structure, "Xe"], [energy, 0.0], serialized_phase_diagram=pd_path
+    )
+    assert len(results) == 2
+    assert results[0] == result
+    assert np.isnan(results.e_above_hull[1])
+    assert results.decomposition[1] == {}
+    assert results.chemical_space[1] == ""
+
+
+def test_formation_energies(pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    ppd = loadfn(pd_path)
+    entries = ppd.all_entries
+    structs = [e.composition.formula for e in entries] * 2
+    energies = [e.energy for e in entries] * 2
+    form_e = get_formation_energies(structs, energies, serialized_phase_diagram=pd_path)
+    expected = [ppd.get_form_energy_per_atom(e) for e in entries] * 2
+    assert form_e == pytest.approx(expected)
+
+    form_e = get_formation_energies(
+        ["ZnO", "H2O", "KO2"], [-10.0, -15.0, -8.0], references=ELEMENTAL_REFERENCES
+    )
+    refs = {"Zn": -1.523535, "O": -5.000327, "H": -3.411157}
+    assert form_e[0] == pytest.approx(-5.0 - (refs["Zn"] + refs["O"]) / 2, abs=1e-3)
+    assert form_e[1] == pytest.approx(-5.0 - (2 * refs["H"] + refs["O"]) / 3, abs=1e-3)
+    assert np.isnan(form_e[2])
+    with pytest.raises(ValueError, match="No elemental reference"):
+        get_formation_energies(
+            ["KO2"], [-8.0], references={"O": -4.9}, on_error="raise"
+        )
+
+
+def test_energy_correction(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    energy = -1191.972703923097
+    uma = EnergyCorrection.uma()
+    assert uma.shifts["Zn"] == pytest.approx(1.703054478333333)
+
+    composition = relaxed_structure.composition
+    corrected = uma.correct_energies([relaxed_structure], [energy])[0]
+    expected = energy + sum(
+        amt * uma.shifts[el.symbol] for el, amt in composition.items()
+    )
+    assert corrected == pytest.approx(expected)
+    assert get_energy_above_hull(
+        relaxed_structure, energy, pd_path, correction=uma
+    ) == pytest.approx(get_energy_above_hull(relaxed_structure, corrected, pd_path))
+
+    # Shifting the inputs and the references alike leaves the hull unchanged
+    e_above_hull = get_energy_above_hull(
+        relaxed_structure, energy, pd_path, correction=uma, reference_correction=uma
+    )
+    assert e_above_hull == pytest.approx(0.1921294352092806)
+    form_e = get_formation_energies(["ZnO"], [-10.0], serialized_phase_diagram=pd_path)
+    assert get_formation_energies(
+        ["ZnO"],
+        [-10.0],
+        serialized_phase_diagram=pd_path,
+        correction=uma,
+        reference_correction=uma,
+    ) == pytest.approx(form_e)
+
+
+def test_free_energy_above_hull(pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    ppd = loadfn(pd_path)
+    temperatures = np.linspace(0, 1000, 5)
+    rng = np.random.default_rng(0)
+    reference_free_energies = {
+        e.attribute["mpid"]: e.energy
+        - temperatures * rng.uniform(0, 1e-3) * e.composition.num_atoms
+        for e in ppd.all_entries
+    }
+
+    compositions = [Composition("ZnH2C2O5"), Composition("H4CN2O")]
+    free_energies = [[-60.0] * 5, [-45.0] * 5]
+    g_above_hull = get_free_energy_above_hull(
+        compositions,
+        free_energies,
+        temperatures,
+        reference_free_energies,
+        serialized_phase_diagram=pd_path,
+    )
+    assert g_above_hull.shape == (2, 5)
+    for t in range(len(temperatures)):
+        entries = [
+            PDEntry(e.composition, reference_free_energies[e.attribute["mpid"]][t])
+            for e in ppd.all_entries
+        ]
+        pd_t = PatchedPhaseDiagram(entries)
+        for i, composition in enumerate(compositions):
+            expected = free_energies[i][t] / composition.num_atoms
+            expected -= pd_t.get_hull_energy_per_atom(composition)
+            assert g_above_hull[i, t] == pytest.approx(expected)
+
+
+def test_ehull_tolerances(relaxed_structure, pd_dir, tmp_path):
+    thermo = loadfn(TEST_DATA_DIR / "test_reference_thermo.json")
+    for record in thermo:
+        if record["mpid"] in ("mp-2133", "mp-9812"):
+            record["energy_above_hull"] = 0.003
+    thermo_path = tmp_path / "thermo.json"
+    thermo_path.write_text(json.dumps(thermo))
+
+    pd_paths = setup_phase_diagrams(
+        TEST_DATA_DIR / "test_reference_thermo_structures.json",
+        thermo_path,
+        output_dir=tmp_path,
+        ehull_tolerances=[0.005, 0.0],
+    )
+    assert list(pd_paths) == [0.0, 0.005]
+    assert pd_paths[0.0] == tmp_path / "within_0.0_eVperatom" / _DEFAULT_PD_FILENAME
+    assert len(loadfn(pd_paths[0.0]).all_entries) == len(thermo) - 2
+    assert len(loadfn(pd_paths[0.005]).all_entries) == len(thermo)
+
+    energy = -1191.972703923097
+    df = compare_energies_above_hull(
+        [relaxed_structure, "ZnCO3"],
+        [energy, -20.0],
+        {"0.0": pd_paths[0.0], "0.005": pd_paths[0.005]},
+    )
+    assert list(df.columns) == ["formula", "0.0", "0.005", "delta_0.005"]
+    assert df["0.005"][0] == pytest.approx(0.1921294352092806)
+    assert df["0.005"][1] == pytest.approx(
+        get_energy_above_hull("ZnCO3", -20.0, pd_dir / _DEFAULT_PD_FILENAME)
+    )
+    assert (df["delta_0.005"] >= 0).all()
+    assert df["delta_0.005"][1] > 0
+
+
+def test_stream_structures(tmp_path):
+    structures_path = TEST_DATA_DIR / "test_reference_thermo_structures.json"
+    thermo_path = TEST_DATA_DIR / "test_reference_thermo.json"
+    records = json.loads(structures_path.read_text())
+    assert list(_iter_json_records(structures_path, chunk_size=64)) == records
+
+    gz_path = tmp_path / "structures.json.gz"
+    with gzip.open(gz_path, "wt") as f:
+        f.write(structures_path.read_text())
+    assert list(_iter_json_records(gz_path, chunk_size=1000)) == records
+
+    entries = _load_hull_entries(structures_path, thermo_path)
+    gz_entries = _load_hull_entries(gz_path, thermo_path)
+    assert [e.mpid for e in gz_entries] == [e.mpid for e in entries]
+    assert [e.structure for e in gz_entries] == [e.structure for e in entries]
+
+    truncated = tmp_path / "truncated.json"
+    truncated.write_text(structures_path.read_text()[:-5000])
+    with pytest.raises(json.JSONDecodeError):
+        list(_iter_json_records(truncated, chunk_size=64))
+
+
+def test_composition_only_entries(tmp_path):
+    structures_path = TEST_DATA_DIR / "test_reference_thermo_structures.json"
+    thermo_path = TEST_DATA_DIR / "test_reference_thermo.json"
+    entries = _load_hull_entries(structures_path, thermo_path)
+    fast = _load_hull_entries(structures_path, thermo_path, keep_structures=False)
+    assert all(e.structure is None for e in fast)
+    assert [(e.mpid, e.composition, e.elements) for e in fast] == [
+        (e.mpid, e.structure.composition, e.elements) for e in entries
+    ]
+
+    formulas = {e.mpid: e.composition.formula for e in entries}
+    thermo = [
+        {**record, "formula": formulas[record["mpid"]]}
+        for record in json.loads(thermo_path.read_text())
+    ]
+    formula_path = tmp_path / "thermo.json"
+    formula_path.write_text(json.dumps(thermo))
+    pd_path = setup_phase_diagrams(
+        None, formula_path, output_dir=tmp_path, composition_key="formula"
+    )[0.0]
+    ppd = loadfn(pd_path)
+    assert sorted(e.attribute["mpid"] for e in ppd.all_entries) == sorted(formulas)
+    assert ppd.get_hull_energy_per_atom(Composition("Zn2H6C2O7")) == pytest.approx(
+        PatchedPhaseDiagram(
+            [_to_pd_entry(e) for e in entries]
+        ).get_hull_energy_per_atom(Composition("Zn2H6C2O7"))
+    )
+
+
+def test_parallel_subspace_build():
+    ppd = _get_cached_diagram(_DEFAULT_PD_JSON).ppd
+    elements = {"C", "Cu", "H", "N", "O", "S", "Zn"}
+    entries = [
+        e for e in ppd.all_entries if {el.symbol for el in e.elements} <= elements
+    ]
+    layout = _partition_entries(entries)
+    assert len(layout.spaces) > 1
+
+    serial = _build_subspaces(layout, layout.spaces)
+    parallel = _build_subspaces(layout, layout.spaces, n_workers=2)
+    for space in layout.spaces:
+        assert np.array_equal(parallel[space].qhull_data, serial[space].qhull_data)
+        assert np.array_equal(parallel[space].facets, serial[space].facets)
+        assert all(
+            a is b
+            for a, b in zip(
+                parallel[space].qhull_entries, serial[space].qhull_entries, strict=True
+            )
+        )
+
+    reference = PatchedPhaseDiagram(entries)
+    assembled = _assemble_patched_phase_diagram(layout, parallel)
+    assert assembled.spaces == reference.spaces
+    assert assembled.as_dict() == reference.as_dict()
+    for composition in (Composition("ZnCuS2"), Composition("C2H5NO2")):
+        assert assembled.get_hull_energy_per_atom(composition) == pytest.approx(
+            reference.get_hull_energy_per_atom(composition)
+        )
+
+
+def test_hull_entry_table():
+    table = HullEntryTable.from_amounts(
+        ["mp-1", "mp-2", "mp-3"],
+        [{"Zn": 1, "O": 1}, {"Zn": 1}, {"C": 1, "O": 2}],
+        [-10.0, -1.0, -20.0],
+        [0.0, 0.0, 0.01],
+    )
+    assert len(table) == 3
+    assert table.elements == ["C", "O", "Zn"]
+    row = table[-3]
+    assert (row.mpid, row.energy, row.structure) == ("mp-1", -10.0, None)
+    assert row.composition == Composition("ZnO")
+    assert row.elements == frozenset({"Zn", "O"})
+    assert [e.composition for e in table] == [
+        Composition("ZnO"),
+        Composition("Zn"),
+        Composition("CO2"),
+    ]
+    with pytest.raises(IndexError):
+        table[3]
+
+    selected = table.select(table.energy_above_hull > 0)
+    assert [e.mpid for e in selected] == ["mp-3"]
+    assert selected[0].composition == Composition("CO2")
+    assert table.select([0, 2]).chemical_systems() == {
+        frozenset(Composition("ZnO").elements),
+        frozenset(Composition("CO2").elements),
+    }
+    assert [e.attribute["mpid"] for e in table.to_pd_entries()] == table.ids.tolist()
+
+
+def test_table_formats(tmp_path):
+    structures_path = TEST_DATA_DIR / "test_reference_thermo_structures.json"
+    thermo_path = TEST_DATA_DIR / "test_reference_thermo.json"
+    expected = _load_hull_entries(structures_path, thermo_path)
+
+    thermo = pd.read_json(thermo_path)
+    thermo["unused"] = "x"
+    thermo.to_csv(tmp_path / "thermo.csv.gz", index=False)
+    thermo.to_json(tmp_path / "thermo.jsonl", orient="records", lines=True)
+    records = json.loads(structures_path.read_text())
+    with gzip.open(tmp_path / "structures.jsonl.gz", "wt") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+    pd.DataFrame(
+        {
+            "mpid": [r["mpid"] for r in records],
+            "structure": [json.dumps(r["structure"]) for r in records],
+        }
+    ).to_csv(tmp_path / "structures.csv", index=False)
+
+    for structures, thermo_file in [
+        ("structures.jsonl.gz", "thermo.csv.gz"),
+        ("structures.csv", "thermo.jsonl"),
+    ]:
+        entries = _load_hull_entries(
+            tmp_path / structures, tmp_path / thermo_file, keep_structures=False
+        )
+        assert [(e.mpid, e.composition) for e in entries] == [
+            (e.mpid, e.composition) for e in expected
+        ]
+        assert [e.energy for e in entries] == pytest.approx(
+            [e.energy for e in expected]
+        )
+
+    with pytest.raises(KeyError, match="energy_DFT"):
+        _load_hull_entries(
+            tmp_path / "structures.csv",
+            tmp_path / "thermo.csv.gz",
+            energy_key="energy_DFT",
+        )
+
+
+def test_build_cache(tmp_path, monkeypatch):
+    structures_path = TEST_DATA_DIR / "test_reference_thermo_structures.json"
+    thermo_path = TEST_DATA_DIR / "test_reference_thermo.json"
+    pd_path = setup_phase_diagrams(structures_path, thermo_path, tmp_path)[0.0]
+    mtime = pd_path.stat().st_mtime_ns
+    assert (tmp_path / _DEFAULT_BUILD_RECORD_FILENAME).exists()
+
+    # Unchanged inputs reuse the previous build, without reading the structures
+    monkeypatch.setattr(
+        "qmof_thermo.phase_diagram._iter_json_records",
+        lambda *_: pytest.fail("structures file was read"),
+    )
+    assert setup_phase_diagrams(structures_path, thermo_path, tmp_path) == {
+        0.0: pd_path
+    }
+    assert pd_path.stat().st_mtime_ns == mtime
+
+    # A new energy column reuses the cached compositions
+    thermo = json.loads(thermo_path.read_text())
+    for record in thermo:
+        record["energy_shifted"] = record["energy_total"] - 1.0
+    shifted_path = tmp_path / "thermo.json"
+    shifted_path.write_text(json.dumps(thermo))
+    setup_phase_diagrams(
+        structures_path, shifted_path, tmp_path, energy_key="energy_shifted"
+    )
+    assert pd_path.stat().st_mtime_ns != mtime
+    ppd = loadfn(pd_path)
+    assert len(ppd.all_entries) == len(thermo)
+    assert {e.attribute["mpid"]: e.energy for e in ppd.all_entries} == {
+        r["mpid"]: pytest.approx(r["energy_shifted"]) for r in thermo
+    }
+
+
+def test_build_metrics(tmp_path):
+    structures_path = TEST_DATA_DIR / "test_reference_thermo_structures.json"
+    thermo_path = TEST_DATA_DIR / "test_reference_thermo.json"
+    records = []
+    setup_phase_diagrams(
+        structures_path,
+        thermo_path,
+        tmp_path,
+        ehull_tolerances=[0.0, 0.1],
+        metrics_callback=records.append,
+    )
+    report = json.loads((tmp_path / _DEFAULT_METRICS_FILENAME).read_text())
+    assert not report["skipped"]
+    assert report["stages"] == records
+    stages = {record["stage"] for record in records}
+    assert {
+        "input_digest",
+        "thermo_load",
+        "filter",
+        "structures_load",
+        "structure_decoding",
+        "entry_table",
+        "pdentry_creation",
+        "partition",
+        "subspace_hulls",
+        "serialization",
+    } <= stages
+    for record in [*records, report["total"]]:
+        assert record["wall_time_s"] >= 0
+        assert record["cpu_time_s"] >= 0
+        assert record["peak_rss_mb"] > 0
+    hulls = [r for r in records if r["stage"] == "subspace_hulls"]
+    assert [r["tolerance"] for r in hulls] == [0.0, 0.1]
+    assert "C-H-N-O-Zn" in hulls[0]["subspace_times_s"]
+
+    # A cached build still reports the time spent checking the inputs
+    setup_phase_diagrams(
+        structures_path, thermo_path, tmp_path, ehull_tolerances=[0.0, 0.1]
+    )
+    report = json.loads((tmp_path / _DEFAULT_METRICS_FILENAME).read_text())
+    assert report["skipped"]
+    assert [r["stage"] for r in report["stages"]] == ["input_digest"]
+
+
+def test_subspace_index():
+    ppd = preload(lazy=True)
+    queries = [space - {min(space)} for space in ppd.spaces[::10]]
+    queries += [frozenset(Composition(f).elements) for f in ("Zn", "ZnO", "CuZnO")]
+    for chemsys in queries:
+        expected = next((s for s in ppd.pds if s.issuperset(chemsys)), None)
+        if chemsys in ppd.pds:
+            expected = chemsys
+        assert _get_subspace(ppd, chemsys) == expected
+    assert _get_subspace(ppd, frozenset(Composition("Og").elements)) is None
+
+
+def test_hull_results_parallel(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    structs = [relaxed_structure, "ZnO", "Xe", "H2O", "C", relaxed_structure]
+    energies = [-1191.972703923097, -5.0, 0.0, -1.0, -9.0, -1191.972703923097]
+
+    clear_cache()
+    serial = get_hull_results(structs, energies, serialized_phase_diagram=pd_path)
+    clear_cache()
+    parallel = get_hull_results(
+        structs, energies, serialized_phase_diagram=pd_path, n_workers=2
+    )
+    np.testing.assert_allclose(parallel.e_above_hull, serial.e_above_hull)
+    assert parallel.decomposition == serial.decomposition
+    assert list(parallel.chemical_space) == list(serial.chemical_space)
+    assert parallel.errors[2] is not None
+    assert parallel.errors[:2] == [None, None]
+    assert parallel.e_above_hull[0] == pytest.approx(0.1921294352092806)
+
+
+def test_cli_ehull(pd_dir, tmp_path):
+    input_path = tmp_path / "energies.csv"
+    input_path.write_text(
+        "id,composition,energy\n"
+        f"a,{TEST_DATA_DIR / 'qmof-bda2f7d_relaxed.cif'},-1191.972703923097\n"
+        "b,ZnO,-5.0\n"
+        "c,Xe,0.0\n"
+        "d,ZnO,not-a-number\n"
+    )
+    output_path = tmp_path / "e_hull.jsonl"
+    exit_code = main(
+        [
+            "ehull",
+            str(input_path),
+            "-o",
+            str(output_path),
+            "--diagram",
+            str(pd_dir / _DEFAULT_PD_FILENAME),
+            "--chunk-size",
+            "3",
+        ]
+    )
+    assert exit_code == 0
+
+    rows = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [row["id"] for row in rows] == ["a", "b", "c", "d"]
+    assert rows[0]["e_above_hull"] == pytest.approx(0.1921294352092806)
+    assert rows[0]["chemical_space"] == "C-H-N-O-Zn"
+    assert rows[1]["decomposition"] == {"ZnO": 1.0}
+    assert rows[2]["e_above_hull"] is None
+    assert rows[2]["error"]
+    assert rows[3]["error"]
+
+
+def test_cli_ehull_bad_records(pd_dir, tmp_path):
+    input_path = tmp_path / "energies.jsonl"
+    input_path.write_text(
+        '{"id": "a", "composition": "ZnO", "energy": null}\n'
+        '{"id": "b", "composition": "ZnO", \n'
+        '{"id": "c", "composition": 3, "energy": -5.0}\n'
+        '{"id": "d", "composition": {}, "energy": -5.0}\n'
+        '{"id": "e", "composition": "Zn0O0", "energy": -5.0}\n'
+        '{"id": "f", "composition": "ZnO", "energy": -5.0}\n'
+    )
+    output_path = tmp_path / "e_hull.jsonl"
+    exit_code = main(
+        [
+            "ehull",
+            str(input_path),
+            "-o",
+            str(output_path),
+            "--diagram",
+            str(pd_dir / _DEFAULT_PD_FILENAME),
+            "--n-workers",
+            "2",
+        ]
+    )
+    assert exit_code == 0
+
+    rows = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [row["id"] for row in rows] == ["a", None, "c", "d", "e", "f"]
+    assert all(row["error"] for row in rows[:5])
+    assert rows[5]["error"] is None
+    assert rows[5]["decomposition"] == {"ZnO": 1.0}
+
+
+def test_hull_server(relaxed_structure, pd_dir, tmp_path):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    energy = -1191.972703923097
+    server = HullServer([pd_path], port=0, max_delay=0.05)
+    started, stop = threading.Event(), threading.Event()
+
+    async def run():
+        await server.start()
+        started.set()
+        await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+        await server.close()
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),))
+    thread.start()
+    try:
+        assert started.wait(60)
+        with HullClient(server.address) as client:
+            assert client.get_energy_above_hull(
+                relaxed_structure, energy
+            ) == pytest.approx(0.1921294352092806)
+            e_above_hull = client.get_energies_above_hull(
+                ["ZnO", "Xe", TEST_DATA_DIR / "qmof-bda2f7d_relaxed.cif"],
+                [-5.0, 0.0, energy],
+                serialized_phase_diagram=pd_path,
+            )
+            assert np.isnan(e_above_hull[1])
+            assert e_above_hull[2] == pytest.approx(0.1921294352092806)
+            with pytest.raises(ValueError, match="Could not compute"):
+                client.get_energy_above_hull("Xe", 0.0)
+            with pytest.raises(ValueError, match="does not hold"):
+                client.get_energy_above_hull(
+                    "ZnO", -5.0, serialized_phase_diagram=tmp_path / "missing.json"
+                )
+
+            # Malformed items fail on their own, not the whole request
+            response = client._request(
+                {
+                    "op": "ehull",
+                    "items": [
+                        {"composition": 3, "energy": -5.0},
+                        {"composition": "ZnO", "energy": None},
+                        "ZnO",
+                        {"composition": {}, "energy": -5.0},
+                        {"composition": "ZnO", "energy": -5.0},
+                    ],
+                }
+            )
+            rows = response["results"]
+            assert all(row["error"] for row in rows[:4])
+            assert rows[4]["error"] is None
+            assert rows[4]["decomposition"] == {"ZnO": 1.0}
+
+            # Concurrent clients are coalesced into shared batches
+            with ThreadPoolExecutor(8) as pool:
+                results = list(
+                    pool.map(
+                        lambda _: HullClient(server.address).get_energy_above_hull(
+                            "ZnO", -5.0
+                        ),
+                        range(16),
+                    )
+                )
+            assert results == pytest.approx([results[0]] * 16)
+
+            stats = client.stats()
+            assert stats["queue_depth"] == 0
+            assert stats["items"] == 26
+            assert stats["batches"] < stats["items"]
+            assert stats["latency_ms"]["p50"] is not None
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_hull_server_batch_fallback(pd_dir, monkeypatch):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    real_get_hull_results = get_hull_results
+
+    def failing_get_hull_results(structs, energies, **kwargs):
+        if not np.isfinite(energies).all():
+            msg = "bad energy"
+            raise ValueError(msg)
+        return real_get_hull_results(structs, energies, **kwargs)
+
+    monkeypatch.setattr(
+        "qmof_thermo.service.get_hull_results", failing_get_hull_results
+    )
+    server = HullServer([pd_path])
+    batch = [
+        _PendingItem(Composition("ZnO"), -5.0, None),
+        _PendingItem(Composition("ZnO"), np.inf, None),
+        _PendingItem(Composition("ZnO"), -5.0, None),
+    ]
+    rows = server._score_batch(str(pd_path.resolve()), batch)
+    assert rows[1]["error"] == "ValueError: bad energy"
+    for row in (rows[0], rows[2]):
+        assert row["error"] is None
+        assert row["decomposition"] == {"ZnO": 1.0}
+
+
+def test_hull_uncertainty(relaxed_structure, pd_dir):
+    pd_path = pd_dir / _DEFAULT_PD_FILENAME
+    structs = [relaxed_structure, "ZnO", "H2O", "Xe"]
+    energies = [-1191.972703923097, -9.0, -14.0, 0.0]
+    nominal = get_energies_above_hull(structs, energies, pd_path)
+
+    result = get_hull_uncertainty(
+        structs,
+        energies,
+        n_samples=20,
+        entry_sigma=1e-9,
+        serialized_phase_diagram=pd_path,
+    )
+    np.testing.assert_allclose(result.e_above_hull, nominal)
+    np.testing.assert_allclose(result.mean, nominal, atol=1e-7)
+    assert np.isnan(result.p_stable[3])
+
+    kwargs = {
+        "n_samples": 400,
+        "entry_sigma": 0.01,
+        "query_sigma": 0.05,
+        "element_sigma": {"Zn": 0.1},
+        "serialized_phase_diagram": pd_path,
+        "return_samples": True,
+        "seed": 0,
+    }
+    result = get_hull_uncertainty(structs, energies, **kwargs)
+    assert result.samples.shape == (4, 400)
+    np.testing.assert_allclose(result.mean[:3], nominal[:3], atol=0.02)
+    assert result.std[2] == pytest.approx(0.05, rel=0.2)
+    assert result.std[1] > result.std[2]
+    assert np.all((result.p_stable[:3] >= 0.0) & (result.p_stable[:3] <= 1.0))
+
+    parallel = get_hull_uncertainty(structs, energies, n_workers=2, **kwargs)
+    np.testing.assert_allclose(parallel.samples, result.samples)
+
+
+def test_hull_uncertainty_shared_entry_noise():
+    shared = PDEntry(Composition("ZnO"), -8.0, attribute={"mpid": "mp-2133"})
+    zn_o = [PDEntry(Composition("Zn"), -1.0), shared]
+    zn_o_h = [PDEntry(Composition("H2O"), -14.0), shared, PDEntry("ZnH2", -3.0)]
+    noise_a = _entry_noise(zn_o, 50, 0.01, entropy=0)
+    noise_b = _entry_noise(zn_o_h, 50, 0.01, entropy=0)
+    np.testing.assert_array_equal(noise_a[:, 1], noise_b[:, 1])
+    assert not np.allclose(noise_a[:, 0], noise_b[:, 0])
+    assert not np.allclose(_entry_noise(zn_o, 50, 0.01, entropy=1), noise_a)